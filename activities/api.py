@@ -1,5 +1,4 @@
 # -*- coding: utf-8 -*-
-import datetime
 import json
 
 from django.contrib.auth.models import User
@@ -8,17 +7,17 @@ from django.core.exceptions import ImproperlyConfigured, ObjectDoesNotExist
 from django.db.models import Q
 from django.http import Http404
 from django.shortcuts import get_object_or_404
-from django.utils import timezone
 from django.utils.translation import ugettext as _
 
 from actstream.actions import follow, unfollow
-from actstream.models import Action, following, actor_stream, target_stream
+from actstream.models import Action, Follow, following, actor_stream, target_stream
 from rest_framework import permissions, viewsets
 from rest_framework.response import Response
 from rest_framework.views import APIView
 
-from notifications.models import notify
+from notifications.models import notify, notify_many
 from places_core.helpers import get_time_difference
+from places_core.timeline import histogram
 
 from .serializers import ActionSerializer
 
@@ -60,24 +59,17 @@ class ActionGraphAPIView(APIView):
         return super(ActionGraphAPIView, self).dispatch(*args, **kwargs)
 
     def get(self, request, **kwargs):
-        stream = target_stream(self.object).order_by('-timestamp')
-        started = stream.last().timestamp
-        current = started
-        maximum = timezone.now() + datetime.timedelta(hours=12)
-        counters = []
-        while current < maximum:
-            qs = stream.filter(timestamp__year=current.year,
-                               timestamp__month=current.month,
-                               timestamp__day=current.day)
-            counters.append(qs.count())
-            current += datetime.timedelta(days=1)
+        stream = target_stream(self.object)
+        ct = ContentType.objects.get_for_model(self.object)
+        data = histogram(stream, 'timestamp',
+                         cache_key='actions:{}:{}'.format(ct.pk, self.object.pk))
         return Response({
             'title': _(u"Actions timeline for ") + self.object.__unicode__(),
             'point_interval': 24 * 3600 * 1000,
-            'date_started': started,
+            'date_started': data.start,
             'name': _(u"Activities"),
-            'count': stream.count(),
-            'results': counters, })
+            'count': data.total,
+            'results': data.results, })
 
 
 class ActivityViewSet(viewsets.ReadOnlyModelViewSet):
@@ -200,10 +192,16 @@ class FollowAllAPIView(APIView):
 
     def post(self, request, **kwargs):
         id_list = [int(x.strip()) for x in request.POST.get('id').split(',')]
-        for user in User.objects.filter(id__in=id_list):
-            if not user in following(request.user):
-                follow(request.user, user, send_action=False)
-                new_follower(request.user, user)
+        ct = ContentType.objects.get_for_model(User)
+        followed = set(Follow.objects.filter(user=request.user, content_type=ct)\
+                                     .values_list('object_id', flat=True))
+        users = [x for x in User.objects.filter(id__in=id_list)
+                 if str(x.pk) not in followed and x != request.user]
+        for user in users:
+            follow(request.user, user, send_action=False)
+        notify_many(request.user, users,
+            key="follower",
+            verb="started following you")
         message = _(u"You have started following your friends!")
         return Response({
             'success': True,
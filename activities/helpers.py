@@ -1,8 +1,76 @@
 # -*- coding: utf-8 -*-
+from django.contrib.contenttypes.models import ContentType
+from django.core.exceptions import ValidationError
+
 from actstream.models import Action, actor_stream, target_stream
 
 from .serializers import ActionSerializer
 
+# Generic relations of Action model.
+ACTION_FIELDS = ('actor', 'action_object', 'target', )
+
+# Related objects needed to present instances of given models in activity
+# stream, mostly to build their urls.
+ACTION_SELECT_RELATED = {
+    'user': ('profile', ),
+    'idea': ('location', ),
+    'news': ('location', ),
+    'poll': ('location', ),
+    'discussion': ('location', 'creator__profile', 'category', ),
+    'entry': ('discussion__location', ),
+    'locationgalleryitem': ('location', ),
+    'socialproject': ('location', ),
+    'taskgroup': ('project__location', ),
+    'task': ('group__project__location', ),
+}
+
+
+def _action_refs(action):
+    """ Get (field, content type id, object id) for every related object. """
+    for field in ACTION_FIELDS:
+        ct_id = getattr(action, '{}_content_type_id'.format(field))
+        pk = getattr(action, '{}_object_id'.format(field))
+        if ct_id is not None and pk not in (None, ''):
+            yield field, ct_id, unicode(pk)
+
+
+def prefetch_actions(actions):
+    """
+    Fetch actors, action objects and targets for list of actions with one
+    query per content type and put them in generic relation caches, so
+    `action.actor`, `action.action_object` and `action.target` don't need
+    separate queries. Returns list of actions.
+    """
+    actions = list(actions)
+    wanted = {}
+    for action in actions:
+        for field, ct_id, pk in _action_refs(action):
+            wanted.setdefault(ct_id, set()).add(pk)
+
+    loaded = {}
+    for ct_id, ids in wanted.iteritems():
+        model = ContentType.objects.get_for_id(ct_id).model_class()
+        if model is None:
+            continue
+        pk_list = []
+        for pk in ids:
+            try:
+                pk_list.append(model._meta.pk.to_python(pk))
+            except ValidationError:
+                continue
+        queryset = model._default_manager.all()
+        related = ACTION_SELECT_RELATED.get(model._meta.model_name)
+        if related:
+            queryset = queryset.select_related(*related)
+        objects = queryset.in_bulk(pk_list)
+        loaded[ct_id] = dict((unicode(k), v) for k, v in objects.iteritems())
+
+    for action in actions:
+        for field, ct_id, pk in _action_refs(action):
+            setattr(action, '_{}_cache'.format(field),
+                    loaded.get(ct_id, {}).get(pk))
+    return actions
+
 
 def get_first_page(obj, stream_type="actor"):
     """ Simplified method to get first activity stream page to display
@@ -20,6 +88,6 @@ def get_first_page(obj, stream_type="actor"):
     else:
         qs = Action.objects.mystream(obj)
     return {
-        'results': ActionSerializer(qs[:15], many=True).data,
+        'results': ActionSerializer(prefetch_actions(qs[:15]), many=True).data,
         'count': len(qs),
         'next': len(qs) > 15, }
@@ -0,0 +1,28 @@
+# -*- coding: utf-8 -*-
+from optparse import make_option
+
+from django.core.management.base import BaseCommand
+
+from activities.models import ActionLocation
+
+
+class Command(BaseCommand):
+    """
+    Tag all actions with locations they belong to from scratch. Run it once
+    after migration, so location streams include older actions.
+
+    OPTIONS
+        --batch-size    Number of actions processed at once
+    """
+    option_list = BaseCommand.option_list + (
+        make_option('--batch-size',
+            dest='batch_size',
+            type='int',
+            default=500,
+            help=u"Number of actions processed at once"
+        ),
+    )
+
+    def handle(self, *args, **options):
+        count = ActionLocation.objects.rebuild(options['batch_size'])
+        self.stdout.write(u"Tagged actions with {} locations".format(count))
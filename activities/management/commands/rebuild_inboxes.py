@@ -0,0 +1,28 @@
+# -*- coding: utf-8 -*-
+from optparse import make_option
+
+from django.core.management.base import BaseCommand
+
+from activities.models import InboxEntry
+
+
+class Command(BaseCommand):
+    """
+    Fill activity inboxes of all users from scratch. Run it before setting
+    ACTIVITY_INBOX to True.
+
+    OPTIONS
+        --batch-size    Number of actions processed at once
+    """
+    option_list = BaseCommand.option_list + (
+        make_option('--batch-size',
+            dest='batch_size',
+            type='int',
+            default=500,
+            help=u"Number of actions processed at once"
+        ),
+    )
+
+    def handle(self, *args, **options):
+        count = InboxEntry.objects.rebuild(options['batch_size'])
+        self.stdout.write(u"Created {} inbox entries".format(count))
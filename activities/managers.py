@@ -1,15 +1,100 @@
 # -*- coding: utf-8 -*-
 from collections import defaultdict
 
+from django.conf import settings
+from django.contrib.auth.models import User
 from django.contrib.contenttypes.models import ContentType
-from django.db.models import Manager, Q
+from django.core.exceptions import ObjectDoesNotExist
+from django.db import transaction
+from django.db.models import Count, Manager, Q
 from django.db.models import get_model
 
 from actstream.managers import ActionManager, stream
 from actstream.registry import check
 
+from places_core.buffers import get_buffer, push_or_apply
+
+# Name of the queue for actions waiting to be copied to inboxes.
+BUFFER_NAME = 'inbox'
+
+# Number of actions copied to inboxes at once.
+FLUSH_SIZE = getattr(settings, 'ACTIVITY_INBOX_FLUSH_SIZE', 500)
+
+# Maximum number of actions kept in single inbox.
+INBOX_SIZE = getattr(settings, 'ACTIVITY_INBOX_SIZE', 1000)
+
+
+# Paths from objects related to actions to locations they belong to. Last
+# element of each path is a foreign key to location.
+LOCATION_PATHS = (
+    ('location', ),
+    ('discussion', 'location', ),
+    ('project', 'location', ),
+    ('group', 'project', 'location', ),
+)
+
+
+def object_location(obj):
+    """ Get ID of location given object belongs to (or is) or None. """
+    if obj is None:
+        return None
+    if isinstance(obj, get_model('locations', 'Location')):
+        return obj.pk
+    for path in LOCATION_PATHS:
+        value = obj
+        try:
+            for name in path[:-1]:
+                value = getattr(value, name)
+        except (AttributeError, ObjectDoesNotExist):
+            continue
+        location_id = getattr(value, path[-1] + '_id', None)
+        if location_id is not None:
+            return location_id
+    return None
+
+
+def action_location(action):
+    """ Get ID of location that action belongs to or None. """
+    for field in ('target', 'action_object', ):
+        if getattr(action, field + '_content_type_id') is None:
+            continue
+        location_id = object_location(getattr(action, field))
+        if location_id is not None:
+            return location_id
+    return None
+
+
+def inbox_enabled():
+    return getattr(settings, 'ACTIVITY_INBOX', False)
+
+
+def action_refs(action):
+    """
+    Get (content type id, object id, is actor) tuples for objects that
+    action is related to.
+    """
+    refs = [(action.actor_content_type_id, action.actor_object_id, True),
+            (action.target_content_type_id, action.target_object_id, False),
+            (action.action_object_content_type_id,
+             action.action_object_object_id, False), ]
+    return [(ct, str(pk), is_actor) for ct, pk, is_actor in refs
+            if ct is not None and pk is not None]
+
 
 class CivilActionManager(ActionManager):
+    @stream
+    def user(self, obj, **kwargs):
+        """
+        Standard actstream user stream, read from inbox when it is enabled.
+        """
+        if not inbox_enabled() or not isinstance(obj, User) \
+                or 'with_user_activity' in kwargs:
+            return super(CivilActionManager, self).user(obj, **kwargs)
+        return self.public().filter(inbox_entries__user=obj,
+                                    inbox_entries__in_user_stream=True,
+                                    **kwargs)\
+                            .order_by('-inbox_entries__timestamp')
+
     @stream
     def mystream(self, obj, **kwargs):
         """
@@ -18,6 +103,10 @@ class CivilActionManager(ActionManager):
         q = Q()
         check(obj)
 
+        if inbox_enabled() and isinstance(obj, User):
+            return self.filter(inbox_entries__user=obj, **kwargs)\
+                       .order_by('-inbox_entries__timestamp')
+
         objects_by_content_type = defaultdict(lambda: [])
 
         following = get_model('actstream', 'follow').objects\
@@ -64,20 +153,214 @@ class CivilActionManager(ActionManager):
     def location(self, obj, **kwargs):
         """
         Actstream for location - we try to include also actions related to
-        different content types published in this location, eg. comments
-        and votes.
+        different content types published in this location and all its
+        sub-locations, eg. comments and votes.
         """
-        q = Q()
         check(obj)
 
-        if not hasattr(obj, 'published_items'):
+        if not isinstance(obj, get_model('locations', 'Location')):
             return self.none()
 
-        self_type = ContentType.objects.get_for_model(obj)
-        id_list = [obj.pk, ] + [x[0] for x in obj.location_set.values_list('pk')]
-        q = q | Q(target_content_type=self_type, target_object_id__in=id_list)
+        return self.filter(locations__location=obj, **kwargs)\
+                   .order_by('-locations__timestamp')
 
-        for ct, id_list in obj.published_items().iteritems():
-            q = q | Q(target_content_type=ct, target_object_id__in=id_list)
 
-        return self.filter(q, **kwargs)
+class InboxManager(Manager):
+    """
+    Copies actions to inboxes of users who follow their actors, targets or
+    action objects, so user streams read one indexed range instead of
+    searching entire action table. New actions are queued and copied in
+    background (see activities.tasks).
+    """
+    def _follows(self, refs, user_id=None):
+        """ Get follows of any of (content type id, object id) pairs. """
+        id_lists = defaultdict(set)
+        for ct, pk in refs:
+            id_lists[ct].add(pk)
+        if not id_lists:
+            return []
+        q = Q()
+        for ct, id_list in id_lists.iteritems():
+            q = q | Q(content_type_id=ct, object_id__in=list(id_list))
+        qs = get_model('actstream', 'follow').objects.filter(q)
+        if user_id is not None:
+            qs = qs.filter(user_id=user_id)
+        return qs.values_list('user_id', 'content_type_id', 'object_id',
+                              'actor_only')
+
+    def _entries(self, actions, user_id=None):
+        """
+        Create (unsaved) inbox entries for given actions. Actions that
+        standard user stream would show (followed actor or not actor-only
+        follow of other object) are marked with `in_user_stream` flag.
+        """
+        refs = dict((action.pk, action_refs(action)) for action in actions)
+        followers = defaultdict(list)
+        for user, ct, pk, actor_only in self._follows(
+                set((ct, pk) for x in refs.values() for ct, pk, a in x),
+                user_id):
+            followers[(ct, pk)].append((user, actor_only))
+        entries = {}
+        for action in actions:
+            for ct, pk, is_actor in refs[action.pk]:
+                for user, actor_only in followers[(ct, pk)]:
+                    entry = entries.setdefault((user, action.pk),
+                        self.model(user_id=user, action_id=action.pk,
+                                   timestamp=action.timestamp))
+                    if is_actor or not actor_only:
+                        entry.in_user_stream = True
+        return entries.values()
+
+    def fan_out(self, actions):
+        """ Copy actions to inboxes of followers. Returns number of entries. """
+        actions = list(actions)
+        with transaction.atomic():
+            existing = set(self.filter(action__in=actions)\
+                               .values_list('user', 'action'))
+            entries = [x for x in self._entries(actions)
+                       if (x.user_id, x.action_id) not in existing]
+            self.bulk_create(entries)
+        return len(entries)
+
+    def record(self, action):
+        """ Put new action into the queue. """
+        push_or_apply(BUFFER_NAME, [action.pk],
+                      lambda id_list: self.fan_out([action]))
+
+    def flush(self, batch_size=FLUSH_SIZE):
+        """ Copy queued actions to inboxes. Returns number of actions. """
+        actions = get_buffer(BUFFER_NAME)
+        action_model = self.model._meta.get_field('action').rel.to
+        total = 0
+        while True:
+            batch = actions.pop_many(batch_size)
+            if not batch:
+                break
+            self.fan_out(action_model.objects.filter(pk__in=batch))
+            total += len(batch)
+        return total
+
+    def sync_follow(self, user_id, content_type_id, object_id):
+        """
+        Update inbox of single user after (un)following object. Recent
+        actions of followed object are added, entries that are no longer
+        related to any followed object are removed.
+        """
+        action_model = self.model._meta.get_field('action').rel.to
+        object_id = str(object_id)
+        q = Q(actor_content_type_id=content_type_id,
+              actor_object_id=object_id) | \
+            Q(target_content_type_id=content_type_id,
+              target_object_id=object_id) | \
+            Q(action_object_content_type_id=content_type_id,
+              action_object_object_id=object_id)
+        actions = list(action_model.objects.filter(q)\
+                                   .order_by('-timestamp')[:INBOX_SIZE])
+        with transaction.atomic():
+            self.filter(user_id=user_id, action__in=actions).delete()
+            self.bulk_create(self._entries(actions, user_id))
+
+    def trim(self, size=INBOX_SIZE):
+        """ Remove oldest entries from inboxes longer than `size`. """
+        deleted = 0
+        users = self.values('user').annotate(count=Count('pk'))\
+                    .filter(count__gt=size).values_list('user', flat=True)
+        for user in users:
+            qs = self.filter(user_id=user)
+            cutoff = qs.order_by('-timestamp')\
+                       .values_list('timestamp', flat=True)[size - 1]
+            stale = qs.filter(timestamp__lt=cutoff)
+            deleted += stale.count()
+            stale.delete()
+        return deleted
+
+    def rebuild(self, batch_size=FLUSH_SIZE):
+        """ Fill all inboxes from scratch. Returns number of entries. """
+        action_model = self.model._meta.get_field('action').rel.to
+        count = 0
+        self.all().delete()
+        qs = action_model.objects.order_by('pk')
+        last = 0
+        while True:
+            batch = list(qs.filter(pk__gt=last)[:batch_size])
+            if not batch:
+                break
+            count += self.fan_out(batch)
+            last = batch[-1].pk
+        return count - self.trim()
+
+
+class ActionLocationManager(Manager):
+    """
+    Tags actions with location they belong to and all its ancestors when
+    actions are saved (see activities.models.ActionLocation).
+    """
+    def _create(self, items):
+        """
+        Create rows for (action id, location id, timestamp) tuples. Returns
+        number of created rows.
+        """
+        closure_model = get_model('locations', 'LocationClosure')
+        paths = defaultdict(list)
+        for descendant, ancestor, depth in closure_model.objects\
+                .filter(descendant__in=set(x[1] for x in items))\
+                .values_list('descendant', 'ancestor', 'depth'):
+            paths[descendant].append((ancestor, depth))
+        rows = [self.model(action_id=action, location_id=ancestor,
+                           depth=depth, timestamp=timestamp)
+                for action, location, timestamp in items
+                for ancestor, depth in paths[location]]
+        self.bulk_create(rows)
+        return len(rows)
+
+    def tag(self, actions):
+        """ Tag list of new actions. Returns number of created rows. """
+        items = []
+        for action in actions:
+            location_id = action_location(action)
+            if location_id is not None:
+                items.append((action.pk, location_id, action.timestamp))
+        return self._create(items) if items else 0
+
+    def retag_subtree(self, location):
+        """
+        Update ancestors of actions in location and all its sub-locations,
+        e.g. after location was moved to other parent.
+        """
+        closure_model = get_model('locations', 'LocationClosure')
+        subtree = closure_model.objects.filter(ancestor=location)\
+                               .values_list('descendant', flat=True)
+        items = list(self.filter(depth=0, location__in=list(subtree))\
+                         .values_list('action', 'location', 'timestamp'))
+        with transaction.atomic():
+            self.filter(action__in=[x[0] for x in items]).delete()
+            return self._create(items)
+
+    def is_outdated(self, location):
+        """ Check if ancestors of actions in location have changed. """
+        closure_model = get_model('locations', 'LocationClosure')
+        action = self.filter(location=location, depth=0)\
+                     .values_list('action', flat=True).first()
+        if action is None:
+            return False
+        tagged = set(self.filter(action=action)\
+                         .values_list('location', 'depth'))
+        current = set(closure_model.objects.filter(descendant=location)\
+                                   .values_list('ancestor', 'depth'))
+        return tagged != current
+
+    def rebuild(self, batch_size=FLUSH_SIZE):
+        """ Tag all actions from scratch. Returns number of created rows. """
+        from .helpers import prefetch_actions
+        action_model = self.model._meta.get_field('action').rel.to
+        count = 0
+        self.all().delete()
+        qs = action_model.objects.order_by('pk')
+        last = 0
+        while True:
+            batch = prefetch_actions(qs.filter(pk__gt=last)[:batch_size])
+            if not batch:
+                break
+            count += self.tag(batch)
+            last = batch[-1].pk
+        return count
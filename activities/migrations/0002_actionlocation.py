@@ -0,0 +1,37 @@
+# -*- coding: utf-8 -*-
+from __future__ import unicode_literals
+
+from django.db import models, migrations
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('actstream', '__first__'),
+        ('locations', '0015_locationcontent'),
+        ('activities', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ActionLocation',
+            fields=[
+                ('id', models.AutoField(verbose_name='ID', serialize=False, auto_created=True, primary_key=True)),
+                ('depth', models.PositiveIntegerField(default=0)),
+                ('timestamp', models.DateTimeField()),
+                ('action', models.ForeignKey(related_name='locations', to='actstream.Action')),
+                ('location', models.ForeignKey(related_name='+', to='locations.Location')),
+            ],
+            options={
+            },
+            bases=(models.Model,),
+        ),
+        migrations.AlterUniqueTogether(
+            name='actionlocation',
+            unique_together=set([('action', 'location')]),
+        ),
+        migrations.AlterIndexTogether(
+            name='actionlocation',
+            index_together=set([('location', 'timestamp')]),
+        ),
+    ]
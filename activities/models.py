@@ -1,9 +1,17 @@
 # -*- coding: utf-8 -*-
 import datetime
 
+from django.contrib.auth.models import User
+from django.db import models
+from django.db.models.signals import post_delete, post_save
 from django.utils import timezone
 
-from actstream.models import Action
+from actstream.models import Action, Follow
+
+from locations.models import Location
+from places_core.timeline import forget_counts
+
+from .managers import ActionLocationManager, InboxManager, inbox_enabled
 
 
 def user_email_stream(user):
@@ -11,3 +19,87 @@ def user_email_stream(user):
     """
     time_diff = timezone.now() - datetime.timedelta(days=7)
     return Action.objects.mystream(user).filter(timestamp__gt=time_diff)
+
+
+class InboxEntry(models.Model):
+    """
+    Action copied to activity stream of single user that follows its actor,
+    target or action object. Filled only when ACTIVITY_INBOX is enabled.
+    """
+    user = models.ForeignKey(User, related_name='+')
+    action = models.ForeignKey(Action, related_name='inbox_entries')
+    timestamp = models.DateTimeField()
+    # Action is also shown in standard actstream user stream
+    in_user_stream = models.BooleanField(default=False)
+
+    objects = InboxManager()
+
+    class Meta:
+        unique_together = ('user', 'action',)
+        index_together = [['user', 'timestamp'], ]
+
+    def __unicode__(self):
+        return u"{}: {}".format(self.user_id, self.action_id)
+
+
+class ActionLocation(models.Model):
+    """
+    Location that action belongs to together with all ancestors of this
+    location, so stream of location with all sub-locations is read with
+    single indexed query.
+    """
+    action = models.ForeignKey(Action, related_name='locations')
+    location = models.ForeignKey(Location, related_name='+')
+    # Distance from location action belongs to (0 for location itself)
+    depth = models.PositiveIntegerField(default=0)
+    timestamp = models.DateTimeField()
+
+    objects = ActionLocationManager()
+
+    class Meta:
+        unique_together = ('action', 'location',)
+        index_together = [['location', 'timestamp'], ]
+
+    def __unicode__(self):
+        return u"{}: {} ({})".format(self.action_id, self.location_id,
+                                     self.depth)
+
+
+def tag_action_location(sender, instance, created, raw=False, **kwargs):
+    """ Store location of new action and its ancestors. """
+    if created and not raw:
+        ActionLocation.objects.tag([instance])
+
+
+def retag_moved_location(sender, instance, created, raw=False, **kwargs):
+    """ Update tagged actions when location was moved to other parent. """
+    if not created and not raw and \
+            ActionLocation.objects.is_outdated(instance):
+        ActionLocation.objects.retag_subtree(instance)
+
+
+def deliver_action(sender, instance, created, raw=False, **kwargs):
+    """ Queue new action to be copied to inboxes of followers. """
+    if created and not raw and inbox_enabled():
+        InboxEntry.objects.record(instance)
+
+
+def update_follower_inbox(sender, instance, raw=False, **kwargs):
+    """ Backfill or clean up inbox when user (un)follows something. """
+    if not raw and inbox_enabled():
+        InboxEntry.objects.sync_follow(instance.user_id,
+                                       instance.content_type_id,
+                                       instance.object_id)
+
+
+def forget_action_counts(sender, instance, **kwargs):
+    """ Cached activity charts would still count deleted action. """
+    forget_counts(Action)
+
+
+post_save.connect(tag_action_location, sender=Action)
+post_save.connect(deliver_action, sender=Action)
+post_save.connect(retag_moved_location, sender=Location)
+post_save.connect(update_follower_inbox, sender=Follow)
+post_delete.connect(update_follower_inbox, sender=Follow)
+post_delete.connect(forget_action_counts, sender=Action)
@@ -202,12 +202,10 @@ class ActionSerializer(serializers.ModelSerializer):
         return serializer.data
 
     def get_action_target(self, obj):
-        ct = obj.target_content_type
-        pk = obj.target_object_id
-        if not ct or not pk:
+        if not obj.target_content_type_id or not obj.target_object_id \
+                or obj.target is None:
             return None
-        target = ct.get_object_for_this_type(pk=pk)
-        serializer = ActionTargetSerializer(target)
+        serializer = ActionTargetSerializer(obj.target)
         return serializer.data
 
     def get_verb(self, obj):
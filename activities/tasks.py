@@ -0,0 +1,31 @@
+# -*- coding: utf-8 -*-
+import datetime
+
+from celery.task.base import periodic_task
+
+from .managers import inbox_enabled
+from .models import InboxEntry
+
+import logging
+logger = logging.getLogger('tasks')
+
+
+@periodic_task(run_every=datetime.timedelta(minutes=1))
+def flush_inbox():
+    """ Copy queued actions to inboxes of followers. """
+    if not inbox_enabled():
+        return 0
+    count = InboxEntry.objects.flush()
+    if count:
+        logger.info(u"Delivered {} queued actions".format(count))
+    return count
+
+
+@periodic_task(run_every=datetime.timedelta(days=1))
+def trim_inboxes():
+    """ Remove oldest actions from inboxes that exceed size limit. """
+    if not inbox_enabled():
+        return 0
+    count = InboxEntry.objects.trim()
+    logger.info(u"Removed {} old inbox entries".format(count))
+    return count
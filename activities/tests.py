@@ -1,3 +1,88 @@
+# -*- coding: utf-8 -*-
+from django.contrib.auth.models import User
+from django.contrib.contenttypes.models import ContentType
 from django.test import TestCase
+from django.test.utils import override_settings
 
-# Create your tests here.
+from actstream.models import Action, Follow, user_stream
+
+from ideas.models import Idea
+from locations.models import Location
+
+from .models import ActionLocation, InboxEntry
+
+
+@override_settings(ACTIVITY_INBOX=True, BUFFER_BACKEND='local')
+class InboxTestCase(TestCase):
+    """ Test copying actions to activity streams of followers. """
+    fixtures = ['fixtures/users.json',
+                'fixtures/locations.json',]
+
+    def setUp(self):
+        self.user = User.objects.create_user('reader', 'reader@test.com', 'pass')
+        self.author = User.objects.create_user('author', 'author@test.com', 'pass')
+        self.location = Location.objects.get(slug='brzeg-pl-1')
+
+    def _follow(self, obj, actor_only=False):
+        return Follow.objects.create(user=self.user, actor_only=actor_only,
+            content_type=ContentType.objects.get_for_model(obj),
+            object_id=str(obj.pk))
+
+    def _send(self):
+        return Action.objects.create(actor=self.author, verb='joined',
+                                     target=self.location)
+
+    def test_action_is_copied_to_follower(self):
+        self._follow(self.location)
+        action = self._send()
+        self.assertEqual(list(Action.objects.mystream(self.user)), [action])
+        self.assertEqual(list(user_stream(self.user)), [action])
+
+    def test_actor_only_follow(self):
+        self._follow(self.location, actor_only=True)
+        action = self._send()
+        self.assertEqual(list(Action.objects.mystream(self.user)), [action])
+        self.assertFalse(user_stream(self.user).exists())
+
+    def test_backfill_and_cleanup(self):
+        action = self._send()
+        follow = self._follow(self.author)
+        self.assertEqual(list(Action.objects.mystream(self.user)), [action])
+        follow.delete()
+        self.assertFalse(InboxEntry.objects.filter(user=self.user).exists())
+
+    def test_trim_inbox(self):
+        self._follow(self.location)
+        actions = [self._send() for x in range(3)]
+        self.assertEqual(InboxEntry.objects.trim(2), 1)
+        self.assertEqual(set(Action.objects.mystream(self.user)),
+                         set(actions[1:]))
+
+
+class LocationStreamTestCase(TestCase):
+    """ Test streams of locations with all their sub-locations. """
+    fixtures = ['fixtures/users.json',
+                'fixtures/locations.json',]
+
+    def setUp(self):
+        self.user = User.objects.create_user('author', 'author@test.com', 'pass')
+        self.city = Location.objects.get(slug='brzeg-pl-1')
+        self.country = Location.objects.get(slug='poland-pl')
+        self.idea = Idea.objects.create(name="Test idea", description="test",
+            location=self.city, creator=self.user)
+        self.action = Action.objects.create(actor=self.user, verb='voted on',
+                                            action_object=self.idea)
+
+    def _in_stream(self, location):
+        return Action.objects.location(location)\
+                             .filter(pk=self.action.pk).exists()
+
+    def test_action_in_location_and_ancestors(self):
+        self.assertTrue(self._in_stream(self.city))
+        self.assertTrue(self._in_stream(self.country))
+
+    def test_rebuild(self):
+        ActionLocation.objects.all().delete()
+        self.assertFalse(self._in_stream(self.country))
+        ActionLocation.objects.rebuild()
+        self.assertTrue(self._in_stream(self.country))
@@ -14,11 +14,13 @@ from django.utils.translation import ugettext_lazy as _
 from taggit.managers import TaggableManager
 
 from comments.models import CustomComment
-from locations.models import Location
+from locations.models import Location, index_location_content, \
+                             remove_location_content
 from gallery.image import adjust_uploaded_image
 from notifications.models import notify
 from places_core.helpers import truncatehtml, sanitizeHtml
 from places_core.models import ImagableItemMixin, remove_image
+from places_core.slugs import save_with_slug
 
 
 @python_2_unicode_compatible
@@ -76,24 +78,8 @@ class News(ImagableItemMixin):
 
         if self.pk:
             self.edited = True
-        slug = slugify(self.title)
-        if not self.slug:
-            self.slug = slug
-        success = False
-        retries = 0
-        while not success:
-            check = self.__class__.objects.filter(slug=self.slug)\
-                                          .exclude(pk=self.pk).count()
-            if not check:
-                success = True
-            else:
-                # We assume maximum number of 50 elements with the same name.
-                # But the loop should be breaked if something went wrong.
-                if retries >= 50:
-                    raise ValidationError(u"Maximum number of retries exceeded")
-                retries += 1
-                self.slug = "{}-{}".format(slug, retries)
-        super(News, self).save(*args, **kwargs)
+        save_with_slug(self, self.slug or slugify(self.title),
+                       lambda: super(News, self).save(*args, **kwargs))
 
     def get_absolute_url(self):
         return reverse('locations:news_detail', kwargs={
@@ -131,3 +117,5 @@ def notify_about_news_deletion(sender, instance, **kwargs):
 #models.signals.post_delete.connect(notify_about_news_deletion, sender=News)
 models.signals.post_save.connect(adjust_uploaded_image, sender=News)
 models.signals.post_delete.connect(remove_image, sender=News)
+models.signals.post_save.connect(index_location_content, sender=News)
+models.signals.post_delete.connect(remove_location_content, sender=News)
@@ -2,6 +2,7 @@ from django.apps import apps as django_apps
 from django.conf import settings
 from django.core import urlresolvers, paginator
 from django.core.exceptions import ImproperlyConfigured
+from django.db import models
 from django.utils import translation
 from django.utils.six.moves.urllib.parse import urlencode
 from django.utils.six.moves.urllib.request import urlopen
@@ -47,7 +48,7 @@ def ping_google(sitemap_url=None, ping_url=PING_URL):
 class Sitemap(object):
     # This limit is defined by Google. See the index documentation at
     # http://sitemaps.org/protocol.php#index.
-    limit = 2000
+    limit = 50000
 
     # If protocol is None, the URLs in the sitemap will use the protocol
     # with which the sitemap was requested.
@@ -55,6 +56,10 @@ class Sitemap(object):
 
     subdomain = None
 
+    # Field holding last modification date of items, used as lastmod value
+    # and to check if sitemap has changed since it was generated.
+    date_field = None
+
     def __get(self, name, obj, default=None):
         try:
             attr = getattr(self, name)
@@ -70,6 +75,22 @@ class Sitemap(object):
     def location(self, obj):
         return obj.get_absolute_url()
 
+    def lastmod(self, obj):
+        if self.date_field is None:
+            return None
+        return getattr(obj, self.date_field)
+
+    def fingerprint(self):
+        """
+        Summary of items that changes when items are added, removed or
+        modified. Sitemap files are generated again only when it changes.
+        """
+        values = {'count': models.Count('pk')}
+        if self.date_field is not None:
+            values['lastmod'] = models.Max(self.date_field)
+        result = self.items().aggregate(**values)
+        return [result['count'], unicode(result.get('lastmod'))]
+
     def _get_paginator(self):
         return paginator.Paginator(self.items(), self.limit)
     paginator = property(_get_paginator)
@@ -108,10 +129,14 @@ class Sitemap(object):
         return urls
 
     def _urls(self, page, protocol, code, domain):
+        return self.item_urls(self.paginator.page(page).object_list,
+                              protocol, code, domain)
+
+    def item_urls(self, items, protocol, code, domain):
         urls = []
         latest_lastmod = None
         all_items_lastmod = True  # track if all items have a lastmod
-        for item in self.paginator.page(page).object_list:
+        for item in items:
             loc = "%s://%s%s%s" % (protocol, code, domain, self.__get('location', item))
             priority = self.__get('priority', item, None)
             lastmod = self.__get('lastmod', item, None)
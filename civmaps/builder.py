@@ -0,0 +1,180 @@
+# -*- coding: utf-8 -*-
+"""
+Sitemaps generated in background and saved as gzipped files, so crawlers
+don't make us query and render millions of objects on every request.
+
+Files are kept in SITEMAP_ROOT with separate directory for every language
+subdomain (`default` for main domain). Section is generated again only when
+its fingerprint (see `Sitemap.fingerprint`) has changed, and files which
+content didn't change are not rewritten, so they keep their ETag and
+Last-Modified headers.
+"""
+import gzip
+import json
+import os
+from cStringIO import StringIO
+
+from django.conf import settings
+from django.contrib.sites.models import Site
+from django.core import urlresolvers
+from django.template.loader import render_to_string
+
+import logging
+logger = logging.getLogger('tasks')
+
+DEFAULT_CODE = 'default'
+
+
+def sitemap_root():
+    return getattr(settings, 'SITEMAP_ROOT',
+                   os.path.join(settings.MEDIA_ROOT, 'sitemaps'))
+
+
+def site_codes():
+    """ Subdomain codes which get separate sitemaps. """
+    codes = [DEFAULT_CODE]
+    for code, name in settings.LANGUAGES:
+        if code not in codes:
+            codes.append(code)
+    return codes
+
+
+def file_name(section=None, page=1):
+    if section is None:
+        return 'sitemap.xml.gz'
+    return 'sitemap-{}-{}.xml.gz'.format(section, page)
+
+
+def file_path(code, section=None, page=1):
+    return os.path.join(sitemap_root(), code, file_name(section, page))
+
+
+def host_prefix(code):
+    if code == DEFAULT_CODE:
+        return ''
+    return code + '.'
+
+
+def write_file(path, content):
+    """
+    Save gzipped content. File is replaced only when content has changed.
+    Returns True if file was written.
+    """
+    buf = StringIO()
+    archive = gzip.GzipFile(filename='', mode='wb', fileobj=buf, mtime=0)
+    archive.write(content.encode('utf-8'))
+    archive.close()
+    data = buf.getvalue()
+    if os.path.exists(path):
+        with open(path, 'rb') as f:
+            if f.read() == data:
+                return False
+    directory = os.path.dirname(path)
+    if not os.path.isdir(directory):
+        os.makedirs(directory)
+    # Write to temporary file first, so nobody gets half of the file.
+    tmp_path = path + '.tmp'
+    with open(tmp_path, 'wb') as f:
+        f.write(data)
+    os.rename(tmp_path, path)
+    return True
+
+
+def load_manifest():
+    path = os.path.join(sitemap_root(), 'manifest.json')
+    if not os.path.exists(path):
+        return {}
+    with open(path) as f:
+        return json.load(f)
+
+
+def save_manifest(manifest):
+    if not os.path.isdir(sitemap_root()):
+        os.makedirs(sitemap_root())
+    path = os.path.join(sitemap_root(), 'manifest.json')
+    with open(path + '.tmp', 'w') as f:
+        json.dump(manifest, f)
+    os.rename(path + '.tmp', path)
+
+
+def build_section(section, site, domain, protocol):
+    """
+    Write sitemap files for single section. Items are fetched in chunks of
+    `site.limit` ordered by primary key, which gives the same pages as
+    paginator in dynamic view without slow offsets. Returns number of pages.
+    """
+    base = '{}://{}'.format(protocol, domain)
+    items = site.items()
+    page = 0
+    last_pk = None
+    while True:
+        chunk = items
+        if last_pk is not None:
+            chunk = chunk.filter(pk__gt=last_pk)
+        chunk = list(chunk[:site.limit])
+        if not chunk and page > 0:
+            break
+        page += 1
+        urls = site.item_urls(chunk, protocol, '', domain)
+        content = render_to_string('sitemap.xml', {'urlset': urls})
+        for code in site_codes():
+            write_file(file_path(code, section, page), content.replace(
+                base, '{}://{}{}'.format(protocol, host_prefix(code), domain)))
+        if len(chunk) < site.limit:
+            break
+        last_pk = chunk[-1].pk
+    return page
+
+
+def build_index(sections, domain, protocol):
+    """ Write sitemap index listing all files of every section. """
+    for code in site_codes():
+        sites = []
+        for section, pages in sorted(sections.items()):
+            url = '{}://{}{}{}'.format(protocol, host_prefix(code), domain,
+                urlresolvers.reverse('civmaps.views.sitemap',
+                                     kwargs={'section': section}))
+            sites.append(url)
+            for page in range(2, pages + 1):
+                sites.append('{}?p={}'.format(url, page))
+        write_file(file_path(code), render_to_string('sitemap_index.xml',
+                                                     {'sitemaps': sites}))
+
+
+def build_sitemaps(sitemaps, force=False):
+    """
+    Generate files for sections that have changed since last run (or for
+    all sections if `force` is set). Returns list of generated sections.
+    """
+    domain = Site.objects.get_current().domain
+    protocol = getattr(settings, 'SITEMAP_PROTOCOL', 'http')
+    manifest = load_manifest()
+    changed = []
+    for section, site in sitemaps.items():
+        if callable(site):
+            site = site()
+        fingerprint = site.fingerprint()
+        stored = manifest.get(section)
+        if not force and stored is not None and \
+                stored['fingerprint'] == fingerprint:
+            continue
+        pages = build_section(section, site, domain,
+                              site.protocol or protocol)
+        if stored is not None:
+            # Remove pages left after section became shorter
+            for page in range(pages + 1, stored['pages'] + 1):
+                for code in site_codes():
+                    path = file_path(code, section, page)
+                    if os.path.exists(path):
+                        os.remove(path)
+        manifest[section] = {'fingerprint': fingerprint, 'pages': pages}
+        changed.append(section)
+        logger.info(u"Generated {} sitemap pages for {}".format(pages,
+                                                               section))
+    for section in set(manifest) - set(sitemaps):
+        del manifest[section]
+    if changed:
+        build_index(dict((k, v['pages']) for k, v in manifest.items()),
+                    domain, protocol)
+    save_manifest(manifest)
+    return changed
@@ -1,14 +1,19 @@
 from calendar import timegm
 import datetime
+import gzip
+import os
 from functools import wraps
 
 from django.contrib.sites.shortcuts import get_current_site
 from django.core import urlresolvers
 from django.core.paginator import EmptyPage, PageNotAnInteger
-from django.http import Http404
+from django.http import Http404, HttpResponse, HttpResponseNotModified
 from django.template.response import TemplateResponse
 from django.utils import six, translation
 from django.utils.http import http_date
+from django.views.static import was_modified_since
+
+from .builder import DEFAULT_CODE, file_path
 
 
 def x_robots_tag(func):
@@ -20,11 +25,57 @@ def x_robots_tag(func):
     return inner
 
 
+def site_code(request):
+    """ Language subdomain code, e.g. `pl` for pl.civilhub.org. """
+    code = request.META.get('HTTP_HOST', '').split('.')[0]
+    if translation.check_for_language(code):
+        return code
+    return DEFAULT_CODE
+
+
+def serve_file(request, path, content_type):
+    """
+    Serve sitemap generated in background (see civmaps.builder). Returns
+    None if file doesn't exist, so sitemap may be created on the fly.
+    """
+    try:
+        stat = os.stat(path)
+    except OSError:
+        return None
+    etag = '"{:x}-{:x}"'.format(int(stat.st_mtime), stat.st_size)
+    if request.META.get('HTTP_IF_NONE_MATCH') == etag or \
+            (request.META.get('HTTP_IF_NONE_MATCH') is None and
+             not was_modified_since(
+                request.META.get('HTTP_IF_MODIFIED_SINCE'),
+                stat.st_mtime, stat.st_size)):
+        response = HttpResponseNotModified()
+    elif 'gzip' in request.META.get('HTTP_ACCEPT_ENCODING', ''):
+        with open(path, 'rb') as f:
+            response = HttpResponse(f.read(), content_type=content_type)
+        response['Content-Encoding'] = 'gzip'
+    else:
+        archive = gzip.open(path, 'rb')
+        try:
+            response = HttpResponse(archive.read(), content_type=content_type)
+        finally:
+            archive.close()
+    response['ETag'] = etag
+    response['Last-Modified'] = http_date(stat.st_mtime)
+    response['Vary'] = 'Accept-Encoding'
+    response['Cache-Control'] = 'public, max-age=3600'
+    return response
+
+
 @x_robots_tag
 def index(request, sitemaps,
           template_name='sitemap_index.xml', content_type='application/xml',
           sitemap_url_name='civmaps.views.sitemap'):
 
+    response = serve_file(request, file_path(site_code(request)),
+                          content_type)
+    if response is not None:
+        return response
+
     req_protocol = request.scheme
     req_site = get_current_site(request)
 
@@ -54,6 +105,17 @@ def index(request, sitemaps,
 def sitemap(request, sitemaps, section=None,
             template_name='sitemap.xml', content_type='application/xml'):
 
+    page = request.GET.get("p", 1)
+    if section is not None and section in sitemaps:
+        try:
+            page = int(page)
+        except ValueError:
+            raise Http404("No page '%s'" % page)
+        response = serve_file(request, file_path(site_code(request), section,
+                              page), content_type)
+        if response is not None:
+            return response
+
     req_protocol = request.scheme
     req_site = get_current_site(request)
 
@@ -69,7 +131,6 @@ def sitemap(request, sitemaps, section=None,
         maps = [sitemaps[section]]
     else:
         maps = list(six.itervalues(sitemaps))
-    page = request.GET.get("p", 1)
 
     urls = []
     for site in maps:
@@ -7,15 +7,27 @@ from django.http import Http404
 from django.utils import timezone
 from django.utils.translation import ugettext as _
 
-from rest_framework import mixins, status, permissions, viewsets
+from rest_framework import generics, mixins, status, permissions, viewsets
 from rest_framework.decorators import action, link
 from rest_framework.response import Response
 from rest_framework.views import APIView
 
 from userspace.serializers import UserDetailSerializer
 
+from .helpers import prefetch_content_objects, prefetch_permissions
 from .models import CustomComment, CommentVote
-from .serializers import CustomCommentSerializer, CommentDetailSerializer
+from .serializers import CustomCommentSerializer, CommentDetailSerializer, \
+                         CommentTreeSerializer
+
+
+def annotate_comments(queryset):
+    """
+    Fetch authors and answer counts together with comments, so serializing
+    list of comments doesn't need additional queries for every item.
+    """
+    return queryset.select_related('user__profile')\
+                   .prefetch_related('user__organizations')\
+                   .annotate(answer_count=Count('children', distinct=True))
 
 
 class CommentUpdateModelMixin(mixins.UpdateModelMixin):
@@ -138,11 +150,16 @@ class CommentList(mixins.CreateModelMixin,
                            parent__isnull=True)
         elif parent is not None:
             qs = qs.filter(parent__id=parent)
+        if self.request.method == 'GET':
+            qs = annotate_comments(qs)
         order = self.request.QUERY_PARAMS.get('o')
         if order == 'old':
             return qs.order_by('submit_date')
         elif order == 'votes':
-            qs = qs.annotate(num_votes=Count('votes'))
+            # Stored counters, so votes table is not joined
+            table = CustomComment._meta.db_table
+            qs = qs.extra(select={'num_votes': '{0}.votes_up_count + '
+                                  '{0}.votes_down_count'.format(table)})
             return qs.order_by('-num_votes', '-submit_date')
         return qs.order_by('-submit_date')
 
@@ -152,6 +169,13 @@ class CommentList(mixins.CreateModelMixin,
         else:
             return CommentDetailSerializer
 
+    def paginate_queryset(self, queryset, page_size=None):
+        page = super(CommentList, self).paginate_queryset(queryset, page_size)
+        if page is not None:
+            page.object_list = prefetch_permissions(
+                prefetch_content_objects(page.object_list), self.request.user)
+        return page
+
     def pre_save(self, obj):
         obj.user = self.request.user
         obj.submit_date = timezone.now()
@@ -227,6 +251,70 @@ class CommentAnswers(APIView):
         pk = request.QUERY_PARAMS.get('pk')
         if pk is None:
             raise Http404
-        qs = self.model.objects.filter(parent__id=pk)
-        serializer = CommentDetailSerializer(qs, many=True)
+        qs = annotate_comments(self.model.objects.filter(parent__id=pk))
+        serializer = CommentDetailSerializer(prefetch_content_objects(qs),
+                                             many=True)
         return Response(serializer.data)
+
+
+class CommentTree(generics.ListAPIView):
+    """
+    Whole discussion as flat list of comments in tree order, so entire
+    thread (or its part) may be presented with one request instead of
+    asking for answers of every comment separately. Every item carries
+    its `level` and `answers` count. Pass `ct` and `pk` to get discussion
+    for given object, or `root` to get replies for selected comment, eg:
+
+        /api-comments/tree/?ct=43&pk=1
+        /api-comments/tree/?root=25
+
+    Optional `depth` limits how many levels of answers are included below
+    first level (all by default, `depth=0` gives first level only). Threads
+    are sorted from the newest one, pass `o=old` to reverse this order.
+    Replies inside threads are always in tree order.
+    Results are paginated, `page` and `per_page` params are allowed.
+    """
+    model = CustomComment
+    serializer_class = CommentTreeSerializer
+    paginate_by = 50
+    paginate_by_param = 'per_page'
+    max_paginate_by = 200
+
+    def get_queryset(self):
+        params = self.request.QUERY_PARAMS
+        try:
+            depth = int(params.get('depth'))
+        except (TypeError, ValueError):
+            depth = None
+        qs = self.model.objects.all()
+        root = params.get('root')
+        if root is not None:
+            try:
+                root = self.model.objects.get(pk=root)
+            except (self.model.DoesNotExist, ValueError):
+                raise Http404
+            qs = qs.filter(tree_id=root.tree_id, lft__gt=root.lft,
+                           rght__lt=root.rght)
+            level = root.level + 1
+        elif params.get('ct') is not None and params.get('pk') is not None:
+            qs = qs.filter(content_type__id=params['ct'],
+                           object_pk=params['pk'])
+            level = 0
+        else:
+            raise Http404
+        if depth is not None:
+            qs = qs.filter(level__lte=level + depth)
+        # Every root comment has separate tree, so tree_id follows
+        # order of creation and lft gives depth-first order in thread.
+        if params.get('o') == 'old':
+            qs = qs.order_by('tree_id', 'lft')
+        else:
+            qs = qs.order_by('-tree_id', 'lft')
+        return annotate_comments(qs)
+
+    def paginate_queryset(self, queryset, page_size=None):
+        page = super(CommentTree, self).paginate_queryset(queryset, page_size)
+        if page is not None:
+            page.object_list = prefetch_permissions(
+                prefetch_content_objects(page.object_list), self.request.user)
+        return page
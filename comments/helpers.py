@@ -2,10 +2,12 @@
 import re
 
 from django.contrib.auth.models import User
+from django.contrib.contenttypes.models import ContentType
 from django.utils.translation import ugettext as _
 
 from civmail.messages import CommentNotify
-from notifications.models import notify
+from notifications.models import notify_many
+from places_core.permissions import moderated_subset
 
 from .config import get_config
 
@@ -31,16 +33,14 @@ def notify_author(obj):
 def mention_notify(comment):
     """ Notify mentioned users when comment is created.
     """
-    for match in userreg.finditer(comment.comment):
-        try:
-            user = User.objects.get(username=match.groups()[0])
-        except User.DoesNotExist:
-            user = None
-        if user is not None and user != comment.user:
-            notify(comment.user, user,
-                key="customcomment",
-                verb=NOTIFY_VERB,
-                action_target=comment)
+    usernames = set(x.groups()[0] for x in userreg.finditer(comment.comment))
+    if not usernames:
+        return
+    notify_many(comment.user,
+        User.objects.filter(username__in=usernames).exclude(pk=comment.user.pk),
+        key="customcomment",
+        verb=NOTIFY_VERB,
+        action_target=comment)
 
 
 def parse_mentions(comment):
@@ -52,3 +52,40 @@ def parse_mentions(comment):
             user.pk, user.username, user.get_full_name())
         comment = comment.replace(match.group(), html)
     return comment
+
+
+def prefetch_content_objects(comments):
+    """
+    Fetch commented objects for list of comments with one query per content
+    type, so serializers don't run separate query for every comment.
+    Returns list of comments.
+    """
+    comments = list(comments)
+    id_lists = {}
+    for comment in comments:
+        id_lists.setdefault(comment.content_type_id, set())\
+                .add(comment.object_pk)
+    objects = {}
+    for ct_id, id_list in id_lists.iteritems():
+        model = ContentType.objects.get_for_id(ct_id).model_class()
+        if model is None:
+            continue
+        for pk, obj in model._default_manager.in_bulk(list(id_list)).iteritems():
+            objects[(ct_id, unicode(pk))] = obj
+    for comment in comments:
+        comment._content_object_cache = objects.get(
+            (comment.content_type_id, unicode(comment.object_pk)))
+    return comments
+
+
+def prefetch_permissions(comments, user):
+    """
+    Check with single query which commented objects are placed in locations
+    moderated by user. Results are remembered until the end of request, so
+    `has_permission` of every comment doesn't need to query database.
+    """
+    if user.is_authenticated():
+        moderated_subset(user, set(
+            x.content_object.location_id for x in comments
+            if hasattr(x.content_object, 'location_id')))
+    return comments
@@ -0,0 +1,39 @@
+# -*- coding: utf-8 -*-
+from __future__ import unicode_literals
+
+from django.db import models
+from django.db.models import Count
+
+from places_core.tallies import add_tallies, reconcile
+
+# Counters kept in CustomComment model, see places_core.tallies.
+TALLY_FIELDS = ('votes_up_count', 'votes_down_count', 'score', )
+
+
+def vote_tally(vote):
+    """ Counters that single vote adds to its comment. """
+    if vote:
+        return {'votes_up_count': 1, 'score': 1}
+    return {'votes_down_count': 1, 'score': -1}
+
+
+def recount_comment_votes(comment_model, vote_model):
+    """
+    Recalculate counters for all comments with single grouped query. Model
+    classes are passed as arguments, so we can use it in migrations.
+    Returns number of fixed comments.
+    """
+    counts = {}
+    votes = vote_model.objects.values_list('comment', 'vote')
+    for comment_id, vote, total in votes.annotate(total=Count('pk')):
+        tally = dict((k, v * total) for k, v in vote_tally(vote).iteritems())
+        counts[comment_id] = add_tallies(counts.get(comment_id, {}), tally)
+    return reconcile(comment_model, counts, TALLY_FIELDS)
+
+
+class CommentVoteManager(models.Manager):
+    """ Manager for comment votes. """
+    def recount(self):
+        """ Fix vote counters stored in comments. """
+        comment_model = self.model._meta.get_field('comment').rel.to
+        return recount_comment_votes(comment_model, self.model)
@@ -0,0 +1,40 @@
+# -*- coding: utf-8 -*-
+from __future__ import unicode_literals
+
+from django.db import models, migrations
+
+from comments.managers import recount_comment_votes
+
+
+def count_votes(apps, schema_editor):
+    recount_comment_votes(apps.get_model('comments', 'CustomComment'),
+                          apps.get_model('comments', 'CommentVote'))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('comments', '0003_customcomment_reason'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='customcomment',
+            name='votes_up_count',
+            field=models.PositiveIntegerField(default=0),
+            preserve_default=True,
+        ),
+        migrations.AddField(
+            model_name='customcomment',
+            name='votes_down_count',
+            field=models.PositiveIntegerField(default=0),
+            preserve_default=True,
+        ),
+        migrations.AddField(
+            model_name='customcomment',
+            name='score',
+            field=models.IntegerField(default=0),
+            preserve_default=True,
+        ),
+        migrations.RunPython(count_votes),
+    ]
@@ -11,12 +11,14 @@ from django.utils.translation import ugettext_lazy as _
 
 from mptt.models import MPTTModel, TreeForeignKey
 
-from notifications.models import notify
+from notifications.models import notify, notify_many
 from places_core.config import ABUSE_REASONS
 from places_core.helpers import sanitizeHtml
 from places_core.permissions import is_moderator
+from places_core.tallies import move_tally, tally_safe_kwargs
 
 from .helpers import mention_notify, notify_author
+from .managers import TALLY_FIELDS, CommentVoteManager, vote_tally
 
 
 class CustomComment(MPTTModel, Comment):
@@ -29,14 +31,18 @@ class CustomComment(MPTTModel, Comment):
                                     related_name='children')
     reason = models.PositiveIntegerField(choices=REASONS, default=6,
                                          verbose_name=_(u"reason"))
+    # Vote counters maintained by CommentVote signals
+    votes_up_count = models.PositiveIntegerField(default=0)
+    votes_down_count = models.PositiveIntegerField(default=0)
+    score = models.IntegerField(default=0)
 
     @property
     def upvotes(self):
-        return len(self.votes.filter(vote=True))
+        return self.votes_up_count
 
     @property
     def downvotes(self):
-        return len(self.votes.filter(vote=False))
+        return self.votes_down_count
 
     @property
     def note(self):
@@ -46,22 +52,22 @@ class CustomComment(MPTTModel, Comment):
         self.comment = sanitizeHtml(self.comment)
         if not self.pk:
             mention_notify(self)
+        # Vote counters are changed only by vote signals
+        if not args:
+            kwargs = tally_safe_kwargs(self, TALLY_FIELDS, kwargs)
         super(CustomComment, self).save(*args, **kwargs)
 
     def get_reply_comments(self):
         return len(CustomComment.objects.filter(parent=self))
 
     def get_upvotes(self):
-        return len(self.votes.filter(vote=True))
+        return self.votes_up_count
 
     def get_downvotes(self):
-        return len(self.votes.filter(vote=False))
+        return self.votes_down_count
 
     def calculate_votes(self):
-        votes_total = self.votes
-        votes_up = len(votes_total.filter(vote=True))
-        votes_down = len(votes_total.filter(vote=False))
-        return votes_up - votes_down
+        return self.score
 
     def get_absolute_url(self):
         """
@@ -80,8 +86,8 @@ class CustomComment(MPTTModel, Comment):
         if user.is_superuser:
             return True
         if self.content_object is not None:
-            if hasattr(self.content_object, 'location'):
-                return is_moderator(user, self.content_object.location)
+            if hasattr(self.content_object, 'location_id'):
+                return is_moderator(user, self.content_object.location_id)
         return False
 
     def toggle(self, vote=None):
@@ -116,6 +122,8 @@ class CommentVote(models.Model):
     comment = models.ForeignKey(CustomComment, related_name='votes')
     date_voted = models.DateTimeField(auto_now_add=True)
 
+    objects = CommentVoteManager()
+
     class Meta:
         verbose_name = _(u"comment vote")
         verbose_name_plural = _(u"comment votes")
@@ -140,13 +148,12 @@ def comment_notification(sender, instance, created, **kwargs):
         return True
     if instance.content_object.__class__.__name__ == 'Task':
         # Special case - send notifications to all task participants
-        for user in instance.content_object.participants.exclude(
-            pk=instance.user.pk):
-            notify(instance.user, user,
-                key="comment",
-                verb=_(u"commented task"),
-                action_object=instance,
-                action_target=instance.content_object)
+        notify_many(instance.user,
+            instance.content_object.participants.exclude(pk=instance.user.pk),
+            key="comment",
+            verb=_(u"commented task"),
+            action_object=instance,
+            action_target=instance.content_object)
     if instance.content_object.__class__.__name__ == 'Marker':
         # Special case - map markers for votes.
         return True
@@ -170,3 +177,30 @@ def comment_notification(sender, instance, created, **kwargs):
 
 
 models.signals.post_save.connect(comment_notification, sender=CustomComment)
+
+
+def remember_vote_state(sender, instance, raw, **kwargs):
+    """ Store counters of edited vote before it's saved. """
+    instance._tally_origin = None
+    if instance.pk is None or raw:
+        return
+    origin = CommentVote.objects.filter(pk=instance.pk)\
+                                .values_list('comment', 'vote').first()
+    if origin is not None:
+        instance._tally_origin = (origin[0], vote_tally(origin[1]))
+
+
+def update_vote_tally(sender, instance, raw, **kwargs):
+    """ Update comment vote counters in the same transaction. """
+    move_tally(CustomComment, getattr(instance, '_tally_origin', None),
+               (instance.comment_id, vote_tally(instance.vote)))
+
+
+def remove_vote_tally(sender, instance, **kwargs):
+    move_tally(CustomComment, (instance.comment_id, vote_tally(instance.vote)),
+               None)
+
+
+models.signals.pre_save.connect(remember_vote_state, sender=CommentVote)
+models.signals.post_save.connect(update_vote_tally, sender=CommentVote)
+models.signals.post_delete.connect(remove_vote_tally, sender=CommentVote)
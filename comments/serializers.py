@@ -8,6 +8,7 @@ from rest_framework import serializers
 from userspace.serializers import UserDetailSerializer
 
 from .helpers import parse_mentions
+from .managers import TALLY_FIELDS
 from .models import CustomComment, CommentVote
 
 
@@ -18,6 +19,7 @@ class CustomCommentSerializer(serializers.ModelSerializer):
 
     class Meta:
         model = CustomComment
+        read_only_fields = TALLY_FIELDS
 
 
 class CommentDetailSerializer(serializers.ModelSerializer):
@@ -50,6 +52,9 @@ class CommentDetailSerializer(serializers.ModelSerializer):
         return json.loads(data)[0]
 
     def get_answer_count(self, obj):
+        if hasattr(obj, 'answer_count'):
+            # Annotated in query
+            return obj.answer_count
         return obj.children.count()
 
     def check_permission(self, obj):
@@ -72,6 +77,18 @@ class CommentDetailSerializer(serializers.ModelSerializer):
                   'is_owner', )
 
 
+class CommentTreeSerializer(CommentDetailSerializer):
+    """
+    Comment presented as part of flat list of entire thread. `level` tells
+    how deep in the tree comment is placed.
+    """
+    level = serializers.Field(source='level')
+
+    class Meta:
+        model = CustomComment
+        fields = CommentDetailSerializer.Meta.fields + ('level', )
+
+
 class CommentVoteSerializer(serializers.ModelSerializer):
     """
     This serializer is very simple, it will help us combine front-end scripts
@@ -42,3 +42,54 @@ class CommentVotesTestCase(TestCase):
         )
         vote = CommentVote.objects.create(user=self.user, comment=comment, vote=True)
         self.assertIsInstance(vote.__str__(), str)
+
+    def test_comment_vote_counters(self):
+        """ Votes are counted in comment fields. """
+        comment = CustomComment.objects.create(
+            content_type = ContentType.objects.get_for_model(Idea),
+            object_pk = self.idea.pk,
+            user = self.testuser,
+            comment = "This is test comment",
+            submit_date = timezone.now(),
+            site_id = 1
+        )
+        CommentVote.objects.create(user=self.user, comment=comment, vote=True)
+        vote = CommentVote.objects.create(user=self.testuser, comment=comment,
+                                          vote=True)
+        vote.vote = False
+        vote.save()
+        comment = CustomComment.objects.get(pk=comment.pk)
+        self.assertEqual((comment.upvotes, comment.downvotes), (1, 1))
+        vote.delete()
+        comment = CustomComment.objects.get(pk=comment.pk)
+        self.assertEqual(comment.calculate_votes(), 1)
+
+    def test_comment_tree(self):
+        """ Whole thread is returned in tree order with answer counts. """
+        ct = ContentType.objects.get_for_model(Idea)
+
+        def create_comment(parent=None):
+            return CustomComment.objects.create(
+                content_type = ct,
+                object_pk = self.idea.pk,
+                user = self.testuser,
+                comment = "This is test comment",
+                submit_date = timezone.now(),
+                site_id = 1,
+                parent = parent
+            )
+
+        first = create_comment()
+        answer = create_comment(first)
+        reply = create_comment(answer)
+        second = create_comment()
+        url = '/api-comments/tree/'
+        response = self.client.get(url, {'ct': ct.pk, 'pk': self.idea.pk})
+        results = response.data['results']
+        self.assertEqual([x['id'] for x in results],
+                         [second.pk, first.pk, answer.pk, reply.pk])
+        self.assertEqual([x['level'] for x in results], [0, 0, 1, 2])
+        self.assertEqual([x['answers'] for x in results], [0, 1, 1, 0])
+        response = self.client.get(url, {'root': first.pk, 'depth': 0})
+        self.assertEqual([x['id'] for x in response.data['results']],
+                         [answer.pk])
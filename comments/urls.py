@@ -10,6 +10,8 @@ router = HybridRouter()
 router.register('list', api.CommentList, 'list')
 router.add_api_view('answers', url(r'^answers/', api.CommentAnswers.as_view(),
                                    name='answers'))
+router.add_api_view('tree', url(r'^tree/', api.CommentTree.as_view(),
+                                name='tree'))
 
 urlpatterns = patterns('',
     url('^summary/(?P<content_ct>\d+)/(?P<content_pk>\d+)', CommentSummaryView.as_view(), name="summary"),
@@ -45,11 +45,7 @@ def get_comment_votes(comment):
     """
     Get total votes on this comment
     """
-    total_votes = CommentVote.objects.filter(idea=comment)
-    votes_up = len(total_votes.filter(vote=True))
-    votes_down = len(total_votes.filter(vote=False))
-
-    return votes_up - votes_down
+    return comment.calculate_votes()
 
 
 def get_comment_tree(request, object_id, app_label, model_label):
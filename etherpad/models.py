@@ -13,6 +13,8 @@ from django.contrib.contenttypes.models import ContentType
 from django.utils.translation import ugettext_lazy as _
 from django.utils.encoding import python_2_unicode_compatible
 
+from places_core.slugs import save_with_slug
+
 from .client import EtherpadException, EtherpadLiteClient
 
 # Models in this group will not work properly without server enabled.
@@ -126,25 +128,8 @@ class Pad(EtherpadBaseModel):
                 groupID=str(self.group.etherpad_id),
                 padName=str(self.name))
         # Provide auto-generated unique slug for all pads - useful for SEO
-        slug = slugify(self.name)
-        if not self.slug:
-            self.slug = slug
-        success = False
-        retries = 0
-        while not success:
-            check = self.__class__.objects.filter(slug=self.slug)\
-                                          .exclude(pk=self.pk).count()
-            if not check:
-                success = True
-            else:
-                # We assume maximum number of 50 elements with the same name.
-                # But the loop should be breaked if something went wrong.
-                # Or shouldn't it?
-                if retries >= 50:
-                    raise ValidationError(u"Maximum number of retries exceeded")
-                retries += 1
-                self.slug = "{}-{}".format(slug, retries)
-        super(Pad, self).save(*args, **kwargs)
+        save_with_slug(self, self.slug or slugify(self.name),
+                       lambda: super(Pad, self).save(*args, **kwargs))
 
     def destroy(self, *args, **kwargs):
         self.client.deletePad(padID=self.pad_id)
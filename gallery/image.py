@@ -1,6 +1,7 @@
 # -*- coding: utf-8 -*-
 import os
 import re
+import shutil
 import StringIO
 
 from PIL import Image
@@ -8,7 +9,7 @@ from PIL import Image
 from django.conf import settings
 from django.core.files.uploadedfile import InMemoryUploadedFile
 
-from .image_manager import ImageManager
+from .image_manager import crop_thumbnail, perform_smart_cut
 
 
 def rename_background_file(filepath, pref="s_"):
@@ -108,8 +109,14 @@ def resize_background_image(sender, instance, created, **kwargs):
         return False
 
     max_width, max_height = settings.BACKGROUND_IMAGE_SIZE
-    im = ImageManager(fieldname.path, "/".join(fieldname.path.split('/')[:-1]))
-    im.fixed_thumb(max_width, max_height)
+    path, ext = os.path.splitext(fieldname.path)
+    name = lambda w, h, suffix='': "{}_{}x{}{}.jpg".format(path, w, h, suffix)
+    schedule_derivatives(fieldname.path, [
+        (name(max_width, max_height, '@2x'), 'cut',
+            (max_width * 2, max_height * 2)),
+        (name(max_width, max_height), 'cut', (max_width, max_height)),
+        (name(270, 190), 'background_thumb', (270, 190)),
+    ])
 
 
 def delete_background_image(sender, instance, **kwargs):
@@ -141,29 +148,9 @@ def crop_gallery_thumb(sender, instance, **kwargs):
         path = os.path.join(settings.MEDIA_ROOT, instance.location.slug)
     else:
         path = os.path.join(settings.MEDIA_ROOT, instance.user.username)
-    image = Image.open(instance.get_filename())
-    max_w, max_h = settings.GALLERY_THUMB_SIZE
-    width, height = image.getdata().size
-    if height > width:
-        ratio = float(max_w)/float(width)
-        image = image.resize((max_w, int(height*ratio)), Image.ANTIALIAS)
-        box = (0, 0, max_w, max_h)
-    else:
-        ratio = float(max_h)/float(height)
-        new_width = int(width*ratio)
-        image = image.resize((new_width, max_h), Image.ANTIALIAS)
-        start_x = 0
-        x_factor = max_w
-        if new_width > max_w:
-            start_x = int((float(new_width)-float(max_w))/2)
-        if new_width < max_w:
-            nratio = float(max_w)/float(new_width)
-            cw, ch = image.getdata().size
-            image = image.resize((max_w, int(float(ch)*nratio)), Image.ANTIALIAS)
-        stop_x = start_x + x_factor
-        box = (start_x, 0, stop_x, max_h)
-    image = image.crop(box)
-    image.save(os.path.join(path, filename), 'JPEG')
+    schedule_derivatives(instance.get_filename(), [
+        (os.path.join(path, filename), 'crop', settings.GALLERY_THUMB_SIZE),
+    ])
 
 
 def delete_cropped_thumb(sender, instance, **kwargs):
@@ -239,23 +226,21 @@ def adjust_uploaded_image(sender, instance, **kwargs):
     # Ignoruj wpisy z domyślnymi obrazami
     if instance.image.name == settings.DEFAULT_IMG_PATH:
         return True
-    # Zapisz kopię oryginału jako JPEG
-    base_image = Image.open(instance.image.path)
     filename = os.path.splitext(instance.image.path)[0]
-    base_image.save("{}.jpg".format(filename), 'JPEG')
     # Rozmiar obrazów i miniatur pobieramy z ustawień globalnych
     width, height = settings.DEFAULT_IMG_SIZE
     t_width, t_height = settings.DEFAULT_THUMB_SIZE
-    # Normalne obrazki w pełnych wymiarach
-    image = resize_image(base_image, (width * 2, height * 2))
-    image.save("{}_fx@2x.jpg".format(filename), 'JPEG')
-    image = resize_image(base_image, (width, height))
-    image.save("{}_fx.jpg".format(filename), 'JPEG')
-    # Miniatury do pokazania w widokach list i aktywności
-    image = resize_image(base_image, (t_width * 2, t_height * 2))
-    image.save("{}_thumbnail@2x.jpg".format(filename), 'JPEG')
-    image = resize_image(base_image, (t_width, t_height))
-    image.save("{}_thumbnail.jpg".format(filename), 'JPEG')
+    schedule_derivatives(instance.image.path, [
+        # Kopia oryginału jako JPEG
+        ("{}.jpg".format(filename), 'copy', None),
+        # Normalne obrazki w pełnych wymiarach
+        ("{}_fx@2x.jpg".format(filename), 'fit', (width * 2, height * 2)),
+        ("{}_fx.jpg".format(filename), 'fit', (width, height)),
+        # Miniatury do pokazania w widokach list i aktywności
+        ("{}_thumbnail@2x.jpg".format(filename), 'fit',
+            (t_width * 2, t_height * 2)),
+        ("{}_thumbnail.jpg".format(filename), 'fit', (t_width, t_height)),
+    ])
 
 
 # Functions and methods for ContentObjectGallery and ContentObjectPicture
@@ -306,12 +291,85 @@ def crop(image, max_size):
 def generate_thumbs(filepath):
     """ Creates thumbs for all selected sizes for ContentObjectPicture.
     """
-    image = Image.open(filepath)
-
     # First convert all uploaded originals to JPG format
+    outputs = [(filepath, 'copy', None), ]
+    for label, size in settings.CO_THUMB_SIZES.iteritems():
+        outputs.append((fix_path(filepath, label), 'crop', size))
+    schedule_derivatives(filepath, outputs)
+
+
+# Image derivatives
+# ------------------------------------------------------------------------------
+
+
+def fit_thumbnail(image, size):
+    image = image.copy()
+    image.thumbnail(size, Image.ANTIALIAS)
+    return image
+
+
+def background_thumb(image, size):
+    """ Thumbnail cut out from resized background image. """
+    return crop_thumbnail(perform_smart_cut(image,
+                          settings.BACKGROUND_IMAGE_SIZE), size)
+
+
+# Operations available for derivatives. Every one of them takes decoded
+# image and size and returns new image.
+DERIVATIVE_OPERATIONS = {
+    'fit': resize_image,
+    'crop': crop,
+    'cut': perform_smart_cut,
+    'thumbnail': fit_thumbnail,
+    'background_thumb': background_thumb,
+}
+
+# Operations that need image larger than their output size
+DECODE_SIZES = {
+    'background_thumb': settings.BACKGROUND_IMAGE_SIZE,
+}
+
+
+def render_derivatives(source, outputs, draft=True):
+    """
+    Create all derivatives of image with single decoding. `outputs` is list
+    of (path, operation, size) entries, operation 'copy' saves entire image.
+    JPEG files are decoded in draft mode at lowest scale that is still large
+    enough for every requested size. Files are replaced atomically, so
+    placeholders are never seen half-written. Returns number of saved files.
+    """
+    image = Image.open(source)
+    # Don't compress JPEG original again when we just want it as JPEG
+    outputs = [x for x in outputs if not (x[1] == 'copy' and
+               x[0] == source and image.format == 'JPEG')]
+    sizes = [DECODE_SIZES.get(x[1], x[2]) for x in outputs]
+    if draft and sizes and None not in sizes:
+        image.draft('RGB', (max(x[0] for x in sizes),
+                            max(x[1] for x in sizes)))
     image = image.convert('RGB')
-    image.save(filepath, 'JPEG')
+    for path, operation, size in outputs:
+        if operation == 'copy':
+            result = image
+        else:
+            result = DERIVATIVE_OPERATIONS[operation](image, tuple(size))
+        tmp_path = path + '.tmp'
+        result.save(tmp_path, 'JPEG')
+        os.rename(tmp_path, path)
+    return len(outputs)
 
-    for label, size in settings.CO_THUMB_SIZES.iteritems():
-        thumb = crop(image.copy(), size)
-        thumb.save(fix_path(filepath, label), 'JPEG')
+
+def schedule_derivatives(source, outputs):
+    """
+    Create image derivatives in background when IMAGE_ASYNC setting is
+    enabled. Missing files are replaced with placeholder image until they
+    are ready, so their URLs may be used right away.
+    """
+    if not getattr(settings, 'IMAGE_ASYNC', False):
+        return render_derivatives(source, outputs)
+    from .tasks import create_derivatives
+    placeholder = os.path.join(settings.MEDIA_ROOT, settings.DEFAULT_IMG_PATH)
+    for path, operation, size in outputs:
+        if not os.path.exists(path) and os.path.exists(placeholder):
+            shutil.copyfile(placeholder, path)
+    create_derivatives.delay(source, outputs)
+    return 0
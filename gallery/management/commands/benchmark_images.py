@@ -0,0 +1,58 @@
+# -*- coding: utf-8 -*-
+import os
+import shutil
+import tempfile
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from gallery.image import render_derivatives
+
+
+class Command(BaseCommand):
+    """
+    Measure how fast derivatives of uploaded images are created. Every image
+    from given directory is processed in the old way (image decoded again
+    for every size) and with single decoding in draft mode, the same way
+    as uploaded images of ideas, news, polls and discussions.
+    """
+    args = '<directory>'
+
+    def outputs(self, dirname, source):
+        name = os.path.join(dirname,
+                            os.path.splitext(os.path.basename(source))[0])
+        width, height = settings.DEFAULT_IMG_SIZE
+        t_width, t_height = settings.DEFAULT_THUMB_SIZE
+        return [
+            ("{}_fx@2x.jpg".format(name), 'fit', (width * 2, height * 2)),
+            ("{}_fx.jpg".format(name), 'fit', (width, height)),
+            ("{}_thumbnail@2x.jpg".format(name), 'fit',
+                (t_width * 2, t_height * 2)),
+            ("{}_thumbnail.jpg".format(name), 'fit', (t_width, t_height)),
+        ]
+
+    def handle(self, *args, **options):
+        if len(args) != 1 or not os.path.isdir(args[0]):
+            raise CommandError(u"Pass directory with sample images")
+        files = [os.path.join(args[0], x) for x in sorted(os.listdir(args[0]))
+                 if os.path.splitext(x)[1].lower() in ('.jpg', '.jpeg', '.png')]
+        if not files:
+            raise CommandError(u"No images found")
+        dirname = tempfile.mkdtemp()
+        try:
+            start = time.time()
+            for filename in files:
+                for output in self.outputs(dirname, filename):
+                    render_derivatives(filename, [output], draft=False)
+            legacy = time.time() - start
+            start = time.time()
+            for filename in files:
+                render_derivatives(filename, self.outputs(dirname, filename))
+            single = time.time() - start
+        finally:
+            shutil.rmtree(dirname)
+        for label, elapsed in ((u"Decoded for every size", legacy),
+                               (u"Decoded once in draft mode", single)):
+            self.stdout.write(u"{}: {:.2f}s, {:.1f} images/s".format(
+                              label, elapsed, len(files) / elapsed))
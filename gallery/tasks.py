@@ -0,0 +1,17 @@
+# -*- coding: utf-8 -*-
+from celery import task
+
+from .image import render_derivatives
+
+import logging
+logger = logging.getLogger('tasks')
+
+
+@task(name='gallery.create_derivatives')
+def create_derivatives(source, outputs):
+    """ Create resized copies of uploaded image (see gallery.image). """
+    try:
+        return render_derivatives(source, outputs)
+    except (IOError, OSError) as ex:
+        logger.error(u"Cannot create derivatives of {}: {}".format(source, ex))
+        return 0
@@ -1,3 +1,34 @@
+import os
+import shutil
+import tempfile
+
+from PIL import Image
+
 from django.test import TestCase
 
-# Create your tests here.
+from .image import render_derivatives
+
+
+class DerivativesTestCase(TestCase):
+    """ Resized copies of uploaded images. """
+    def setUp(self):
+        self.dirname = tempfile.mkdtemp()
+        self.source = os.path.join(self.dirname, 'photo.jpg')
+        Image.new('RGB', (2000, 1500), 'red').save(self.source, 'JPEG')
+
+    def tearDown(self):
+        shutil.rmtree(self.dirname)
+
+    def test_all_sizes_are_created(self):
+        outputs = [
+            (os.path.join(self.dirname, 'fit.jpg'), 'fit', (680, 680)),
+            (os.path.join(self.dirname, 'crop.jpg'), 'crop', (60, 60)),
+            (os.path.join(self.dirname, 'thumb.jpg'), 'thumbnail', (100, 100)),
+        ]
+        self.assertEqual(render_derivatives(self.source, outputs), 3)
+        sizes = [Image.open(x[0]).size for x in outputs]
+        self.assertEqual(sizes, [(680, 510), (60, 60), (100, 75)])
+
+    def test_jpeg_original_is_not_saved_again(self):
+        outputs = [(self.source, 'copy', None), ]
+        self.assertEqual(render_derivatives(self.source, outputs), 0)
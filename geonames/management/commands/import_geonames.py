@@ -0,0 +1,68 @@
+# -*- coding: utf-8 -*-
+import multiprocessing, time
+
+from optparse import make_option
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections
+
+from geonames.storage import BATCH_SIZE, IMPORTERS, file_segments, \
+                             import_file, import_segment
+
+
+class Command(BaseCommand):
+    """
+    Import geonames dump file in batches. Kind of file is one of: countries
+    (countryInfo.txt), admin_codes (admin1CodesASCII.txt), geonames
+    (allCountries.txt) or alt_names (alternateNames.txt). Alternate names
+    are saved only for objects already present in database, so import them
+    last.
+
+    OPTIONS
+        --batch-size    Number of rows saved at once (default 5000)
+        --workers       Number of processes importing file segments
+        --update        Replace existing entries instead of skipping them
+    """
+    args = '<kind> <path>'
+    option_list = BaseCommand.option_list + (
+        make_option('--batch-size', dest='batch_size', type='int',
+            default=BATCH_SIZE, help=u"Number of rows saved at once"),
+        make_option('--workers', dest='workers', type='int', default=1,
+            help=u"Number of worker processes"),
+        make_option('--update', dest='update', action='store_true',
+            default=False, help=u"Replace existing entries"),
+    )
+
+    def progress(self, read, saved):
+        self.read += read
+        self.saved += saved
+        elapsed = time.time() - self.started
+        self.stdout.write(u"{} lines read, {} rows saved ({:.0f} lines/s)"\
+            .format(self.read, self.saved, self.read / max(elapsed, 0.001)))
+
+    def handle(self, *args, **options):
+        if len(args) != 2 or args[0] not in IMPORTERS:
+            raise CommandError(u"Usage: import_geonames {} <path>".format(
+                                '|'.join(sorted(IMPORTERS))))
+        kind, path = args
+        self.read = self.saved = 0
+        self.started = time.time()
+
+        if options['workers'] < 2:
+            import_file(kind, path, options['batch_size'], options['update'],
+                        callback=self.progress)
+            return
+
+        # Smaller segments give more frequent progress reports.
+        tasks = [(kind, path, start, end, options['batch_size'],
+                  options['update']) for start, end in
+                  file_segments(path, options['workers'] * 4)]
+        for conn in connections.all():
+            conn.close()
+        pool = multiprocessing.Pool(options['workers'])
+        try:
+            for read, saved in pool.imap_unordered(import_segment, tasks):
+                self.progress(read, saved)
+        finally:
+            pool.close()
+            pool.join()
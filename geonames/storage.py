@@ -1,96 +1,251 @@
 import os, time
 from django.conf import settings
+from django.db import DataError, IntegrityError, connections, transaction
 from .models import *
 
 DATA_PATH = os.path.join(settings.BASE_DIR, 'data')
 
+# Number of rows saved with single INSERT.
+BATCH_SIZE = 5000
+
 # set custom log because of problems with django-one:
 import logging
 logging.basicConfig(filename=os.path.join(settings.BASE_DIR, 'logs', 'django.log'),
                    level=logging.INFO)
 
 
-def import_country(entry):
-    """ Function takes one line of file and creates Country model. """
-    if entry.startswith('#'):
-        return False
-    entry = entry.split('\t')
-    
+def _int(value):
+    return int(value) if value.strip() else 0
+
+
+def _float(value):
+    return float(value) if value.strip() else 0.0
+
+
+def parse_country(entry):
+    """ Create (unsaved) CountryInfo from list of columns of countryInfo.txt. """
     # Incomplete entries are not desired
-    if not entry[16] or entry[16] == ' ': return False
-    
-    try:
-        chk = CountryInfo.objects.get(pk=int(entry[16]))
-        # Entry exists. Skipping.
-        logging.info("Country already exists: %s. Skipping",
-                     unicode(entry[4]).encode('utf-8'))
-        return True
-    except CountryInfo.DoesNotExist:
-        pass
-    
+    if len(entry) < 17 or not entry[16].strip():
+        return None
+    return CountryInfo(
+        id          = int(entry[16]),
+        iso_alpha2  = entry[0],
+        iso_alpha3  = entry[1],
+        iso_numeric = _int(entry[2]),
+        code        = entry[3],
+        name        = entry[4],
+        capital     = entry[5],
+        area        = _float(entry[6]),
+        population  = _int(entry[7]),
+        continent   = entry[8],
+        languages   = entry[15]
+    )
+
+
+def parse_geoname(entry):
+    """ Create (unsaved) GeoName from list of columns of allCountries.txt. """
+    # Incomplete entries are not desired
+    if len(entry) < 15 or not entry[0].strip():
+        return None
+    return GeoName(
+        id        = int(entry[0]),
+        name      = entry[1],
+        name_std  = entry[2],
+        latitude  = _float(entry[4]),
+        longitude = _float(entry[5]),
+        feature_class = entry[6],
+        feature_code  = entry[7],
+        country = entry[8],
+        admin1  = entry[10],
+        admin2  = entry[11],
+        admin3  = entry[12],
+        admin4  = entry[13],
+        population = _int(entry[14]),
+    )
+
+
+def parse_admin_code(entry):
+    """ Create (unsaved) AdminCode from columns of admin1CodesASCII.txt. """
+    # Incomplete entries are not desired
+    if len(entry) < 4 or '.' not in entry[0]:
+        return None
+    return AdminCode(
+        id       = int(entry[3]),
+        name     = entry[1],
+        name_std = entry[2],
+        country  = entry[0].split('.')[0],
+        code     = entry[0].split('.')[1]
+    )
+
+
+def parse_alt_name(entry):
+    """ Create (unsaved) AltName from list of columns of alternateNames.txt. """
+    # We're interested only in 1st group langs
+    if len(entry) < 8 or len(entry[2]) != 2:
+        return None
+    return AltName(
+        id            = int(entry[0]),
+        geonameid     = int(entry[1]),
+        language      = entry[2],
+        altername     = entry[3],
+        is_preferred  = bool(entry[4]),
+        is_short      = bool(entry[5]),
+        is_historic   = bool(entry[7]),
+        is_colloquial = bool(entry[6]),
+    )
+
+
+def filter_alt_names(objects):
+    """
+    Leave only alternate names for objects we are really going to use. Ids
+    are checked for whole batch at once, instead of three queries per row.
+    """
+    ids = set(x.geonameid for x in objects)
+    known = set()
+    for model in (CountryInfo, AdminCode, GeoName):
+        known.update(model.objects.filter(pk__in=ids)\
+                                  .values_list('pk', flat=True))
+    return [x for x in objects if x.geonameid in known]
+
+
+# Parser for each kind of file and optional filter for whole batch.
+IMPORTERS = {
+    'countries': (CountryInfo, parse_country, None),
+    'admin_codes': (AdminCode, parse_admin_code, None),
+    'geonames': (GeoName, parse_geoname, None),
+    'alt_names': (AltName, parse_alt_name, filter_alt_names),
+}
+
+
+def parse_lines(kind, lines):
+    """ Turn lines of TSV file into list of unsaved model instances. """
+    model, parse, batch_filter = IMPORTERS[kind]
+    objects = []
+    for line in lines:
+        if isinstance(line, str):
+            line = line.decode('utf-8')
+        if not line.strip() or line.startswith('#'):
+            continue
+        try:
+            obj = parse(line.rstrip('\r\n').split('\t'))
+        except ValueError as ex:
+            logging.error("Error parsing %s entry: %s - %s",
+                          kind, line[:50].encode('utf-8'), repr(ex))
+            continue
+        if obj is not None:
+            objects.append(obj)
+    if batch_filter is not None and objects:
+        objects = batch_filter(objects)
+    return objects
+
+
+def save_objects(model, objects, update=False):
+    """
+    Save list of instances with known primary keys. Existing entries are
+    skipped, or replaced when `update` is True. Costs one SELECT and one
+    INSERT (plus one DELETE when updating) for the whole list. When batch
+    can't be saved because of invalid row, rows are saved one by one and
+    invalid ones are logged and skipped. Returns number of saved rows.
+    """
+    objects = dict((x.pk, x) for x in objects).values()
     try:
-        country = CountryInfo.objects.create(
-            id          = int(entry[16]),
-            iso_alpha2  = entry[0],
-            iso_alpha3  = entry[1],
-            iso_numeric = entry[2],
-            code        = entry[3],
-            name        = entry[4],
-            capital     = entry[5],
-            area        = float(entry[6]) if entry[6] else 0.0,
-            population  = int(entry[7]) if entry[7] else 0,
-            continent   = entry[8],
-            languages   = entry[15]
-        )
-        
-        country.save()
-
-        logging.info("Country saved: %s",
-                     unicode(entry[4]).encode('utf-8'))
-    except Exception as ex:
-        logging.error("Error importing country: %s - %s",
-                      unicode(entry[4]).encode('utf-8'), ex.strerror)
+        with transaction.atomic():
+            existing = set(model.objects\
+                .filter(pk__in=[x.pk for x in objects])\
+                .values_list('pk', flat=True))
+            if update and existing:
+                model.objects.filter(pk__in=existing).delete()
+            else:
+                objects = [x for x in objects if x.pk not in existing]
+            model.objects.bulk_create(objects)
+        return len(objects)
+    except (DataError, IntegrityError) as ex:
+        logging.error("Error saving batch of %s: %s - saving rows one by one",
+                      model.__name__, repr(ex))
+    saved = 0
+    for obj in objects:
+        try:
+            with transaction.atomic():
+                obj.save(force_insert=not update)
+            saved += 1
+        except (DataError, IntegrityError) as ex:
+            logging.error("Error saving %s %s: %s", model.__name__, obj.pk,
+                          repr(ex))
+    return saved
+
+
+def import_lines(kind, lines, update=False):
+    """ Parse and save list of lines from geonames file. """
+    model = IMPORTERS[kind][0]
+    return save_objects(model, parse_lines(kind, lines), update)
+
+
+def file_segments(path, count):
+    """ Split file into `count` (start, end) byte ranges of similar size. """
+    size = os.path.getsize(path)
+    step = max(size / count, 1)
+    bounds = range(0, size, step)[:count] + [size]
+    return zip(bounds[:-1], bounds[1:])
+
+
+def read_chunks(path, chunk_size=BATCH_SIZE, start=0, end=None):
+    """
+    Read lines from file in lists of `chunk_size`. Only lines beginning
+    between `start` and `end` byte offsets are read, so file segments
+    created with `file_segments` may be processed independently.
+    """
+    with open(path, 'rb') as f:
+        if start > 0:
+            # Skip line that started in previous segment.
+            f.seek(start - 1)
+            f.readline()
+        chunk = []
+        while end is None or f.tell() < end:
+            line = f.readline()
+            if not line:
+                break
+            chunk.append(line)
+            if len(chunk) >= chunk_size:
+                yield chunk
+                chunk = []
+        if chunk:
+            yield chunk
+
+
+def import_file(kind, path, batch_size=BATCH_SIZE, update=False,
+                start=0, end=None, callback=None):
+    """
+    Import (part of) geonames dump in batches. `callback` is called after
+    each batch with number of lines read and rows saved. Returns tuple of
+    total read lines and saved rows.
+    """
+    read = saved = 0
+    for chunk in read_chunks(path, batch_size, start, end):
+        count = import_lines(kind, chunk, update)
+        read += len(chunk)
+        saved += count
+        if callback is not None:
+            callback(len(chunk), count)
+    return read, saved
+
+
+def import_segment(args):
+    """ Import single file segment in worker process. """
+    kind, path, start, end, batch_size, update = args
+    # Don't share database connection with parent process.
+    for conn in connections.all():
+        conn.close()
+    return import_file(kind, path, batch_size, update, start, end)
+
+
+def import_country(entry):
+    """ Function takes one line of file and creates Country model. """
+    return import_lines('countries', [entry]) > 0
 
 
 def import_geoname(entry):
     """ Function takes single line of input file and creates GeoName instance. """
-    if entry.startswith('#'):
-        return False
-    entry = entry.split('\t')
-    
-    # Incomplete entries are not desired
-    if not entry[0] or entry[0] == ' ': return False
-    
-    try:
-        chk = GeoName.objects.get(pk=int(entry[0]))
-        # Entry exists. Skipping.
-        logging.info("GeoName object already exists: %s. Skipping", entry[0])
-        return True
-    except GeoName.DoesNotExist:
-        pass
-    
-    try: 
-        geoname = GeoName.objects.create(
-            id        = int(entry[0]),
-            name      = entry[1],
-            name_std  = entry[2],
-            latitude  = float(entry[4]) if entry[4] else 0.0,
-            longitude = float(entry[5]) if entry[4] else 0.0,
-            feature_class = entry[6],
-            feature_code  = entry[7],
-            country = entry[8],
-            admin1  = entry[10],
-            admin2  = entry[11],
-            admin3  = entry[12],
-            admin4  = entry[13],
-            population = int(entry[14]) if entry[14] else 0,
-        )
-    
-        geoname.save()
-        
-        logging.info("GeoName object saved: %s", unicode(entry[1]).encode('utf-8'))
-    except Exception as ex:
-        logging.error("Error importing GeoName: %s - %s", entry[0], repr(ex))
+    return import_lines('geonames', [entry]) > 0
 
 
 def import_admin_code(entry):
@@ -98,90 +253,9 @@ def import_admin_code(entry):
     Function takes single line from admin1CodesASCII.txt file and creates
     admin code model in database.
     """
-    if entry.startswith('#'):
-        return False
-    entry = entry.split('\t')
-    
-    # Incomplete entries are not desired
-    if not entry[0] or entry[0] == ' ': return False
-    
-    try:
-        chk = AdminCode.objects.get(pk=int(entry[3]))
-        # Entry exists. Skipping.
-        logging.info("Admin code already exists: %s. Skipping",
-                     entry[3].replace('\n', ''))
-        return True
-    except AdminCode.DoesNotExist:
-        pass
-    
-    try:
-        admcode = AdminCode.objects.create(
-            id       = int(entry[3]),
-            name     = entry[1],
-            name_std = entry[2],
-            country  = entry[0].split('.')[0],
-            code     = entry[0].split('.')[1]
-        )
-        
-        admcode.save()
-        
-        logging.info("Admin code object saved: %s", entry[3].replace('\n', ''))
-    except Exception as ex:
-        logging.error("Error importing Admin code: %s - %s",
-                      entry[3].replace('\n', ''), repr(ex))
+    return import_lines('admin_codes', [entry]) > 0
 
 
 def import_alt_name(entry):
-    """ Takes one line of input file and returns dictionary. """
-    if entry.startswith('#'):
-        return False
-    entry = entry.split('\t')
-    
-    # We're interested only in 1st group langs
-    if len(entry[2]) != 2: return None
-    # ... and objects we are really going to use
-    target = None
-    try:
-        target = CountryInfo.objects.get(pk=int(entry[1]))
-    except CountryInfo.DoesNotExist:
-        target = None
-    try:
-        target = AdminCode.objects.get(pk=int(entry[1]))
-    except AdminCode.DoesNotExist:
-        target = None
-    try:
-        target = GeoName.objects.get(pk=int(entry[1]))
-    except GeoName.DoesNotExist:
-        target = None
-    if target is None:
-        logging.info("No geo entry for alternate name. Skipping")
-        return True
-    
-    try:
-        chk = AltName.objects.get(pk=int(entry[0]))
-        # Entry exists. Skipping.
-        logging.info("Alternate name already exists: %s. Skipping",
-                     unicode(entry[3]).encode('utf-8'))
-        return True
-    except AltName.DoesNotExist:
-        pass
-    
-    try:
-        alt_name = AltName.objects.create(
-            id            = int(entry[0]),
-            geonameid     = int(entry[1]),
-            language      = entry[2],
-            altername     = unicode(entry[3]),
-            is_preferred  = bool(entry[4]),
-            is_short      = bool(entry[5]),
-            is_historic   = bool(entry[6]),
-            is_colloquial = bool(entry[7]),
-        )
-        
-        alt_name.save()
-        
-        logging.info("Alternate name object saved: %s",
-                             unicode(entry[3]).encode('utf-8'))
-    except Exception as ex:
-        logging.error("Error importing Alternate name: %s - %s",
-                      unicode(entry[3]).encode('utf-8'), repr(ex))
+    """ Takes one line of input file and creates alternate name. """
+    return import_lines('alt_names', [entry]) > 0
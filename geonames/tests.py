@@ -1,3 +1,82 @@
+# -*- coding: utf-8 -*-
+import os
+import tempfile
+
 from django.test import TestCase
 
-# Create your tests here.
+from .models import AdminCode
+from .storage import file_segments, parse_lines, read_chunks, save_objects
+
+ADMIN_CODES = [
+    "PL.72\tLower Silesia\tLower Silesia\t3337492\n",
+    "PL.73\tKuyavia-Pomerania\tKuyavia-Pomerania\t3337493\n",
+    "PL.74\t\xc5\x81\xc3\xb3d\xc5\xba Voivodeship\tLodz Voivodeship\t3337494\n",
+]
+
+
+class ParseLinesTestCase(TestCase):
+    """ Turning lines of geonames dumps into model instances. """
+    def test_admin_codes(self):
+        objects = parse_lines('admin_codes', ADMIN_CODES)
+        self.assertEqual([x.pk for x in objects], [3337492, 3337493, 3337494])
+        self.assertEqual(objects[2].name, u"Łódź Voivodeship")
+        self.assertEqual((objects[0].country, objects[0].code), ('PL', '72'))
+
+    def test_invalid_lines_are_skipped(self):
+        lines = ["# comment\n", "\n", "PL\tNo code\tNo code\t1\n",
+                 "PL.75\tBroken\tBroken\tid\n"] + ADMIN_CODES[:1]
+        self.assertEqual([x.pk for x in parse_lines('admin_codes', lines)],
+                         [3337492])
+
+
+class SaveObjectsTestCase(TestCase):
+    """ Saving batches of parsed objects. """
+    def test_existing_rows_are_skipped(self):
+        save_objects(AdminCode, parse_lines('admin_codes', ADMIN_CODES[:1]))
+        objects = parse_lines('admin_codes', ADMIN_CODES)
+        objects[0].name = u"Changed"
+        self.assertEqual(save_objects(AdminCode, objects), 2)
+        self.assertEqual(AdminCode.objects.get(pk=3337492).name,
+                         u"Lower Silesia")
+
+    def test_existing_rows_are_updated(self):
+        save_objects(AdminCode, parse_lines('admin_codes', ADMIN_CODES[:1]))
+        objects = parse_lines('admin_codes', ADMIN_CODES[:1])
+        objects[0].name = u"Changed"
+        self.assertEqual(save_objects(AdminCode, objects, update=True), 1)
+        self.assertEqual(AdminCode.objects.get(pk=3337492).name, u"Changed")
+
+    def test_invalid_row_is_skipped(self):
+        """ Valid rows are saved even if batch contains invalid one. """
+        objects = parse_lines('admin_codes', ADMIN_CODES)
+        objects[1].name = None
+        self.assertEqual(save_objects(AdminCode, objects), 2)
+        self.assertEqual(sorted(AdminCode.objects.values_list('pk', flat=True)),
+                         [3337492, 3337494])
+
+
+class ReadChunksTestCase(TestCase):
+    """ Reading geonames dumps in chunks and segments. """
+    def setUp(self):
+        self.lines = ["{}\tline {}\n".format(x, x) for x in range(100)]
+        handle, self.path = tempfile.mkstemp()
+        with os.fdopen(handle, 'wb') as f:
+            f.writelines(self.lines)
+
+    def tearDown(self):
+        os.remove(self.path)
+
+    def test_chunks(self):
+        chunks = list(read_chunks(self.path, chunk_size=30))
+        self.assertEqual([len(x) for x in chunks], [30, 30, 30, 10])
+        self.assertEqual(sum(chunks, []), self.lines)
+
+    def test_segments_cover_every_line_once(self):
+        segments = file_segments(self.path, 3)
+        self.assertEqual(len(segments), 3)
+        self.assertEqual(segments[-1][1], os.path.getsize(self.path))
+        lines = []
+        for start, end in segments:
+            for chunk in read_chunks(self.path, 7, start, end):
+                lines.extend(chunk)
+        self.assertEqual(lines, self.lines)
@@ -18,7 +18,7 @@ from blog.models import News
 from ideas.models import Idea
 from locations.models import Location
 
-from .models import Visit
+from .models import Visit, VisitCounter
 
 
 class HotBoxAPIView(APIView):
@@ -45,8 +45,10 @@ class HotBoxAPIView(APIView):
                 date_created__gte=time_diff)
         else:
             raise Http404
-        return sorted(list(news_set) + list(idea_set), reverse=True,
-            key=lambda x: Visit.objects.count_for_object(x))[:5]
+        items = list(news_set) + list(idea_set)
+        counts = VisitCounter.objects.counts_for_objects(items)
+        return sorted(items, reverse=True, key=lambda x: counts.get(
+            (ContentType.objects.get_for_model(x).pk, x.pk), 0))[:5]
 
     def get(self, request, **kwargs):
         qs = self.get_queryset()
@@ -70,21 +72,9 @@ class VisitGraphDataAPIView(APIView):
         content_type = get_object_or_404(ContentType, pk=ct)
         instance = content_type.get_object_for_this_type(pk=pk)
 
-        all_visits = Visit.objects.filter(content_type=content_type,
-                                        object_id=instance.pk).order_by('date')
-
-        start_time = all_visits.first().date
-        stop_time = timezone.now()
-
-        results = []
-        the_time = start_time
-        while the_time < stop_time + datetime.timedelta(days=1):
-            results.append(all_visits.filter(date__year=the_time.year,
-                                             date__month=the_time.month,
-                                             date__day=the_time.day).count())
-            the_time = the_time + datetime.timedelta(days=1)
+        data = Visit.objects.graph_data(instance)
 
         return Response({
             'title': _(u"Visit counter for %s" % instance),
-            'start_time': start_time,
-            'results': results, })
+            'start_time': data.start,
+            'results': data.results, })
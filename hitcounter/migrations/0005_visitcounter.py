@@ -0,0 +1,56 @@
+# -*- coding: utf-8 -*-
+from __future__ import unicode_literals
+
+import collections
+
+from django.db import models, migrations
+from django.utils import timezone
+
+
+def aggregate_visits(apps, schema_editor):
+    """ Move old visits into daily counters. """
+    Visit = apps.get_model('hitcounter', 'Visit')
+    VisitCounter = apps.get_model('hitcounter', 'VisitCounter')
+    visits = collections.Counter()
+    addresses = collections.defaultdict(set)
+    for ct, pk, date, ip, count in Visit.objects.values_list(
+            'content_type_id', 'object_id', 'date', 'ip', 'visit_count').iterator():
+        key = (ct, pk, timezone.localtime(date).date())
+        visits[key] += count
+        addresses[key].add(ip)
+    VisitCounter.objects.bulk_create([
+        VisitCounter(content_type_id=ct, object_id=pk, day=day, visits=count,
+                     unique_visits=len(addresses[(ct, pk, day)]))
+        for (ct, pk, day), count in visits.iteritems()], batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('contenttypes', '0001_initial'),
+        ('hitcounter', '0004_auto_20150609_1204'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='VisitCounter',
+            fields=[
+                ('id', models.AutoField(verbose_name='ID', serialize=False, auto_created=True, primary_key=True)),
+                ('object_id', models.PositiveIntegerField()),
+                ('day', models.DateField()),
+                ('visits', models.PositiveIntegerField(default=0)),
+                ('unique_visits', models.PositiveIntegerField(default=0)),
+                ('content_type', models.ForeignKey(to='contenttypes.ContentType')),
+            ],
+            options={
+                'verbose_name': 'daily visit counter',
+                'verbose_name_plural': 'daily visit counters',
+            },
+            bases=(models.Model,),
+        ),
+        migrations.AlterUniqueTogether(
+            name='visitcounter',
+            unique_together=set([('content_type', 'object_id', 'day')]),
+        ),
+        migrations.RunPython(aggregate_visits),
+    ]
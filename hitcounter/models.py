@@ -1,61 +1,63 @@
 # -*- coding: utf-8 -*-
 import collections
-import datetime
 
+from django.conf import settings
+from django.core import cache
 from django.contrib.contenttypes.fields import GenericForeignKey
 from django.contrib.contenttypes.models import ContentType
-from django.db import models
+from django.db import IntegrityError, models, transaction
+from django.db.models import F, Sum
 from django.utils import timezone
 from django.utils.translation import ugettext_lazy as _
 
+from places_core.buffers import get_buffer, is_local
+from places_core.timeline import forget_counts, histogram
+
+# Name of the queue for hits waiting to be saved in database.
+BUFFER_NAME = 'hitcounter'
+
+# Number of hits saved at once.
+FLUSH_SIZE = getattr(settings, 'HITCOUNTER_FLUSH_SIZE', 1000)
+
+# How long we remember IP addresses to count unique visits (in seconds).
+UNIQUE_TIMEOUT = 60 * 60 * 48
+
+redis_cache = cache.get_cache('default')
+
 
 class VisitManager(models.Manager):
     """
     Simplify some common function to get counters. This manager is
-    made rather to get numeric counter values than querysets.
+    made rather to get numeric counter values than querysets. Visits are
+    not saved immediately - they are queued and then saved in batches as
+    daily counters (see VisitCounter model).
     """
+    def record_hit(self, content_type_id, object_id, ip):
+        """ Put single hit into the queue. """
+        hits = get_buffer(BUFFER_NAME)
+        hits.push([int(content_type_id), int(object_id), ip,
+                   timezone.localtime(timezone.now()).date().isoformat()])
+        if is_local() and len(hits) >= FLUSH_SIZE:
+            VisitCounter.objects.flush()
+
     def count_for_object(self, instance):
         """ Returns total count for this object. """
-        qs = super(VisitManager, self).get_queryset()
-        ct = ContentType.objects.get_for_model(instance)
-        return sum([x.visit_count for x in qs.filter(
-            content_type=ct, object_id=instance.pk)])
+        return VisitCounter.objects.count_for_object(instance)
 
     def count_unique_for_object(self, instance):
-        """ Count only one visit for each IP address. """
-        qs = super(VisitManager, self).get_queryset()
-        ct = ContentType.objects.get_for_model(instance)
-        return len(qs.filter(content_type=ct, object_id=instance.pk))
+        """ Count only one visit for each IP address per day. """
+        return VisitCounter.objects.count_for_object(instance, unique=True)
 
     def graph_data(self, obj):
-        qs = super(VisitManager, self).get_queryset()
-        ct = ContentType.objects.get_for_model(obj)
-        all_visits = qs.filter(
-            content_type=ct, object_id=obj.pk).order_by('date')
-
-        start_time = all_visits.first().date
-        stop_time = timezone.now()
-
-        results = []
-        the_time = start_time
-        while the_time < stop_time + datetime.timedelta(hours=12):
-            results.append(all_visits.filter(date__year=the_time.year,
-                                             date__month=the_time.month,
-                                             date__day=the_time.day).count())
-            the_time = the_time + datetime.timedelta(days=1)
-
-        Serializer = collections.namedtuple('Serializer',
-                        ['counter', 'title', 'start', 'results'])
-        return Serializer(counter=all_visits.count(),
-                          title=obj.__unicode__(),
-                          start=str(start_time),
-                          results=results)
+        return VisitCounter.objects.graph_data(obj)
 
 
 class Visit(models.Model):
     """
     This model may be bound with different content. If counter for this content
     already exists, it should just be incremented.
+
+    *deprecated* - kept for old records, new visits are stored as VisitCounter.
     """
     date = models.DateTimeField(auto_now_add=True)
     content_type = models.ForeignKey(ContentType)
@@ -69,3 +71,110 @@ class Visit(models.Model):
     class Meta:
         verbose_name = _(u"visit counter")
         verbose_name_plural = _(u"visit counters")
+
+
+class VisitCounterManager(models.Manager):
+    """ Read and update daily counters. """
+    def _for_object(self, instance):
+        ct = ContentType.objects.get_for_model(instance)
+        return self.filter(content_type=ct, object_id=instance.pk)
+
+    def count_for_object(self, instance, unique=False):
+        """ Returns total count of visits for given object. """
+        field = 'unique_visits' if unique else 'visits'
+        result = self._for_object(instance).aggregate(total=Sum(field))
+        return result['total'] or 0
+
+    def counts_for_objects(self, objects, unique=False):
+        """
+        Get visit counts for list of objects of (possibly) different types
+        with one query per content type. Returns dictionary where keys are
+        (content type id, object id) tuples.
+        """
+        field = 'unique_visits' if unique else 'visits'
+        id_lists = collections.defaultdict(list)
+        for obj in objects:
+            ct = ContentType.objects.get_for_model(obj)
+            id_lists[ct.pk].append(obj.pk)
+        counts = {}
+        for ct, id_list in id_lists.iteritems():
+            qs = self.filter(content_type_id=ct, object_id__in=id_list)\
+                     .values('object_id').annotate(total=Sum(field))
+            for row in qs:
+                counts[(ct, row['object_id'])] = row['total']
+        return counts
+
+    def graph_data(self, obj):
+        ct = ContentType.objects.get_for_model(obj)
+        data = histogram(self._for_object(obj), 'day', value='visits',
+                         cache_key='visits:{}:{}'.format(ct.pk, obj.pk))
+
+        Serializer = collections.namedtuple('Serializer',
+                        ['counter', 'title', 'start', 'results'])
+        return Serializer(counter=data.total,
+                          title=obj.__unicode__(),
+                          start=str(data.start),
+                          results=data.results)
+
+    def add_visits(self, content_type_id, object_id, day, visits, unique_visits):
+        """ Increment counter for single object and day. """
+        lookup = {'content_type_id': content_type_id,
+                  'object_id': object_id,
+                  'day': day, }
+        changes = {'visits': F('visits') + visits,
+                   'unique_visits': F('unique_visits') + unique_visits, }
+        if self.filter(**lookup).update(**changes):
+            return
+        try:
+            with transaction.atomic():
+                self.create(visits=visits, unique_visits=unique_visits, **lookup)
+        except IntegrityError:
+            self.filter(**lookup).update(**changes)
+
+    def flush(self, batch_size=FLUSH_SIZE):
+        """
+        Save queued hits in database. Hits are grouped by object and day,
+        so each batch costs one query per counter, not per hit. Returns
+        number of saved hits.
+        """
+        hits = get_buffer(BUFFER_NAME)
+        total = 0
+        while True:
+            batch = hits.pop_many(batch_size)
+            if not batch:
+                break
+            visits = collections.Counter()
+            unique = collections.Counter()
+            for ct, pk, ip, day in batch:
+                visits[(ct, pk, day)] += 1
+                key = 'hitcounter:{}:{}:{}:{}'.format(ct, pk, day, ip)
+                if redis_cache.add(key, 1, UNIQUE_TIMEOUT):
+                    unique[(ct, pk, day)] += 1
+            with transaction.atomic():
+                for (ct, pk, day), count in visits.iteritems():
+                    self.add_visits(ct, pk, day, count, unique[(ct, pk, day)])
+            total += len(batch)
+        return total
+
+
+class VisitCounter(models.Model):
+    """ Number of visits for single object aggregated per day. """
+    content_type = models.ForeignKey(ContentType)
+    object_id = models.PositiveIntegerField()
+    content_object = GenericForeignKey('content_type', 'object_id')
+    day = models.DateField()
+    visits = models.PositiveIntegerField(default=0)
+    unique_visits = models.PositiveIntegerField(default=0)
+
+    objects = VisitCounterManager()
+
+    class Meta:
+        unique_together = ('content_type', 'object_id', 'day',)
+        verbose_name = _(u"daily visit counter")
+        verbose_name_plural = _(u"daily visit counters")
+
+
+def forget_visit_counts(sender, instance, **kwargs):
+    forget_counts(VisitCounter)
+
+models.signals.post_delete.connect(forget_visit_counts, sender=VisitCounter)
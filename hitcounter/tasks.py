@@ -0,0 +1,18 @@
+# -*- coding: utf-8 -*-
+import datetime
+
+from celery.task.base import periodic_task
+
+from .models import VisitCounter
+
+import logging
+logger = logging.getLogger('tasks')
+
+
+@periodic_task(run_every=datetime.timedelta(minutes=1))
+def flush_visits():
+    """ Save queued visits as daily counters. """
+    count = VisitCounter.objects.flush()
+    if count:
+        logger.info(u"Saved {} queued visits".format(count))
+    return count
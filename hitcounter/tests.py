@@ -1,3 +1,56 @@
+# -*- coding: utf-8 -*-
 from django.test import TestCase
+from django.test.utils import override_settings
+from django.contrib.auth.models import User
+from django.contrib.contenttypes.models import ContentType
 
-# Create your tests here.
+from locations.models import Location
+
+from .models import Visit, VisitCounter
+
+
+@override_settings(BUFFER_BACKEND='local')
+class BufferedVisitTestCase(TestCase):
+    """ Test that queued visits are saved as daily counters. """
+    fixtures = ['fixtures/users.json',]
+
+    def setUp(self):
+        self.user = User.objects.first()
+        self.location = Location.objects.create(name="Testowice",
+                                                creator=self.user)
+        self.ct = ContentType.objects.get_for_model(Location)
+
+    def _hit(self, ip='127.0.0.1'):
+        Visit.objects.record_hit(self.ct.pk, self.location.pk, ip)
+
+    def test_hits_are_not_saved_before_flush(self):
+        """ Recording hit does not touch database. """
+        self._hit()
+        self.assertEqual(VisitCounter.objects.count(), 0)
+        VisitCounter.objects.flush()
+
+    def test_flush_aggregates_hits(self):
+        """ All hits for the same object and day go to single counter. """
+        for x in range(5):
+            self._hit()
+        self._hit('127.0.0.2')
+        self.assertEqual(VisitCounter.objects.flush(), 6)
+        self.assertEqual(VisitCounter.objects.count(), 1)
+        self.assertEqual(Visit.objects.count_for_object(self.location), 6)
+        self._hit()
+        VisitCounter.objects.flush()
+        self.assertEqual(Visit.objects.count_for_object(self.location), 7)
+        data = Visit.objects.graph_data(self.location)
+        self.assertEqual(data.counter, 7)
+        self.assertEqual(data.results[-1], 7)
+
+    def test_counts_for_many_objects(self):
+        """ Counts for list of objects are fetched at once. """
+        other = Location.objects.create(name="Other", creator=self.user)
+        self._hit()
+        Visit.objects.record_hit(self.ct.pk, other.pk, '127.0.0.1')
+        Visit.objects.record_hit(self.ct.pk, other.pk, '127.0.0.1')
+        VisitCounter.objects.flush()
+        counts = VisitCounter.objects.counts_for_objects([self.location, other])
+        self.assertEqual(counts[(self.ct.pk, self.location.pk)], 1)
+        self.assertEqual(counts[(self.ct.pk, other.pk)], 2)
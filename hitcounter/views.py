@@ -15,5 +15,5 @@ def visit_view(request, ct, pk):
     This view should be used along with some front-end scripts.
     This way we can exclude robots from records.
     """
-    visit = Visit.objects.create(ip=get_ip(request), content_type_id=ct, object_id=pk)
-    return HttpResponse(json.dumps({'id': visit.pk, }), content_type="application/json")
+    Visit.objects.record_hit(ct, pk, get_ip(request))
+    return HttpResponse(json.dumps({'success': True, }), content_type="application/json")
@@ -0,0 +1,57 @@
+# -*- coding: utf-8 -*-
+from __future__ import unicode_literals
+
+from django.db import models
+from django.db.models import Count
+
+from places_core.tallies import add_tallies, reconcile
+
+# Counters kept in Idea model, see places_core.tallies.
+TALLY_FIELDS = ('votes_up_count', 'votes_down_count', 'score',
+                'positive_comments_count', 'negative_comments_count', )
+
+
+def vote_tally(status, positive_comment=None, negative_comment=None):
+    """ Counters that single vote adds to its idea. Revoked votes count 0. """
+    if status == 1:
+        tally = {'votes_up_count': 1, 'score': 1}
+        if positive_comment:
+            tally['positive_comments_count'] = 1
+    elif status == 2:
+        tally = {'votes_down_count': 1, 'score': -1}
+        if negative_comment:
+            tally['negative_comments_count'] = 1
+    else:
+        tally = {}
+    return tally
+
+
+def recount_idea_votes(idea_model, vote_model):
+    """
+    Recalculate counters for all ideas with a few grouped queries. Model
+    classes are passed as arguments, so we can use it in migrations.
+    Returns number of fixed ideas.
+    """
+    counts = {}
+    votes = vote_model.objects.values_list('idea', 'status')
+    for idea_id, status, total in votes.annotate(total=Count('pk')):
+        tally = dict((k, v * total) for k, v in vote_tally(status).iteritems())
+        counts[idea_id] = add_tallies(counts.get(idea_id, {}), tally)
+    for status, field in ((1, 'positive_comment'), (2, 'negative_comment')):
+        votes = vote_model.objects.filter(status=status)\
+                                  .exclude(**{field: ''})\
+                                  .exclude(**{field + '__isnull': True})\
+                                  .values_list('idea')
+        key = '{}s_count'.format(field)
+        for idea_id, total in votes.annotate(total=Count('pk')):
+            counts[idea_id] = add_tallies(counts.get(idea_id, {}),
+                                          {key: total})
+    return reconcile(idea_model, counts, TALLY_FIELDS)
+
+
+class VoteManager(models.Manager):
+    """ Manager for idea votes. """
+    def recount(self):
+        """ Fix vote counters stored in ideas. """
+        idea_model = self.model._meta.get_field('idea').rel.to
+        return recount_idea_votes(idea_model, self.model)
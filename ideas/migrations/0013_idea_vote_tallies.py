@@ -0,0 +1,52 @@
+# -*- coding: utf-8 -*-
+from __future__ import unicode_literals
+
+from django.db import models, migrations
+
+from ideas.managers import recount_idea_votes
+
+
+def count_votes(apps, schema_editor):
+    recount_idea_votes(apps.get_model('ideas', 'Idea'),
+                       apps.get_model('ideas', 'Vote'))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('ideas', '0012_auto_20150921_1408'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='idea',
+            name='votes_up_count',
+            field=models.PositiveIntegerField(default=0),
+            preserve_default=True,
+        ),
+        migrations.AddField(
+            model_name='idea',
+            name='votes_down_count',
+            field=models.PositiveIntegerField(default=0),
+            preserve_default=True,
+        ),
+        migrations.AddField(
+            model_name='idea',
+            name='score',
+            field=models.IntegerField(default=0, db_index=True),
+            preserve_default=True,
+        ),
+        migrations.AddField(
+            model_name='idea',
+            name='positive_comments_count',
+            field=models.PositiveIntegerField(default=0),
+            preserve_default=True,
+        ),
+        migrations.AddField(
+            model_name='idea',
+            name='negative_comments_count',
+            field=models.PositiveIntegerField(default=0),
+            preserve_default=True,
+        ),
+        migrations.RunPython(count_votes),
+    ]
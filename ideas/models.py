@@ -17,13 +17,18 @@ from actstream.actions import action
 from taggit.managers import TaggableManager
 
 from comments.models import CustomComment
-from locations.models import Location
+from locations.models import Location, index_location_content, \
+                             remove_location_content
 from gallery.image import adjust_uploaded_image
 from notifications.models import notify
 from places_core.helpers import truncatehtml, truncatesmart, sanitizeHtml
 from places_core.models import ImagableItemMixin, remove_image
+from places_core.slugs import save_with_slug
+from places_core.tallies import move_tally, tally_safe_kwargs
 from utils.youtube_field import YoutubeUrlField
 
+from .managers import TALLY_FIELDS, VoteManager, vote_tally
+
 
 class VotingExpiredException(Exception):
     pass
@@ -59,6 +64,12 @@ class Idea(ImagableItemMixin, models.Model):
     status = models.PositiveIntegerField(choices=STATUS_CHOICES, default=1)
     edited = models.BooleanField(default=False)
     video_url = YoutubeUrlField(blank=True, null=True, verbose_name=_(u"Youtube video"))
+    # Vote counters maintained by Vote signals, see places_core.tallies
+    votes_up_count = models.PositiveIntegerField(default=0)
+    votes_down_count = models.PositiveIntegerField(default=0)
+    score = models.IntegerField(default=0, db_index=True)
+    positive_comments_count = models.PositiveIntegerField(default=0)
+    negative_comments_count = models.PositiveIntegerField(default=0)
 
     tags = TaggableManager()
 
@@ -84,40 +95,42 @@ class Idea(ImagableItemMixin, models.Model):
 
     @property
     def votes_up(self):
-        return self.vote_set.filter(status=1).count()
+        return self.votes_up_count
 
     @property
     def votes_down(self):
-        return self.vote_set.filter(status=2).count()
+        return self.votes_down_count
 
     @property
     def note(self):
-        if not self.vote_set.exclude(status=3).count():
+        if not self.votes:
             note = 0
         elif not self.votes_down:
             note = 100
         else:
-            note = float(self.votes_up)/float(self.votes_down+self.votes_up)*100.0
+            note = float(self.votes_up)/float(self.votes)*100.0
         return "{}%".format(int(note))
 
     @property
     def votes(self):
-        return self.vote_set.exclude(status=3).values('pk').count()
-
-    def _get_comments(self, status=1):
-        all_comments = self.vote_set.filter(status=status)
-        return [x.pk for x in all_comments if x.get_comment() is not None]
+        return self.votes_up_count + self.votes_down_count
 
     @property
     def positive_comments(self):
-        return len(self._get_comments(status=1))
+        return self.positive_comments_count
 
     @property
     def negative_comments(self):
-        return len(self._get_comments(status=2))
+        return self.negative_comments_count
 
     def get_votes(self):
-        return self.votes_up - self.votes_down
+        return self.score
+
+    def reload_votes(self):
+        """ Fetch current vote counters from database. """
+        values = Idea.objects.filter(pk=self.pk).values(*TALLY_FIELDS)[0]
+        for field, value in values.iteritems():
+            setattr(self, field, value)
 
     def get_comment_count(self):
         content_type = ContentType.objects.get_for_model(self)
@@ -138,36 +151,39 @@ class Idea(ImagableItemMixin, models.Model):
 
         status = int(status)
 
-        try:
-            user_vote = Vote.objects.get(user=user, idea=self)
-            is_new = False
-        except Vote.DoesNotExist:
-            user_vote = Vote.objects.create(user=user, idea=self, status=status)
-            is_new = True
-
-        if int(status) == 2:
+        if status == 2:
             if comment is None or comment == u'':
                 return {'success': False,
                         'error': _(u"Negative vote require message"), }
 
-        if int(status) == 1:
-            user_vote.positive_comment = comment
-        elif int(status) == 2:
-            user_vote.negative_comment = comment
-        user_vote.save()
-
-        is_reversed = False
+        with transaction.atomic():
+            try:
+                user_vote = Vote.objects.get(user=user, idea=self)
+                is_new = False
+            except Vote.DoesNotExist:
+                user_vote = Vote(user=user, idea=self, status=status)
+                is_new = True
+
+            if status == 1:
+                user_vote.positive_comment = comment
+            elif status == 2:
+                user_vote.negative_comment = comment
+
+            is_reversed = False
+
+            if is_new:
+                prev_status = None
+                user.profile.rank_pts += 1
+                user.profile.save()
+            else:
+                prev_status = user_vote.status
+                if (prev_status == 2 and status == 1) or (prev_status == 1 and status == 2):
+                    is_reversed = True
+            user_vote.status = status
+            user_vote.save()
 
-        if is_new:
-            prev_status = None
-            user.profile.rank_pts += 1
-            user.profile.save()
-        else:
-            prev_status = user_vote.status
-            if (prev_status == 2 and status == 1) or (prev_status == 1 and status == 2):
-                is_reversed = True
-        user_vote.status = status
-        user_vote.save()
+        # Counters were changed in database by Vote signals.
+        self.reload_votes()
 
         vote_data = {
             'success': True,
@@ -190,24 +206,13 @@ class Idea(ImagableItemMixin, models.Model):
         # TODO - smart HTML sanitizing
         #self.description = sanitizeHtml(self.description)
 
+        # Vote counters are changed only by vote signals
+        if not args:
+            kwargs = tally_safe_kwargs(self, TALLY_FIELDS, kwargs)
+
         # Create unique SEO-frinedly slug
-        slug = slugify(self.name)
-        self.slug = slug
-        success = False
-        retries = 0
-        while not success:
-            check = self.__class__.objects.filter(slug=self.slug)\
-                                          .exclude(pk=self.pk).count()
-            if not check:
-                success = True
-            else:
-                # We assume maximum number of 50 elements with the same name.
-                # But the loop should be breaked if something went wrong.
-                if retries >= 50:
-                    raise ValidationError(u"Maximum number of retries exceeded")
-                retries += 1
-                self.slug = "{}-{}".format(slug, retries)
-        super(Idea, self).save(*args, **kwargs)
+        save_with_slug(self, slugify(self.name),
+                       lambda: super(Idea, self).save(*args, **kwargs))
 
     def get_absolute_url(self):
         return reverse(
@@ -221,6 +226,8 @@ class Idea(ImagableItemMixin, models.Model):
 
 models.signals.post_save.connect(adjust_uploaded_image, sender=Idea)
 models.signals.post_delete.connect(remove_image, sender=Idea)
+models.signals.post_save.connect(index_location_content, sender=Idea)
+models.signals.post_delete.connect(remove_location_content, sender=Idea)
 
 
 @python_2_unicode_compatible
@@ -237,6 +244,8 @@ class Vote(models.Model):
     positive_comment = models.TextField(blank=True, null=True, verbose_name=_(u"comment"))
     negative_comment = models.TextField(blank=True, null=True, verbose_name=_(u"comment"))
 
+    objects = VoteManager()
+
     def status_display(self):
         return [[x[1] for x in VOTE_STATUSES if x[0]==self.status][0]]
 
@@ -274,3 +283,33 @@ def vote_notification(sender, instance, created, **kwargs):
 
 
 models.signals.post_save.connect(vote_notification, sender=Vote)
+
+
+def _vote_state(vote):
+    return (vote.idea_id, vote_tally(vote.status, vote.positive_comment,
+                                     vote.negative_comment))
+
+
+def remember_vote_state(sender, instance, raw, **kwargs):
+    """ Store counters of edited vote before it's saved. """
+    instance._tally_origin = None
+    if instance.pk is None or raw:
+        return
+    origin = Vote.objects.filter(pk=instance.pk).first()
+    if origin is not None:
+        instance._tally_origin = _vote_state(origin)
+
+
+def update_vote_tally(sender, instance, raw, **kwargs):
+    """ Update idea vote counters in the same transaction. """
+    move_tally(Idea, getattr(instance, '_tally_origin', None),
+               _vote_state(instance))
+
+
+def remove_vote_tally(sender, instance, **kwargs):
+    move_tally(Idea, _vote_state(instance), None)
+
+
+models.signals.pre_save.connect(remember_vote_state, sender=Vote)
+models.signals.post_save.connect(update_vote_tally, sender=Vote)
+models.signals.post_delete.connect(remove_vote_tally, sender=Vote)
@@ -5,6 +5,7 @@ from rest_framework import serializers
 from locations.serializers import LocationListSerializer
 from userspace.serializers import UserDetailSerializer
 
+from .managers import TALLY_FIELDS
 from .models import Category, Idea, Vote
 
 
@@ -17,6 +18,7 @@ class IdeaCategorySerializer(serializers.ModelSerializer):
 class IdeaSimpleSerializer(serializers.ModelSerializer):
     class Meta:
         model = Idea
+        read_only_fields = TALLY_FIELDS
 
 
 class IdeaDetailSerializer(serializers.ModelSerializer):
@@ -51,6 +53,7 @@ class IdeaDetailSerializer(serializers.ModelSerializer):
 
     class Meta:
         model = Idea
+        read_only_fields = TALLY_FIELDS
 
 
 class VoteSimpleSerializer(serializers.ModelSerializer):
@@ -4,7 +4,7 @@ from django.contrib.auth.models import User
 
 from locations.models import Location
 
-from .models import Idea
+from .models import Idea, Vote
 
 
 class IdeaCreateTestCase(TestCase):
@@ -51,3 +51,56 @@ class IdeaCreateTestCase(TestCase):
             location=self.location
         )
         self.assertEqual(idea.name, 'Idea Title')
+
+
+class IdeaVoteTallyTestCase(TestCase):
+    """ Test vote counters stored in ideas. """
+    fixtures = ['fixtures/users.json',]
+
+    def setUp(self):
+        self.user = User.objects.first()
+        self.location = Location.objects.create(
+            name="Sometestplace",
+            creator=self.user,
+            country_code='PL',
+            kind='country'
+        )
+        self.idea = Idea.objects.create(
+            name="Some test idea",
+            description="This is just for testing",
+            creator=self.user,
+            location=self.location
+        )
+
+    def test_counters_follow_votes(self):
+        """ Changing and revoking vote updates counters. """
+        result = self.idea.vote(self.user, 1, u"I can help")
+        self.assertEqual(result['votes'], 1)
+        self.assertEqual(self.idea.note, "100%")
+        self.assertEqual(self.idea.positive_comments, 1)
+        self.idea.vote(self.user, 2, u"Bad idea")
+        idea = Idea.objects.get(pk=self.idea.pk)
+        self.assertEqual((idea.votes_up, idea.votes_down, idea.get_votes()),
+                         (0, 1, -1))
+        self.assertEqual(idea.negative_comments, 1)
+        self.idea.vote(self.user, 3)
+        idea = Idea.objects.get(pk=self.idea.pk)
+        self.assertEqual((idea.votes, idea.get_votes()), (0, 0))
+
+    def test_save_keeps_counters(self):
+        """ Saving stale copy of idea doesn't overwrite vote counters. """
+        stale = Idea.objects.get(pk=self.idea.pk)
+        self.idea.vote(self.user, 1)
+        stale.name = "Renamed test idea"
+        stale.save()
+        idea = Idea.objects.get(pk=self.idea.pk)
+        self.assertEqual(idea.name, "Renamed test idea")
+        self.assertEqual((idea.votes_up, idea.get_votes()), (1, 1))
+
+    def test_recount(self):
+        """ Reconciliation fixes broken counters. """
+        self.idea.vote(self.user, 1)
+        Idea.objects.filter(pk=self.idea.pk).update(votes_up_count=5, score=5)
+        self.assertEqual(Vote.objects.recount(), 1)
+        idea = Idea.objects.get(pk=self.idea.pk)
+        self.assertEqual((idea.votes_up, idea.get_votes()), (1, 1))
@@ -14,20 +14,20 @@ from django.contrib.contenttypes.models import ContentType
 from django.utils.translation import ugettext as _
 
 from actstream.actions import follow, unfollow
-from actstream.models import following
+from actstream.models import Follow, following
 from rest_framework import viewsets
 from rest_framework.views import APIView
 from rest_framework import permissions as rest_permissions
 from rest_framework.response import Response
 
-from ideas.models import Idea
 from rest.permissions import IsOwnerOrReadOnly, IsModeratorOrReadOnly
 from places_core.helpers import sort_by_locale, get_time_difference
 from locations.serializers import MapLocationSerializer
 
+from . import autocomplete
 from .forms import LocationSearchForm
 from .helpers import get_nearest_city
-from .models import Country, Location
+from .models import Country, Location, LocationContent, serialize_content
 from .serializers import SimpleLocationSerializer, \
                          LocationListSerializer, \
                          CountrySerializer, \
@@ -66,11 +66,28 @@ class CitySearchAPI(APIView):
 
 class LocationSearchAPI(APIView):
     """
-    Provides simple autocomplete functionality.
+    Provides simple autocomplete functionality. Results are read from
+    autocomplete index when LOCATION_AUTOCOMPLETE setting is enabled.
     """
     permission_classes = (rest_permissions.AllowAny, )
     serializer_class = AutocompleteLocationSerializer
 
+    def search_index(self, q):
+        lang = translation.get_language().split('-')[0]
+        results = autocomplete.search(q, lang)
+        user = self.request.user
+        followed = set()
+        if user.is_authenticated() and results:
+            followed = set(Follow.objects.filter(user=user,
+                content_type=ContentType.objects.get_for_model(Location),
+                object_id__in=[str(x['id']) for x in results])\
+                .values_list('object_id', flat=True))
+        for item in results:
+            item['following'] = str(item['id']) in followed
+            item['template'] = 'normal' if user.is_authenticated() \
+                                        else 'simple'
+        return results
+
     def get(self, request, **kwargs):
         q = request.QUERY_PARAMS.get('term', '')
         if len(q) < 4:
@@ -78,6 +95,8 @@ class LocationSearchAPI(APIView):
         form = LocationSearchForm(request.GET)
         if not form.is_valid():
             raise Http404
+        if autocomplete.autocomplete_enabled():
+            return Response(self.search_index(q))
         qs = Location.objects.filter(name__icontains=q.lower())
         qs = qs | Location.objects.filter(name=q.title())
         serializer = self.serializer_class(qs, many=True,
@@ -163,42 +182,17 @@ class LocationSummaryAPI(APIView):
             category = None
 
         location = get_object_or_404(Location, pk=location_pk)
-        content_objects = location.content_objects()
-
-        if content != 'all':
-            content_objects = [x for x in content_objects
-                               if x['type'] == content]
-        if time is not None:
-            content_objects = [x for x in content_objects\
-                                    if x['date_created'] >= time.isoformat()]
-        if haystack:
-            content_objects = [x for x in content_objects \
-                                    if haystack.lower() in x['title'].lower()]
-        if category is not None:
-            content_objects = [x for x in content_objects if x.get('category')]
-            content_objects = [x for x in content_objects
-                                    if x.get('category')['pk'] == category]
-
-        # Sort results option (Opcje sortowania wyników (is applicable to concrete objects)
         sortby = self.request.QUERY_PARAMS.get('sortby')
-        if sortby == 'title':
-            content_objects = sort_by_locale(content_objects,
-                                             lambda x: x['title'],
-                                             translation.get_language())
-        elif sortby == 'oldest':
-            content_objects.sort(key=lambda x: x['date_created'])
-        elif sortby == 'newest':
-            content_objects.sort(key=lambda x: x['date_created'],
-                                 reversed=True)
-        elif sortby == 'user':
-            content_objects.sort(
-                key=lambda x: x['creator']['name'].split(' ')[1])
-
-        paginator = Paginator(content_objects, per_page)
+        entries = LocationContent.objects.search([location], content, time,
+                                                 haystack, category, sortby)
+
+        paginator = Paginator(entries, min(per_page, 100))
         try:
             items = paginator.page(page)
         except EmptyPage:
             items = paginator.page(1)
+        # Only objects displayed on current page are fetched and serialized.
+        items.object_list = serialize_content(items.object_list)
         serializer = ContentPaginatedSerializer(items,
                                                 context={'request': request})
 
@@ -319,21 +313,13 @@ class LocationActionsRestViewSet(viewsets.ViewSet):
                           IsOwnerOrReadOnly, )
 
     def get_queryset(self, pk=None, ct=None):
-        from actstream.models import Action, model_stream
+        from actstream.models import Action
         if not pk: return []
-        content_type = ContentType.objects.get_for_model(Location).pk
-        stream = model_stream(Location).filter(
-            target_content_type_id=content_type)
         try:
             location = Location.objects.get(pk=pk)
-            stream = stream.filter(target_object_id=location.pk)
-            ctid = ContentType.objects.get_for_model(Idea).pk
-            vote_actions = [a.pk for a in Action.objects.all() if \
-                            hasattr(a.action_object, 'location') and \
-                            a.action_object.location == location]
-            stream = stream | Action.objects.filter(pk__in=vote_actions)
-        except Location.DoesNotExist:
+        except (Location.DoesNotExist, ValueError):
             return []
+        stream = Action.objects.location(location)
         if ct:
             stream = stream.filter(action_object_content_type_id=ct)
         return stream
@@ -377,6 +363,23 @@ class LocationMapViewSet(viewsets.ModelViewSet):
             return self.queryset.filter(name__icontains=name)
         return self.queryset
 
+    def list(self, request, *args, **kwargs):
+        name = request.QUERY_PARAMS.get('term')
+        if name is None or not autocomplete.autocomplete_enabled():
+            return super(LocationMapViewSet, self).list(request, *args,
+                                                        **kwargs)
+        lang = translation.get_language().split('-')[0]
+        results = [{
+            'id': x['id'],
+            'name': x['name'],
+            'latitude': x['latitude'],
+            'longitude': x['longitude'],
+        } for x in autocomplete.search(name, lang, autocomplete.CAPACITY)
+          if x['latitude'] is not None and x['longitude'] is not None]
+        results = results[:self.get_paginate_by()]
+        return Response({'count': len(results), 'next': None,
+                         'previous': None, 'results': results, })
+
 
 class SublocationAPIViewSet(viewsets.ReadOnlyModelViewSet):
     """
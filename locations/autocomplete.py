@@ -0,0 +1,255 @@
+# -*- coding: utf-8 -*-
+"""
+Autocomplete index for location names kept in Redis, so we don't have to scan
+location table on every keystroke. For every language we keep:
+
+    locations:ac:<lang>             hash of ready to use results by location ID
+    locations:ac:<lang>:<prefix>    sorted set of best matching location IDs
+
+Prefixes are made from every word of location name and its alternate names,
+lowercase and without accents. Locations are ranked by kind and population
+and only LOCATION_AUTOCOMPLETE_CAPACITY best of them are kept for prefix.
+
+Index is updated in background from the queue of changed locations. Run
+`rebuild_location_autocomplete` command before enabling it with
+LOCATION_AUTOCOMPLETE setting.
+"""
+import json
+import unicodedata
+
+from django.conf import settings
+
+from places_core.buffers import get_buffer, push_or_apply
+
+# Name of the queue for locations waiting to be indexed.
+BUFFER_NAME = 'autocomplete'
+
+# Number of queued locations indexed at once.
+FLUSH_SIZE = getattr(settings, 'LOCATION_AUTOCOMPLETE_FLUSH_SIZE', 500)
+
+# Number of best locations kept for every prefix.
+CAPACITY = getattr(settings, 'LOCATION_AUTOCOMPLETE_CAPACITY', 50)
+
+# Prefixes shorter and longer than this are not stored. Longer phrases are
+# matched by filtering results for the longest prefix.
+MIN_PREFIX = 2
+MAX_PREFIX = getattr(settings, 'LOCATION_AUTOCOMPLETE_PREFIX', 12)
+
+# Locations of these kinds are presented before others.
+KIND_WEIGHTS = {
+    'country': 4,
+    'region': 3,
+    'PPLC': 2,
+    'PPLA': 1,
+}
+
+KEY = 'locations:ac:{}'
+
+
+def autocomplete_enabled():
+    return getattr(settings, 'LOCATION_AUTOCOMPLETE', False)
+
+
+def get_connection():
+    from redis_cache import get_redis_connection
+    return get_redis_connection('default')
+
+
+def index_languages():
+    """ Language codes used in the index (without region). """
+    codes = []
+    for code, name in settings.LANGUAGES:
+        code = code.split('-')[0]
+        if code not in codes:
+            codes.append(code)
+    return codes
+
+
+def normalize(text):
+    """ Lowercase text and strip accents. """
+    text = unicodedata.normalize('NFKD', unicode(text).lower()
+                                             .replace(u'ł', u'l'))
+    return u''.join(x for x in text if not unicodedata.combining(x)).strip()
+
+
+def name_terms(names):
+    """ Every word of name together with the rest of name. """
+    terms = set()
+    for name in names:
+        words = normalize(name).split()
+        for i in range(len(words)):
+            terms.add(u' '.join(words[i:]))
+    return terms
+
+
+def term_prefixes(terms):
+    prefixes = set()
+    for term in terms:
+        for i in range(MIN_PREFIX, min(len(term), MAX_PREFIX) + 1):
+            prefixes.add(term[:i])
+    return prefixes
+
+
+def location_score(kind, population):
+    return KIND_WEIGHTS.get(kind, 0) * 10 ** 10 + \
+           min(population or 0, 10 ** 10 - 1)
+
+
+def location_entries(location_ids):
+    """
+    Prepare index entries for given locations. Returns dictionary with
+    language code as key and list of (location ID, score, entry) tuples.
+    Entries carry labels with names of parent locations, so results may be
+    presented without any database query.
+    """
+    from .models import Location, LocationClosure
+    fields = ('pk', 'name', 'slug', 'kind', 'population', 'latitude',
+              'longitude', )
+    locations = list(Location.objects.filter(pk__in=location_ids)
+                                     .values_list(*fields))
+    parent_lists = {}
+    parents = {}
+    for pk, parent, name, kind in LocationClosure.objects\
+            .filter(descendant__in=location_ids, depth__gt=0)\
+            .values_list('descendant', 'ancestor', 'ancestor__name',
+                         'ancestor__kind'):
+        parent_lists.setdefault(pk, []).append(parent)
+        parents[parent] = (name, kind)
+    alternames = {}
+    through = Location.names.through.objects.filter(
+        location__in=[x[0] for x in locations] + list(parents))
+    for pk, lang, name in through.values_list('location',
+            'alterlocationname__language', 'alterlocationname__altername'):
+        alternames.setdefault(lang, {}).setdefault(pk, name)
+
+    entries = {}
+    for lang in index_languages():
+        names = alternames.get(lang, {})
+        entries[lang] = []
+        for pk, name, slug, kind, population, lat, lng in locations:
+            parent_list = sorted(parent_lists.get(pk, []),
+                                 key=lambda x: parents[x][1], reverse=True)
+            title = names.get(pk, name)
+            label = [title] + [names.get(x, parents[x][0])
+                               for x in parent_list]
+            entries[lang].append((pk, location_score(kind, population), {
+                'id': pk,
+                'value': pk,
+                'name': title,
+                'label': u" ".join(label),
+                'slug': slug,
+                'latitude': lat,
+                'longitude': lng,
+                'terms': sorted(name_terms(set([name, title]))),
+            }))
+    return entries
+
+
+def index_locations(location_ids, connection=None):
+    """
+    Add, update or remove given locations from the index. Locations that
+    don't exist anymore are removed. Returns number of indexed locations.
+    """
+    location_ids = list(location_ids)
+    if not location_ids:
+        return 0
+    if connection is None:
+        connection = get_connection()
+    count = 0
+    for lang, items in location_entries(location_ids).iteritems():
+        count = len(items)
+        key = KEY.format(lang)
+        current = dict((x[0], x) for x in items)
+        stored = connection.hmget(key, location_ids)
+        pipe = connection.pipeline()
+        for pk, old in zip(location_ids, stored):
+            old_prefixes = set()
+            if old is not None:
+                old_prefixes = term_prefixes(json.loads(old)['terms'])
+            if pk not in current:
+                for prefix in old_prefixes:
+                    pipe.zrem(u"{}:{}".format(key, prefix), pk)
+                pipe.hdel(key, pk)
+                continue
+            pk, score, entry = current[pk]
+            prefixes = term_prefixes(entry['terms'])
+            for prefix in old_prefixes - prefixes:
+                pipe.zrem(u"{}:{}".format(key, prefix), pk)
+            for prefix in prefixes:
+                prefix_key = u"{}:{}".format(key, prefix)
+                pipe.zadd(prefix_key, **{str(pk): score})
+                pipe.zremrangebyrank(prefix_key, 0, -CAPACITY - 1)
+            pipe.hset(key, pk, json.dumps(entry))
+        pipe.execute()
+    return count
+
+
+def search(term, lang, limit=10):
+    """ Find best locations which names start with given phrase. """
+    phrase = normalize(term)
+    if len(phrase) < MIN_PREFIX:
+        return []
+    key = KEY.format(lang)
+    connection = get_connection()
+    if len(phrase) > MAX_PREFIX:
+        count = CAPACITY
+    else:
+        count = limit
+    id_list = connection.zrevrange(u"{}:{}".format(key, phrase[:MAX_PREFIX]),
+                                   0, count - 1)
+    if not id_list:
+        return []
+    results = []
+    for entry in connection.hmget(key, id_list):
+        if entry is None:
+            continue
+        entry = json.loads(entry)
+        terms = entry.pop('terms')
+        if len(phrase) > MAX_PREFIX and \
+                not any(x.startswith(phrase) for x in terms):
+            continue
+        results.append(entry)
+    return results[:limit]
+
+
+def record(location_ids):
+    """ Put changed locations into the queue. """
+    push_or_apply(BUFFER_NAME, list(location_ids), index_locations)
+
+
+def flush(batch_size=FLUSH_SIZE):
+    """ Index queued locations. Returns number of processed items. """
+    queue = get_buffer(BUFFER_NAME)
+    total = 0
+    while True:
+        batch = queue.pop_many(batch_size)
+        if not batch:
+            break
+        index_locations(set(batch))
+        total += len(batch)
+    return total
+
+
+def rebuild(batch_size=1000):
+    """ Build entire index from scratch. Returns number of locations. """
+    from .models import Location
+    connection = get_connection()
+    for lang in index_languages():
+        keys = []
+        for key in connection.scan_iter(match=KEY.format(lang) + '*'):
+            keys.append(key)
+            if len(keys) >= batch_size:
+                connection.delete(*keys)
+                keys = []
+        if keys:
+            connection.delete(*keys)
+    count = 0
+    last_pk = 0
+    while True:
+        id_list = list(Location.objects.filter(pk__gt=last_pk).order_by('pk')
+                               .values_list('pk', flat=True)[:batch_size])
+        if not id_list:
+            break
+        count += index_locations(id_list, connection)
+        last_pk = id_list[-1]
+    return count
@@ -1,4 +1,5 @@
 # -*- coding: utf-8 -*-
+from django.contrib.auth.models import User
 from django.contrib.contenttypes.models import ContentType
 from django.db.models import Count
 
@@ -8,17 +9,16 @@ from actstream.actions import follow, unfollow
 from .models import Location
 
 
-def get_nearest_city(lat, lng):
-    """ Find nearest big city for given latitude and longitude.
+def get_nearest_city(lat, lng, radius=100.0, candidates=10):
+    """ Find nearest big city for given latitude and longitude. We take few
+        cities closest to given point (no further than `radius` kilometers)
+        and choose the most populated one.
     """
-    qs = Location.objects.filter(latitude__gte=lat-1,
-                                 latitude__lte=lat+1,
-                                 longitude__gte=lng-1,
-                                 longitude__lte=lng+1)
-    try:
-        return qs.order_by('-population')[0]
-    except IndexError:
+    qs = Location.objects.exclude(kind__in=['country', 'region', ])
+    cities = qs.nearest(lat, lng, limit=candidates, radius=radius)
+    if not len(cities):
         return None
+    return max(cities, key=lambda x: x.population or 0)
 
 
 def get_most_followed(country_code=None, limit=20):
@@ -77,9 +77,7 @@ def get_followers_from_location(location_pk, deep=False):
     followers = list(location.users.all())
     if not deep:
         return followers
-    for pk in location.get_children_id_list():
-        location = Location.objects.get(pk=pk)
-        for user in location.users.all():
-            if not user in followers:
-                followers.append(user)
+    followers += list(User.objects\
+        .filter(location__in=location.descendants())\
+        .exclude(pk__in=[x.pk for x in followers]).distinct())
     return followers
@@ -1,8 +1,17 @@
 import os, logging
+from slugify import slugify
 from django.conf import settings
 from django.contrib.auth.models import User
+from django.contrib.contenttypes.models import ContentType
+from django.db import transaction
 from geonames.models import *
+from maps.grid import geo_key
+from maps.models import MapGridCell, MapPointer
+from places_core import slugs
+from places_core.helpers import sanitizeHtml
+from places_core.search import enqueue_objects
 from .models import *
+from . import autocomplete, statistics
 
 # Let's work as superuser :)
 admin = User.objects.get(pk=1)
@@ -129,6 +138,181 @@ def load_country_data(code):
         load_region_data(region, nl)
 
 
+def chunks(items, size=1000):
+    """ Split list into smaller lists, e.g. to avoid huge IN clauses. """
+    items = list(items)
+    for i in xrange(0, len(items), size):
+        yield items[i:i + size]
+
+
+def get_translations(geonameids, country_code):
+    """
+    Bulk version of get_translation. Returns dictionary of geonameid - name
+    pairs fetched with one query per thousand objects.
+    """
+    country = CountryInfo.objects.filter(code=country_code).first()
+    if country is None:
+        return {}
+    lang = country.languages.split(',')[0].split('-')[0]
+    translations = {}
+    for ids in chunks(geonameids):
+        qs = AltName.objects.filter(geonameid__in=ids, language=lang)
+        for geonameid, name in qs.order_by('-pk')\
+                                 .values_list('geonameid', 'altername'):
+            translations[geonameid] = name
+    return translations
+
+
+def select_region_cities(cities):
+    """
+    Takes list of GeoName objects from single region and selects cities the
+    same way as load_region_data does, but without additional queries.
+    """
+    # Country capital region
+    main = [x for x in cities if x.feature_code == 'PPLC']
+    # Regular admin region (e.g. state or voivodeship)
+    if not main:
+        main = [x for x in cities if x.feature_code == 'PPLA']
+    forbidden = set(x.admin2 for x in main if x.admin2 is not None)
+    bad_codes = ['PPLX','PPLC','PPLA']
+    return [x for x in cities if x.admin2 not in forbidden
+            and x.feature_code not in bad_codes] + main
+
+
+def allocate_slugs(locations):
+    """
+    Set unique slugs for list of new locations the same way Location.save
+    does, but check existing slugs with a few queries for entire list.
+    """
+    bases = [slugify('-'.join([x.name, x.country_code])) for x in locations]
+    for location, slug in zip(locations, slugs.allocate_slugs(Location, bases)):
+        location.slug = slug
+
+
+def save_locations_bulk(locations, batch_size=1000):
+    """
+    Save list of new Location instances with batched inserts. Parents have
+    to be either saved already or placed earlier in the list. Work done by
+    post_save signals of single location is done afterwards in bulk: closure
+    table, map markers and grid and activity stream are written in the same
+    transaction, then locations are queued for autocomplete and search index
+    and follows of creator are added to location statistics.
+    """
+    # Imported here because actstreams module imports most of our models.
+    from places_core.actstreams import create_place_actions_bulk
+
+    parents = dict((x.pk, x) for x in locations)
+    missing = set(x.parent_id for x in locations) - set(parents) - set([None])
+    for parent in Location.objects.filter(pk__in=missing):
+        parents[parent.pk] = parent
+
+    description = sanitizeHtml(u'')
+    for location in locations:
+        location.description = description
+        if location.parent_id is not None:
+            parent = parents[location.parent_id]
+            location.country_code = parent.country_code
+            location.parent_list = ",".join(
+                [str(parent.pk)] + [x for x in (parent.parent_list or '')\
+                                                .split(',') if x])
+        else:
+            location.parent_list = ''
+        location.geo_key = geo_key(location.latitude, location.longitude)
+    allocate_slugs(locations)
+
+    ct = ContentType.objects.get_for_model(Location)
+    pointers = [MapPointer(content_type=ct, object_pk=x.pk, location_id=x.pk,
+                           latitude=x.latitude, longitude=x.longitude,
+                           geo_key=x.geo_key)
+                for x in locations if x.latitude and x.longitude]
+
+    with transaction.atomic():
+        Location.objects.bulk_create(locations, batch_size=batch_size)
+        LocationClosure.objects.add_nodes([(x.pk, x.parent_id)
+                                           for x in locations])
+        MapPointer.objects.bulk_create(pointers, batch_size=batch_size)
+        MapGridCell.objects.add_pointers([(x.latitude, x.longitude, ct.pk)
+                                          for x in pointers], batch_size)
+        follows = create_place_actions_bulk(locations, admin)
+
+    # Queues are filled after commit, so workers can see new locations
+    ids = [x.pk for x in locations]
+    if autocomplete.autocomplete_enabled():
+        autocomplete.record(ids)
+    enqueue_objects(Location, ids)
+    for follow in follows:
+        statistics.record(statistics.follow_entry(follow), 1)
+    return len(locations)
+
+
+def load_country_data_bulk(code, batch_size=1000):
+    """
+    Bulk version of load_country_data. Entire country hierarchy is prepared
+    in memory and saved in single transaction with batched inserts, so it
+    takes minutes instead of hours. Existing locations are skipped, just as
+    in load_country_data. Returns number of created locations.
+    """
+    code = code.upper()
+    country_info = CountryInfo.objects.get(code=code)
+    regions_info = list(AdminCode.objects.filter(country=code))
+
+    locations = [Location(
+        id = country_info.pk,
+        kind = 'country',
+        country_code = country_info.code,
+        creator = admin,
+        population = country_info.population
+    )]
+    for region in regions_info:
+        locations.append(Location(
+            id = region.pk,
+            kind = 'region',
+            country_code = country_info.code,
+            parent_id = country_info.pk,
+            creator = admin
+        ))
+        cities = GeoName.objects.filter(admin1=region.code, country=code)
+        for c in select_region_cities(list(cities)):
+            locations.append(Location(
+                id = c.pk,
+                name = c.name,
+                creator = admin,
+                kind = c.feature_code,
+                parent_id = region.pk,
+                latitude = c.latitude,
+                longitude = c.longitude,
+                country_code = c.country,
+                population = c.population
+            ))
+
+    ids = [x.pk for x in locations]
+    existing = set()
+    for chunk in chunks(ids):
+        existing.update(Location.objects.filter(pk__in=chunk)\
+                                        .values_list('pk', flat=True))
+    names = {country_info.pk: country_info.name}
+    names.update((x.pk, x.name) for x in regions_info)
+    translations = get_translations(set(ids) - existing, code)
+
+    created = []
+    seen = set(existing)
+    for location in locations:
+        if location.pk in seen:
+            continue
+        seen.add(location.pk)
+        location.name = translations.get(location.pk) \
+                        or names.get(location.pk, location.name)
+        created.append(location)
+
+    count = save_locations_bulk(created, batch_size)
+    logging.info("Created %s locations for country %s", count, code)
+
+    if not Country.objects.filter(location_id=country_info.pk).exists():
+        Country.objects.create(code=code, location_id=country_info.pk)
+        logging.info("Created related country: %s", code)
+    return count
+
+
 def load_translation_data(location_pk=None):
     """ This function updates location translations for registered languages. """
     langs = [x[0] for x in settings.LANGUAGES]
@@ -155,7 +339,10 @@ def load_translation_data(location_pk=None):
                              alt_name.language, l.pk)
 
 
-def load():
+def load(bulk=False):
     """ Loads entire data set for places above 1000 population. """
     for country in CountryInfo.objects.all():
-        load_country_data(country.code)
+        if bulk:
+            load_country_data_bulk(country.code)
+        else:
+            load_country_data(country.code)
@@ -0,0 +1,47 @@
+# -*- coding: utf-8 -*-
+import time
+
+from optparse import make_option
+
+from django.core.management.base import BaseCommand
+
+
+class Command(BaseCommand):
+    """
+    Create location tree (country, regions and cities) from imported
+    geonames data for selected country codes.
+
+    OPTIONS
+        --bulk          Save entire country with batched inserts
+        --batch-size    Number of rows inserted with single query
+    """
+    args = '<country_code country_code ...>'
+    option_list = BaseCommand.option_list + (
+        make_option('--bulk',
+            dest='bulk',
+            action='store_true',
+            default=False,
+            help=u"Save entire country with batched inserts"
+        ),
+        make_option('--batch-size',
+            dest='batch_size',
+            type='int',
+            default=1000,
+            help=u"Number of rows inserted with single query"
+        ),
+    )
+
+    def handle(self, *args, **options):
+        # Loader fetches superuser on import, so database must be ready.
+        from locations.loader import load_country_data, load_country_data_bulk
+
+        for code in args:
+            started = time.time()
+            if options['bulk']:
+                count = load_country_data_bulk(code, options['batch_size'])
+                self.stdout.write(u"{}: created {} locations".format(
+                                  code.upper(), count))
+            else:
+                load_country_data(code)
+            self.stdout.write(u"{}: finished in {:.1f}s".format(
+                              code.upper(), time.time() - started))
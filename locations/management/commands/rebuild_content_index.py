@@ -0,0 +1,28 @@
+# -*- coding: utf-8 -*-
+from optparse import make_option
+
+from django.core.management.base import BaseCommand
+
+from locations.models import LocationContent
+
+
+class Command(BaseCommand):
+    """
+    Rebuild location content index from scratch. Use it after changing
+    content with methods that bypass `save` (e.g. `QuerySet.update`).
+
+    OPTIONS
+        --batch-size    Number of rows inserted with single query
+    """
+    option_list = BaseCommand.option_list + (
+        make_option('--batch-size',
+            dest='batch_size',
+            type='int',
+            default=1000,
+            help=u"Number of rows inserted with single query"
+        ),
+    )
+
+    def handle(self, *args, **options):
+        count = LocationContent.objects.rebuild(options['batch_size'])
+        self.stdout.write(u"Indexed {} content objects".format(count))
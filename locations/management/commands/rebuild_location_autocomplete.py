@@ -0,0 +1,28 @@
+# -*- coding: utf-8 -*-
+from optparse import make_option
+
+from django.core.management.base import BaseCommand
+
+from locations import autocomplete
+
+
+class Command(BaseCommand):
+    """
+    Build location autocomplete index from scratch. Run it before enabling
+    LOCATION_AUTOCOMPLETE setting and after loading new locations.
+
+    OPTIONS
+        --batch-size    Number of locations indexed at once
+    """
+    option_list = BaseCommand.option_list + (
+        make_option('--batch-size',
+            dest='batch_size',
+            type='int',
+            default=1000,
+            help=u"Number of locations indexed at once"
+        ),
+    )
+
+    def handle(self, *args, **options):
+        count = autocomplete.rebuild(options['batch_size'])
+        self.stdout.write(u"Indexed {} locations".format(count))
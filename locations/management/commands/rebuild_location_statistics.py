@@ -0,0 +1,40 @@
+# -*- coding: utf-8 -*-
+from optparse import make_option
+
+from django.core.management.base import BaseCommand
+
+from locations import statistics
+from locations.tasks import rebuild_location_statistics
+
+
+class Command(BaseCommand):
+    """
+    Count daily statistics of all locations from scratch. Run it after
+    deployment and whenever counters went out of sync.
+
+    OPTIONS
+        --async         Run rebuild in celery worker
+        --batch-size    Number of counters saved at once
+    """
+    option_list = BaseCommand.option_list + (
+        make_option('--async',
+            action='store_true',
+            dest='async',
+            default=False,
+            help=u"Run rebuild in celery worker"
+        ),
+        make_option('--batch-size',
+            dest='batch_size',
+            type='int',
+            default=1000,
+            help=u"Number of counters saved at once"
+        ),
+    )
+
+    def handle(self, *args, **options):
+        if options['async']:
+            rebuild_location_statistics.delay()
+            self.stdout.write(u"Rebuild scheduled")
+            return
+        count = statistics.rebuild(options['batch_size'])
+        self.stdout.write(u"Saved {} counters".format(count))
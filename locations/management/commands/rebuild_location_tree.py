@@ -0,0 +1,28 @@
+# -*- coding: utf-8 -*-
+from optparse import make_option
+
+from django.core.management.base import BaseCommand
+
+from locations.models import LocationClosure
+
+
+class Command(BaseCommand):
+    """
+    Rebuild location closure table from scratch, based on `parent` relations.
+    Use it after loading locations with methods that bypass `Location.save`.
+
+    OPTIONS
+        --batch-size    Number of rows inserted with single query
+    """
+    option_list = BaseCommand.option_list + (
+        make_option('--batch-size',
+            dest='batch_size',
+            type='int',
+            default=1000,
+            help=u"Number of rows inserted with single query"
+        ),
+    )
+
+    def handle(self, *args, **options):
+        count = LocationClosure.objects.rebuild(options['batch_size'])
+        self.stdout.write(u"Created {} location paths".format(count))
@@ -0,0 +1,31 @@
+# -*- coding: utf-8 -*-
+from optparse import make_option
+
+from django.core.management.base import BaseCommand, CommandError
+
+from locations.ranking import refresh_ranking
+
+
+class Command(BaseCommand):
+    """
+    Gather location statistics presented in rankings. Snapshot is refreshed
+    daily by celery, run this command after deployment or to see
+    changes immediately.
+
+    OPTIONS
+        --batch-size    Number of locations processed at once
+    """
+    option_list = BaseCommand.option_list + (
+        make_option('--batch-size',
+            dest='batch_size',
+            type='int',
+            default=1000,
+            help=u"Number of locations processed at once"
+        ),
+    )
+
+    def handle(self, *args, **options):
+        count = refresh_ranking(options['batch_size'])
+        if count is None:
+            raise CommandError(u"Ranking is already being refreshed")
+        self.stdout.write(u"Ranked {} locations".format(count))
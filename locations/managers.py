@@ -1,15 +1,272 @@
 # -*- coding: utf-8 -*-
-from django.db import models
+import itertools
+
+from django.contrib.contenttypes.models import ContentType
+from django.core.exceptions import ObjectDoesNotExist
+from django.db import IntegrityError, models, transaction
 from django.utils import translation
 
 from places_core.helpers import sort_by_locale
 
 
+def iter_tree_paths(parent_map):
+    """
+    Generator that takes dictionary mapping location ID to parent ID and yields
+    (ancestor, descendant, depth) tuples for entire tree, including rows that
+    bind every location with itself.
+    """
+    for pk in parent_map:
+        yield pk, pk, 0
+        seen = set([pk])
+        depth = 1
+        parent = parent_map.get(pk)
+        while parent is not None and parent not in seen:
+            yield parent, pk, depth
+            seen.add(parent)
+            parent = parent_map.get(parent)
+            depth += 1
+
+
+def rebuild_location_tree(location_model, closure_model, batch_size=1000):
+    """
+    Recreate entire location closure table based on `parent` foreign keys.
+    Model classes are passed as arguments, so we can use it in migrations.
+    """
+    parent_map = dict(location_model.objects.values_list('pk', 'parent_id'))
+    paths = iter_tree_paths(parent_map)
+    count = 0
+    with transaction.atomic():
+        closure_model.objects.all().delete()
+        while True:
+            batch = [closure_model(ancestor_id=a, descendant_id=d, depth=depth)
+                     for a, d, depth in itertools.islice(paths, batch_size)]
+            if not batch:
+                break
+            closure_model.objects.bulk_create(batch)
+            count += len(batch)
+    return count
+
+
+# Content models gathered in location content index: app label, model name,
+# title field and category field (or None).
+INDEXED_CONTENT = (
+    ('ideas', 'idea', 'name', 'category'),
+    ('blog', 'news', 'title', 'category'),
+    ('polls', 'poll', 'title', None),
+    ('topics', 'discussion', 'question', 'category'),
+    ('projects', 'socialproject', 'name', None),
+)
+
+
+def indexed_content_fields(app_label, model_name):
+    """ Get title and category field names or None if model is not indexed. """
+    for label, name, title_field, category_field in INDEXED_CONTENT:
+        if label == app_label and name == model_name:
+            return title_field, category_field
+    return None
+
+
+def content_index_values(obj, title_field, category_field=None):
+    """ Values for content index entry describing given object. """
+    if category_field is not None:
+        category = getattr(obj, category_field + '_id')
+    else:
+        category = None
+    return {
+        'location_id': obj.location_id,
+        'creator_id': obj.creator_id,
+        'category': category,
+        'title': getattr(obj, title_field)[:255],
+        'date_created': obj.date_created,
+    }
+
+
+def rebuild_content_index(apps, index_model, batch_size=1000):
+    """
+    Recreate entire location content index. Models are taken from `apps`
+    registry, so we can use it in migrations.
+    """
+    content_type_model = apps.get_model('contenttypes', 'ContentType')
+    count = 0
+    with transaction.atomic():
+        index_model.objects.all().delete()
+        for label, name, title_field, category_field in INDEXED_CONTENT:
+            ct, created = content_type_model.objects.get_or_create(
+                app_label=label, model=name, defaults={'name': name})
+            objects = apps.get_model(label, name).objects.all().iterator()
+            while True:
+                batch = [index_model(content_type_id=ct.pk, object_id=x.pk,
+                            **content_index_values(x, title_field, category_field))
+                         for x in itertools.islice(objects, batch_size)]
+                if not batch:
+                    break
+                index_model.objects.bulk_create(batch)
+                count += len(batch)
+    return count
+
+
 class LocationLocaleManager(models.Manager):
     """
     A manager that allows to order locations albhabetically with local utf-8 signs
     taken into account.
     """
     def get_queryset(self):
-        return sort_by_locale(super(LocationLocaleManager, self).get_queryset(),
-                        lambda x: x.__unicode__(), translation.get_language())
+        from .names import prefetch_names
+        return sort_by_locale(
+            prefetch_names(super(LocationLocaleManager, self).get_queryset()),
+            lambda x: x.__unicode__(), translation.get_language())
+
+
+class LocationClosureManager(models.Manager):
+    """
+    Manager that keeps location closure table in sync with `parent` relations.
+    """
+    batch_size = 1000
+
+    def _parent_paths(self, location):
+        """ Get (ancestor, depth) pairs for parent of given location. """
+        if location.parent_id is None:
+            return []
+        paths = list(self.filter(descendant_id=location.parent_id)\
+                         .values_list('ancestor_id', 'depth'))
+        if not paths:
+            # Parent was saved before closure table existed.
+            try:
+                parent = location.parent
+            except ObjectDoesNotExist:
+                return []
+            self.sync_node(parent)
+            paths = list(self.filter(descendant_id=location.parent_id)\
+                             .values_list('ancestor_id', 'depth'))
+        return paths
+
+    def sync_node(self, location):
+        """
+        Update paths for given location and entire subtree below. Location
+        that did not change its parent costs three small queries (own node,
+        its ancestors and ancestors of parent) and subtree is read only when
+        ancestors differ, so it is safe to call it after every save. Returns
+        True when paths were changed.
+        """
+        pk = location.pk
+        with transaction.atomic():
+            node, created = self.get_or_create(ancestor_id=pk,
+                                               descendant_id=pk,
+                                               defaults={'depth': 0})
+            parents = self._parent_paths(location)
+            if created:
+                # Children saved before their parent (e.g. when loading
+                # fixtures) become part of subtree of newly created location.
+                subtree = [(pk, 0)] + [(d, depth + 1) for d, depth in \
+                    self.filter(ancestor__parent_id=pk)\
+                        .values_list('descendant_id', 'depth')]
+                self.bulk_create([
+                    self.model(ancestor_id=pk, descendant_id=d, depth=depth)
+                    for d, depth in subtree[1:]], batch_size=self.batch_size)
+                if not parents and len(subtree) == 1:
+                    return True
+            else:
+                current = set(self.filter(descendant_id=pk, depth__gt=0)\
+                                  .values_list('ancestor_id', 'depth'))
+                if current == set((a, depth + 1) for a, depth in parents):
+                    return False
+                subtree = list(self.filter(ancestor_id=pk)\
+                                   .values_list('descendant_id', 'depth'))
+            id_list = [x[0] for x in subtree]
+            self.filter(descendant_id__in=id_list)\
+                .exclude(ancestor_id__in=id_list).delete()
+            self.bulk_create([
+                self.model(ancestor_id=a, descendant_id=d, depth=ad + dd + 1)
+                for a, ad in parents for d, dd in subtree],
+                batch_size=self.batch_size)
+        return True
+
+    def add_nodes(self, nodes):
+        """
+        Create paths for many new locations at once. `nodes` is a list of
+        (id, parent id) pairs where parents come before their children.
+        Locations already present in the tree are not touched. Returns
+        number of created paths.
+        """
+        ids = set(pk for pk, parent in nodes)
+        outside = set(parent for pk, parent in nodes
+                      if parent is not None and parent not in ids)
+        chains = {}
+        for a, d, depth in self.filter(descendant_id__in=outside)\
+                .values_list('ancestor_id', 'descendant_id', 'depth'):
+            chains.setdefault(d, []).append((a, depth))
+        paths = []
+        for pk, parent in nodes:
+            chains[pk] = [(pk, 0)] + [(a, depth + 1) for a, depth
+                                      in chains.get(parent, [])]
+            paths.extend(self.model(ancestor_id=a, descendant_id=pk,
+                                    depth=depth) for a, depth in chains[pk])
+        self.bulk_create(paths, batch_size=self.batch_size)
+        return len(paths)
+
+    def rebuild(self, batch_size=None):
+        """ Rebuild entire table from scratch. Returns number of created paths. """
+        location_model = self.model._meta.get_field('ancestor').rel.to
+        return rebuild_location_tree(location_model, self.model,
+                                     batch_size or self.batch_size)
+
+
+class LocationContentManager(models.Manager):
+    """
+    Manager that keeps location content index in sync with content objects
+    and lets us filter and sort mixed content with database queries.
+    """
+    def _lookup(self, obj):
+        ct = ContentType.objects.get_for_model(obj)
+        return {'content_type_id': ct.pk, 'object_id': obj.pk, }
+
+    def index_object(self, obj):
+        """ Create or update index entry for given content object. """
+        ct = ContentType.objects.get_for_model(obj)
+        fields = indexed_content_fields(ct.app_label, ct.model)
+        if fields is None:
+            return
+        lookup = self._lookup(obj)
+        values = content_index_values(obj, *fields)
+        if self.filter(**lookup).update(**values):
+            return
+        try:
+            with transaction.atomic():
+                self.create(**dict(lookup, **values))
+        except IntegrityError:
+            self.filter(**lookup).update(**values)
+
+    def remove_object(self, obj):
+        self.filter(**self._lookup(obj)).delete()
+
+    def search(self, locations, content='all', time=None, haystack=None,
+               category=None, sortby=None):
+        """
+        Get entries for given locations (list or queryset) filtered and
+        sorted as in location summary. `time` is the oldest creation date
+        to take into account.
+        """
+        qs = self.filter(location__in=locations)
+        if content != 'all':
+            qs = qs.filter(content_type_id__in=[
+                ContentType.objects.get_by_natural_key(label, name).pk
+                for label, name, title, cat in INDEXED_CONTENT
+                if name == content])
+        if time is not None:
+            qs = qs.filter(date_created__gte=time)
+        if haystack:
+            qs = qs.filter(title__icontains=haystack)
+        if category is not None:
+            qs = qs.filter(category=category)
+        if sortby == 'title':
+            return qs.order_by('title', 'pk')
+        elif sortby == 'oldest':
+            return qs.order_by('date_created', 'pk')
+        elif sortby == 'user':
+            return qs.order_by('creator__last_name', '-date_created', '-pk')
+        return qs.order_by('-date_created', '-pk')
+
+    def rebuild(self, batch_size=1000):
+        """ Rebuild entire index. Returns number of created entries. """
+        from django.apps import apps
+        return rebuild_content_index(apps, self.model, batch_size)
@@ -0,0 +1,39 @@
+# -*- coding: utf-8 -*-
+from __future__ import unicode_literals
+
+from django.db import models, migrations
+
+from locations.managers import rebuild_location_tree
+
+
+def build_location_tree(apps, schema_editor):
+    Location = apps.get_model('locations', 'Location')
+    LocationClosure = apps.get_model('locations', 'LocationClosure')
+    rebuild_location_tree(Location, LocationClosure)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('locations', '0012_auto_20150707_1500'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='LocationClosure',
+            fields=[
+                ('id', models.AutoField(verbose_name='ID', serialize=False, auto_created=True, primary_key=True)),
+                ('depth', models.PositiveIntegerField(default=0)),
+                ('ancestor', models.ForeignKey(related_name='descendant_paths', to='locations.Location')),
+                ('descendant', models.ForeignKey(related_name='ancestor_paths', to='locations.Location')),
+            ],
+            options={
+            },
+            bases=(models.Model,),
+        ),
+        migrations.AlterUniqueTogether(
+            name='locationclosure',
+            unique_together=set([('ancestor', 'descendant')]),
+        ),
+        migrations.RunPython(build_location_tree),
+    ]
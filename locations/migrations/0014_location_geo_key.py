@@ -0,0 +1,31 @@
+# -*- coding: utf-8 -*-
+from __future__ import unicode_literals
+
+from django.db import models, migrations
+
+from maps.grid import geo_key
+
+
+def fill_geo_keys(apps, schema_editor):
+    Location = apps.get_model('locations', 'Location')
+    qs = Location.objects.filter(latitude__isnull=False,
+                                 longitude__isnull=False)
+    for pk, lat, lng in qs.values_list('pk', 'latitude', 'longitude').iterator():
+        Location.objects.filter(pk=pk).update(geo_key=geo_key(lat, lng))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('locations', '0013_locationclosure'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='location',
+            name='geo_key',
+            field=models.BigIntegerField(db_index=True, null=True, blank=True),
+            preserve_default=True,
+        ),
+        migrations.RunPython(fill_geo_keys),
+    ]
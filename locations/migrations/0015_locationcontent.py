@@ -0,0 +1,54 @@
+# -*- coding: utf-8 -*-
+from __future__ import unicode_literals
+
+from django.db import models, migrations
+from django.conf import settings
+
+from locations.managers import rebuild_content_index
+
+
+def build_content_index(apps, schema_editor):
+    LocationContent = apps.get_model('locations', 'LocationContent')
+    rebuild_content_index(apps, LocationContent)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('contenttypes', '0001_initial'),
+        ('locations', '0014_location_geo_key'),
+        ('ideas', '0013_idea_vote_tallies'),
+        ('blog', '0005_auto_20150921_1440'),
+        ('polls', '0006_auto_20151001_1532'),
+        ('topics', '0002_auto_20151001_1532'),
+        ('projects', '0010_socialproject_modules'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='LocationContent',
+            fields=[
+                ('id', models.AutoField(verbose_name='ID', serialize=False, auto_created=True, primary_key=True)),
+                ('object_id', models.PositiveIntegerField()),
+                ('category', models.PositiveIntegerField(null=True, blank=True)),
+                ('title', models.CharField(max_length=255)),
+                ('date_created', models.DateTimeField()),
+                ('content_type', models.ForeignKey(to='contenttypes.ContentType')),
+                ('creator', models.ForeignKey(related_name='+', to=settings.AUTH_USER_MODEL)),
+                ('location', models.ForeignKey(related_name='content_index', to='locations.Location')),
+            ],
+            options={
+            },
+            bases=(models.Model,),
+        ),
+        migrations.AlterUniqueTogether(
+            name='locationcontent',
+            unique_together=set([('content_type', 'object_id')]),
+        ),
+        migrations.AlterIndexTogether(
+            name='locationcontent',
+            index_together=set([('location', 'date_created')]),
+        ),
+        migrations.RunPython(build_content_index),
+    ]
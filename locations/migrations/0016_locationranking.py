@@ -0,0 +1,42 @@
+# -*- coding: utf-8 -*-
+from __future__ import unicode_literals
+
+from django.db import models, migrations
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('locations', '0015_locationcontent'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='LocationRanking',
+            fields=[
+                ('id', models.AutoField(verbose_name='ID', serialize=False, auto_created=True, primary_key=True)),
+                ('language', models.CharField(max_length=10)),
+                ('name', models.CharField(max_length=200)),
+                ('sort_key', models.CharField(max_length=255)),
+                ('kind', models.CharField(max_length=10)),
+                ('country_code', models.CharField(max_length=10)),
+                ('level', models.PositiveIntegerField(null=True, blank=True)),
+                ('population', models.IntegerField(null=True, blank=True)),
+                ('user_count', models.PositiveIntegerField(default=0)),
+                ('action_count', models.PositiveIntegerField(default=0)),
+                ('avg_points', models.FloatField(default=0.0)),
+                ('location', models.ForeignKey(related_name='rankings', to='locations.Location')),
+            ],
+            options={
+            },
+            bases=(models.Model,),
+        ),
+        migrations.AlterUniqueTogether(
+            name='locationranking',
+            unique_together=set([('location', 'language')]),
+        ),
+        migrations.AlterIndexTogether(
+            name='locationranking',
+            index_together=set([('language', 'country_code', 'level'), ('language', 'kind')]),
+        ),
+    ]
@@ -0,0 +1,31 @@
+# -*- coding: utf-8 -*-
+from __future__ import unicode_literals
+
+from django.db import models, migrations
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('locations', '0016_locationranking'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='LocationDailyCount',
+            fields=[
+                ('id', models.AutoField(verbose_name='ID', serialize=False, auto_created=True, primary_key=True)),
+                ('metric', models.CharField(max_length=20)),
+                ('day', models.DateField()),
+                ('count', models.IntegerField(default=0)),
+                ('location', models.ForeignKey(related_name='daily_counts', to='locations.Location')),
+            ],
+            options={
+            },
+            bases=(models.Model,),
+        ),
+        migrations.AlterUniqueTogether(
+            name='locationdailycount',
+            unique_together=set([('location', 'metric', 'day')]),
+        ),
+    ]
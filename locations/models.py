@@ -7,24 +7,31 @@ from slugify import slugify
 
 from django.conf import settings
 from django.db import models
-from django.db.models.signals import post_delete, post_save
+from django.db.models.signals import m2m_changed, post_delete, post_save, \
+                                     pre_delete, pre_save
 from django.template.defaultfilters import capfirst, truncatewords_html
 from django.core.urlresolvers import reverse
 from django.contrib.auth.models import User
+from django.contrib.contenttypes.fields import GenericForeignKey
 from django.contrib.contenttypes.models import ContentType
 from django.utils.translation import get_language
 from django.utils.translation import ugettext_lazy as _
 from django.utils.encoding import python_2_unicode_compatible
 
-from actstream.models import model_stream
+from actstream.models import Action, Follow, model_stream
+from maps.managers import SpatialManager
+from maps.models import set_geo_key
 from maps.signals import create_marker
 from places_core.helpers import sanitizeHtml, TagFilter, sort_by_locale
+from places_core.slugs import save_with_slug
 from places_core.storage import OverwriteStorage, ReplaceStorage
 from gallery.image_manager import ImageManager as IM
 from gallery.image import resize_background_image, delete_background_image, \
                            delete_image, rename_background_file
 
-from .managers import LocationLocaleManager
+from . import autocomplete, names, statistics
+from .managers import LocationClosureManager, LocationContentManager, \
+                      LocationLocaleManager
 
 
 def get_upload_path(instance, filename):
@@ -268,9 +275,11 @@ class Location(models.Model):
 
     background = models.ForeignKey(LocationBackgroundFile, blank=True,
                                    null=True, verbose_name=_(u"background"))
+    # Spatial index key for latitude and longitude, see maps.grid
+    geo_key = models.BigIntegerField(blank=True, null=True, db_index=True)
 
     # custom managers
-    objects = models.Manager()
+    objects = SpatialManager()
     locale_sorted = LocationLocaleManager()
 
     #contents = LocationContentManager
@@ -323,12 +332,7 @@ class Location(models.Model):
 
     @property
     def translation(self):
-        lang = get_language().split('-')[0]
-        alt = self.names.filter(language=lang)
-        if not len(alt):
-            return self.name
-        else:
-            return alt[0].altername
+        return names.translated_name(self)
 
     @property
     def get_capital(self):
@@ -388,23 +392,8 @@ class Location(models.Model):
                                      for x in self.get_parent_id_list()])
 
         # Create unique slug that includes country code for SEO
-        slug = slugify('-'.join([self.name, self.country_code]))
-        self.slug = slug
-        success = False
-        retries = 0
-        while not success:
-            check = self.__class__.objects.filter(slug=self.slug)\
-                                          .exclude(pk=self.pk).count()
-            if not check:
-                success = True
-            else:
-                # We assume maximum number of 50 elements with the same name.
-                # But the loop should be breaked if something went wrong.
-                if retries >= 50:
-                    raise models.ValidationError(u"Maximum number of retries exceeded")
-                retries += 1
-                self.slug = "{}-{}".format(slug, retries)
-        super(Location, self).save(*args, **kwargs)
+        save_with_slug(self, slugify('-'.join([self.name, self.country_code])),
+                       lambda: super(Location, self).save(*args, **kwargs))
 
     def get_parent_chain(self, parents=None, response='JSON'):
         """
@@ -414,17 +403,17 @@ class Location(models.Model):
         """
         if parents == None:
             parents = []
-        if self.parent:
+        # Ancestors are read with one query, starting from the top one
+        ancestors = names.prefetch_names(self.ancestors())
+        for parent in reversed(ancestors):
             if response == 'JSON':
                 parents.append({
-                    'pk': self.parent.pk,
-                    'name': self.parent.__unicode__(),
-                    'url': self.parent.get_absolute_url(),
+                    'pk': parent.pk,
+                    'name': parent.__unicode__(),
+                    'url': parent.get_absolute_url(),
                 })
             else:
-                parents.append(self.parent)
-            if self.parent.parent:
-                self.parent.get_parent_chain(parents, response)
+                parents.append(parent)
         return reversed(parents)
 
     def parents(self, parents=None):
@@ -473,11 +462,22 @@ class Location(models.Model):
         """ Returns all id's of sublocations for this location. """
         if ids is None:
             ids = []
-        for a in self.location_set.all():
-            ids.append(a.pk)
-            a.get_children_id_list(ids)
+        ids.extend(self.descendants().values_list('pk', flat=True))
         return ids
 
+    def descendants(self, include_self=False):
+        """ QuerySet of all sublocations fetched with single query. """
+        return Location.objects.filter(
+            ancestor_paths__ancestor=self,
+            ancestor_paths__depth__gte=0 if include_self else 1)
+
+    def ancestors(self, include_self=False):
+        """ QuerySet of all parent locations, starting from the top one. """
+        return Location.objects.filter(
+            descendant_paths__descendant=self,
+            descendant_paths__depth__gte=0 if include_self else 1)\
+            .order_by('-descendant_paths__depth')
+
     def count_users_actions(self, user):
         """
         Count actions related to this place performed
@@ -516,12 +516,7 @@ class Location(models.Model):
     def content_objects(self):
         """ Returns a list of objects connected with this location (idea, discussion,
         news and poll), sorts from latest. """
-        qs = [obj_to_dict(x) for x in self.poll_set.all()]
-        qs += [obj_to_dict(x) for x in self.news_set.all()]
-        qs += [obj_to_dict(x) for x in self.idea_set.all()]
-        qs += [obj_to_dict(x) for x in self.discussion_set.all()]
-        qs += [obj_to_dict(x) for x in self.projects.all()]
-        return sorted(qs, key=lambda x: x['date_created'], reverse=True)
+        return serialize_content(LocationContent.objects.search([self]))
 
     def published_items(self, content_type=None):
         """
@@ -554,17 +549,234 @@ class Location(models.Model):
         return items
 
     def __str__(self):
-        lang = get_language().split('-')[0]
-        alt = self.names.filter(language=lang)
-        if not len(alt):
-            return self.name
-        else:
-            return alt[0].altername
+        return names.translated_name(self)
 
 
+pre_save.connect(set_geo_key, sender=Location)
 post_save.connect(create_marker, sender=Location)
 
 
+class LocationClosure(models.Model):
+    """
+    Closure table that holds every ancestor - descendant pair in location
+    tree, so we can fetch entire branch with one query. Every location is
+    also bound with itself with depth 0.
+    """
+    ancestor = models.ForeignKey(Location, related_name='descendant_paths')
+    descendant = models.ForeignKey(Location, related_name='ancestor_paths')
+    depth = models.PositiveIntegerField(default=0)
+
+    objects = LocationClosureManager()
+
+    class Meta:
+        unique_together = ('ancestor', 'descendant',)
+
+    def __unicode__(self):
+        return u"{} -> {} ({})".format(self.ancestor_id, self.descendant_id,
+                                       self.depth)
+
+
+def update_location_tree(sender, instance, **kwargs):
+    """ Keep closure table up to date when location is saved. """
+    LocationClosure.objects.sync_node(instance)
+
+post_save.connect(update_location_tree, sender=Location)
+
+
+def remember_location_label(sender, instance, raw=False, **kwargs):
+    """ Store name and parents of edited location before it's saved. """
+    instance._autocomplete_origin = None
+    if instance.pk is not None and not raw and \
+            autocomplete.autocomplete_enabled():
+        instance._autocomplete_origin = Location.objects\
+            .filter(pk=instance.pk).values_list('name', 'parent').first()
+
+
+def update_location_autocomplete(sender, instance, created, raw=False,
+                                 **kwargs):
+    """
+    Queue changed location to be indexed for autocomplete. Labels of
+    sublocations contain location name, so they are updated as well.
+    """
+    if raw or not autocomplete.autocomplete_enabled():
+        return
+    id_list = [instance.pk]
+    origin = getattr(instance, '_autocomplete_origin', None)
+    if origin is not None and \
+            tuple(origin) != (instance.name, instance.parent_id):
+        id_list = LocationClosure.objects.filter(ancestor=instance)\
+                                 .values_list('descendant', flat=True)
+    autocomplete.record(id_list)
+
+
+def remove_location_autocomplete(sender, instance, **kwargs):
+    if autocomplete.autocomplete_enabled():
+        autocomplete.record([instance.pk])
+
+
+def update_alternames_autocomplete(sender, instance, action, reverse, pk_set,
+                                   **kwargs):
+    """ Index location again when its alternate names are changed. """
+    if not autocomplete.autocomplete_enabled() or \
+            action not in ('post_add', 'post_remove', 'post_clear'):
+        return
+    if not reverse:
+        id_list = [instance.pk]
+    else:
+        id_list = list(pk_set or [])
+    autocomplete.record(id_list)
+
+
+def forget_location_names(sender, instance, action, reverse, pk_set,
+                          **kwargs):
+    """ Clear cached translations when alternate names of location change. """
+    if not reverse:
+        names.forget_names([instance.pk])
+    elif pk_set is not None:
+        names.forget_names(pk_set)
+    else:
+        names.forget_names(instance.alternames.values_list('pk', flat=True))
+
+
+def forget_altername(sender, instance, **kwargs):
+    """ Clear cached translations when alternate name is edited or deleted. """
+    if instance.pk is not None:
+        names.forget_names(instance.alternames.values_list('pk', flat=True))
+
+
+pre_save.connect(remember_location_label, sender=Location)
+post_save.connect(update_location_autocomplete, sender=Location)
+post_delete.connect(remove_location_autocomplete, sender=Location)
+m2m_changed.connect(update_alternames_autocomplete,
+                    sender=Location.names.through)
+m2m_changed.connect(forget_location_names, sender=Location.names.through)
+post_save.connect(forget_altername, sender=AlterLocationName)
+pre_delete.connect(forget_altername, sender=AlterLocationName)
+
+
+class LocationContent(models.Model):
+    """
+    Index of content published in locations (ideas, news, polls, discussions
+    and projects). Lets us filter, sort and paginate all kinds of content
+    together with single query. Entries are updated by signal handlers below,
+    connected in apps that own indexed models.
+    """
+    content_type = models.ForeignKey(ContentType)
+    object_id = models.PositiveIntegerField()
+    content_object = GenericForeignKey('content_type', 'object_id')
+    location = models.ForeignKey(Location, related_name='content_index')
+    creator = models.ForeignKey(User, related_name='+')
+    # Categories are different models for every content type
+    category = models.PositiveIntegerField(null=True, blank=True)
+    title = models.CharField(max_length=255)
+    date_created = models.DateTimeField()
+
+    objects = LocationContentManager()
+
+    class Meta:
+        unique_together = ('content_type', 'object_id',)
+        index_together = [['location', 'date_created'], ]
+
+    def __unicode__(self):
+        return self.title
+
+
+def index_location_content(sender, instance, raw=False, **kwargs):
+    """ Keep location content index up to date when object is saved. """
+    if not raw:
+        LocationContent.objects.index_object(instance)
+
+
+def remove_location_content(sender, instance, **kwargs):
+    LocationContent.objects.remove_object(instance)
+
+
+def serialize_content(entries):
+    """
+    Turn list of LocationContent entries into dictionaries (see obj_to_dict).
+    Objects are fetched with one query per content type.
+    """
+    id_lists = {}
+    for entry in entries:
+        id_lists.setdefault(entry.content_type_id, []).append(entry.object_id)
+    objects = {}
+    for ct_id, id_list in id_lists.iteritems():
+        model = ContentType.objects.get_for_id(ct_id).model_class()
+        related = ['creator__profile', 'location', ]
+        if 'category' in model._meta.get_all_field_names():
+            related.append('category')
+        qs = model.objects.select_related(*related)
+        for pk, obj in qs.in_bulk(id_list).iteritems():
+            objects[(ct_id, pk)] = obj
+    return [obj_to_dict(objects[(x.content_type_id, x.object_id)])
+            for x in entries if (x.content_type_id, x.object_id) in objects]
+
+
+class LocationRanking(models.Model):
+    """
+    Snapshot of location statistics presented in location rankings, with one
+    entry for every location and language. It's refreshed periodically (see
+    `locations.ranking`), so ranking views may filter, sort and paginate
+    locations in database.
+    """
+    location = models.ForeignKey(Location, related_name='rankings')
+    language = models.CharField(max_length=10)
+    # Translated name and its collation key used for alphabetical order
+    name = models.CharField(max_length=200)
+    sort_key = models.CharField(max_length=255)
+    kind = models.CharField(max_length=10)
+    country_code = models.CharField(max_length=10)
+    # Distance from country location (0 for countries themselves), empty
+    # for locations that don't belong to any country
+    level = models.PositiveIntegerField(null=True, blank=True)
+    population = models.IntegerField(null=True, blank=True)
+    user_count = models.PositiveIntegerField(default=0)
+    action_count = models.PositiveIntegerField(default=0)
+    avg_points = models.FloatField(default=0.0)
+
+    class Meta:
+        unique_together = ('location', 'language',)
+        index_together = [['language', 'country_code', 'level'],
+                          ['language', 'kind'], ]
+
+    def __unicode__(self):
+        return self.name
+
+    def get_absolute_url(self):
+        return self.location.get_absolute_url()
+
+    def thumb_url(self):
+        return self.location.thumb_url()
+
+    @property
+    def active_users(self):
+        if not self.population:
+            return 'n/a'
+        percentage = self.user_count / float(self.population) * 100.0
+        if percentage > 100:
+            return 'n/a'
+        return "{:.2f}%".format(percentage)
+
+
+class LocationDailyCount(models.Model):
+    """
+    Daily counters of actions and followers of location presented in
+    statistics charts. Rows are built by `locations.statistics.rebuild` and
+    then updated from action and follow signals.
+    """
+    location = models.ForeignKey(Location, related_name='daily_counts')
+    metric = models.CharField(max_length=20)
+    day = models.DateField()
+    count = models.IntegerField(default=0)
+
+    class Meta:
+        unique_together = ('location', 'metric', 'day',)
+
+    def __unicode__(self):
+        return "{} {} {}: {}".format(self.location_id, self.metric, self.day,
+                                     self.count)
+
+
 @python_2_unicode_compatible
 class Country(models.Model):
     """ """
@@ -582,3 +794,28 @@ class Country(models.Model):
 
     def __str__(self):
         return self.code
+
+
+def count_location_action(sender, instance, created, raw=False, **kwargs):
+    """ Update daily counters of location statistics. """
+    if created and not raw:
+        statistics.record(statistics.action_entry(instance), 1)
+
+
+def uncount_location_action(sender, instance, **kwargs):
+    statistics.record(statistics.action_entry(instance), -1)
+
+
+def count_location_follow(sender, instance, created, raw=False, **kwargs):
+    if created and not raw:
+        statistics.record(statistics.follow_entry(instance), 1)
+
+
+def uncount_location_follow(sender, instance, **kwargs):
+    statistics.record(statistics.follow_entry(instance), -1)
+
+
+post_save.connect(count_location_action, sender=Action)
+post_delete.connect(uncount_location_action, sender=Action)
+post_save.connect(count_location_follow, sender=Follow)
+post_delete.connect(uncount_location_follow, sender=Follow)
@@ -0,0 +1,116 @@
+# -*- coding: utf-8 -*-
+"""
+Translated location names. Translations are kept in AlterLocationName table,
+so presenting list of locations used to run query for every location. Here
+names are read in bulk and remembered in small in-process LRU cache, which
+is cleared for location when its alternate names change. Entries expire
+after LOCATION_NAME_CACHE_TIMEOUT seconds, so other processes see changes
+as well.
+"""
+import threading
+import time
+from collections import OrderedDict
+
+from django.conf import settings
+from django.utils.translation import get_language
+
+# Maximum number of names kept in cache.
+CACHE_SIZE = getattr(settings, 'LOCATION_NAME_CACHE_SIZE', 10000)
+
+# Number of seconds after which cached name is read again.
+CACHE_TIMEOUT = getattr(settings, 'LOCATION_NAME_CACHE_TIMEOUT', 300)
+
+
+class NameCache(object):
+    """ Least recently used entries are removed when cache is full. """
+    def __init__(self, size=CACHE_SIZE, timeout=CACHE_TIMEOUT):
+        self.size = size
+        self.timeout = timeout
+        self.entries = OrderedDict()
+        self.lock = threading.Lock()
+
+    def get(self, key, default=None):
+        with self.lock:
+            entry = self.entries.pop(key, None)
+            if entry is None or entry[1] < time.time():
+                return default
+            # Move entry to the end, so it's removed as the last one
+            self.entries[key] = entry
+            return entry[0]
+
+    def set(self, key, value):
+        with self.lock:
+            self.entries.pop(key, None)
+            self.entries[key] = (value, time.time() + self.timeout)
+            while len(self.entries) > self.size:
+                self.entries.popitem(last=False)
+
+    def delete(self, key):
+        with self.lock:
+            self.entries.pop(key, None)
+
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
+
+
+cache = NameCache()
+
+# Stored for locations without translation, so we don't look for it again.
+MISSING = ''
+
+
+def current_language():
+    return get_language().split('-')[0]
+
+
+def load_names(location_ids, lang):
+    """
+    Read translations of given locations in one query and put them into
+    cache. Returns dictionary with location ID as key and translated name
+    (or MISSING) as value.
+    """
+    from .models import Location
+    names = dict((pk, MISSING) for pk in location_ids)
+    through = Location.names.through.objects.filter(
+        location__in=location_ids, alterlocationname__language=lang)\
+        .order_by('alterlocationname')
+    for pk, name in through.values_list('location',
+                                        'alterlocationname__altername'):
+        if not names[pk]:
+            names[pk] = name
+    for pk, name in names.iteritems():
+        cache.set((pk, lang), name)
+    return names
+
+
+def prefetch_names(locations, lang=None):
+    """
+    Load translated names for list or queryset of locations with single
+    query, so displaying them doesn't hit database anymore. Returns list.
+    """
+    locations = list(locations)
+    lang = lang or current_language()
+    missing = [x.pk for x in locations
+               if cache.get((x.pk, lang)) is None]
+    if missing:
+        load_names(missing, lang)
+    return locations
+
+
+def translated_name(location, lang=None):
+    """ Name of location in given (or current) language. """
+    if location.pk is None:
+        return location.name
+    lang = lang or current_language()
+    name = cache.get((location.pk, lang))
+    if name is None:
+        name = load_names([location.pk], lang)[location.pk]
+    return name or location.name
+
+
+def forget_names(location_ids):
+    """ Remove translations of given locations from cache. """
+    for pk in location_ids:
+        for code, label in settings.LANGUAGES:
+            cache.delete((pk, code.split('-')[0]))
@@ -0,0 +1,142 @@
+# -*- coding: utf-8 -*-
+"""
+Location ranking snapshot. Counting users, actions and points for every
+location on each request used to take a few queries per location, so now
+statistics are gathered periodically with grouped queries and stored in
+LocationRanking table, one entry for every location and language.
+
+Snapshot is replaced in batches of locations, each in its own transaction,
+so refresh of huge tree doesn't hold one long transaction and readers see
+old entries of locations that were not processed yet. Refresh runs under
+a cache lock, so it never overlaps another one.
+"""
+from uuid import uuid4
+
+from django.contrib.contenttypes.models import ContentType
+from django.core import cache
+from django.db import transaction
+from django.db.models import Count, Sum
+
+from actstream.models import Action
+
+from places_core.helpers import get_collator, locale_sort_key
+
+from .autocomplete import index_languages
+
+redis_cache = cache.get_cache('default')
+
+LOCK_KEY = 'locations:ranking:lock'
+
+# Lock expires after this number of seconds if its owner died. Owner renews
+# it after every batch.
+LOCK_TIMEOUT = 60 * 10
+
+
+def average_points(user_count, points):
+    """ The same value as presented by `Location.avg_points`. """
+    if not points:
+        return 0.0
+    return user_count / float(points)
+
+
+def location_stats(first_pk, last_pk):
+    """
+    Gather statistics of locations with primary keys in given range.
+    Returns list of dictionaries with values for LocationRanking fields
+    (without language dependent ones) and dictionary of translated names.
+    """
+    from .models import Location, LocationClosure
+    locations = Location.objects.filter(pk__gt=first_pk, pk__lte=last_pk)
+    stats = []
+    for pk, name, kind, population, code, user_count, points in locations\
+            .annotate(user_count=Count('users'),
+                      points=Sum('users__profile__rank_pts'))\
+            .values_list('pk', 'name', 'kind', 'population', 'country_code',
+                         'user_count', 'points'):
+        stats.append({
+            'location_id': pk,
+            'name': name,
+            'kind': kind,
+            'population': population,
+            'country_code': code,
+            'user_count': user_count,
+            'avg_points': average_points(user_count, points),
+        })
+
+    levels = dict(LocationClosure.objects.filter(
+        descendant__pk__gt=first_pk, descendant__pk__lte=last_pk,
+        ancestor__kind='country').values_list('descendant', 'depth'))
+
+    ct = ContentType.objects.get_for_model(Location)
+    actions = dict(Action.objects.filter(target_content_type=ct,
+        target_object_id__in=[unicode(x['location_id']) for x in stats])\
+        .values('target_object_id').annotate(count=Count('pk'))\
+        .values_list('target_object_id', 'count'))
+
+    for entry in stats:
+        entry['level'] = levels.get(entry['location_id'])
+        entry['action_count'] = actions.get(unicode(entry['location_id']), 0)
+
+    alternames = {}
+    through = Location.names.through.objects.filter(
+        location__pk__gt=first_pk, location__pk__lte=last_pk)\
+        .order_by('alterlocationname')
+    for pk, lang, name in through.values_list('location',
+            'alterlocationname__language', 'alterlocationname__altername'):
+        alternames.setdefault(lang, {}).setdefault(pk, name)
+    return stats, alternames
+
+
+def refresh_batch(first_pk, last_pk, languages, collators):
+    """
+    Replace entries of locations with primary keys in given range. Returns
+    number of ranked locations.
+    """
+    from .models import LocationRanking
+    stats, alternames = location_stats(first_pk, last_pk)
+    entries = []
+    for lang in languages:
+        names = alternames.get(lang, {})
+        for entry in stats:
+            name = names.get(entry['location_id'], entry['name'])
+            entries.append(LocationRanking(**dict(entry,
+                language=lang, name=name,
+                sort_key=locale_sort_key(collators[lang], name))))
+    with transaction.atomic():
+        LocationRanking.objects.filter(location__pk__gt=first_pk,
+                                       location__pk__lte=last_pk).delete()
+        LocationRanking.objects.bulk_create(entries)
+    return len(stats)
+
+
+def refresh_ranking(batch_size=1000):
+    """
+    Replace ranking snapshot with current statistics, batch after batch.
+    Returns number of ranked locations or None when another refresh is
+    running.
+    """
+    from .models import Location, LocationRanking
+    token = uuid4().hex
+    if not redis_cache.add(LOCK_KEY, token, LOCK_TIMEOUT):
+        return None
+    try:
+        languages = index_languages()
+        collators = dict((x, get_collator(x)) for x in languages)
+        LocationRanking.objects.exclude(language__in=languages).delete()
+        count = 0
+        last_pk = 0
+        while True:
+            id_list = list(Location.objects.filter(pk__gt=last_pk)
+                .order_by('pk').values_list('pk', flat=True)[:batch_size])
+            if not id_list:
+                break
+            count += refresh_batch(last_pk, id_list[-1], languages, collators)
+            last_pk = id_list[-1]
+            if redis_cache.get(LOCK_KEY) != token:
+                # Lock expired and another refresh has started
+                break
+            redis_cache.set(LOCK_KEY, token, LOCK_TIMEOUT)
+    finally:
+        if redis_cache.get(LOCK_KEY) == token:
+            redis_cache.delete(LOCK_KEY)
+    return count
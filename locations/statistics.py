@@ -0,0 +1,274 @@
+# -*- coding: utf-8 -*-
+"""
+Location statistics presented in charts. Counting whole history of actions
+and followers on every page load was slow, so we keep daily counters in
+LocationDailyCount table:
+
+    * rollups are built from scratch by `rebuild` (celery task and
+      `rebuild_location_statistics` command),
+    * new and deleted actions and follows are queued by signal handlers and
+      applied in background by `flush`.
+
+Both take the same lock, so queued changes are not applied while counters
+are rebuilt.
+
+Charts are made from single document per location, kept in cache for
+LOCATION_STATISTICS_TIMEOUT seconds together with time it was created.
+"""
+import datetime
+import json
+import time
+
+from django.apps import apps
+from django.conf import settings
+from django.core import cache
+from django.db import IntegrityError, transaction
+from django.db.models import Count, F
+from django.contrib.contenttypes.models import ContentType
+from django.utils import timezone
+
+from places_core.buffers import get_buffer, push_or_apply
+from places_core.timeline import count_by_day, local_date, today
+
+redis_cache = cache.get_cache('default')
+
+# Name of the queue with counter changes.
+BUFFER_NAME = 'statistics'
+
+# Number of queued changes applied at once.
+FLUSH_SIZE = getattr(settings, 'LOCATION_STATISTICS_FLUSH_SIZE', 500)
+
+# Number of seconds statistics document is kept in cache.
+CACHE_TIMEOUT = getattr(settings, 'LOCATION_STATISTICS_TIMEOUT', 900)
+
+CACHE_KEY = 'locations:statistics:{}'
+
+LOCK_KEY = 'locations:statistics:lock'
+
+# Lock expires after this number of seconds if its owner died.
+LOCK_TIMEOUT = 60 * 60
+
+# Actions are counted separately for every kind of content.
+CONTENT_METRICS = (
+    ('ideas', 'ideas', 'idea'),
+    ('polls', 'polls', 'poll'),
+    ('news', 'blog', 'news'),
+    ('discussions', 'topics', 'discussion'),
+    ('projects', 'projects', 'socialproject'),
+)
+
+FOLLOWERS = 'followers'
+
+
+def location_type():
+    from .models import Location
+    return ContentType.objects.get_for_model(Location)
+
+
+def content_metrics():
+    """ Dictionary of metric names by content type ID. """
+    metrics = {}
+    for metric, app_label, model_name in CONTENT_METRICS:
+        ct = ContentType.objects.get_for_model(
+            apps.get_model(app_label, model_name))
+        metrics[ct.pk] = metric
+    return metrics
+
+
+def action_entry(action):
+    """ Counter changed by given action or None if action isn't counted. """
+    if action.target_content_type_id != location_type().pk:
+        return None
+    metric = content_metrics().get(action.action_object_content_type_id)
+    if metric is None:
+        return None
+    return [int(action.target_object_id),
+            local_date(action.timestamp).isoformat(), metric]
+
+
+def follow_entry(follow):
+    """ Counter changed by given follow or None if it's not location. """
+    if follow.content_type_id != location_type().pk:
+        return None
+    return [int(follow.object_id), local_date(follow.started).isoformat(),
+            FOLLOWERS]
+
+
+def record(entry, delta):
+    """ Queue change of counter given as [location ID, day, metric]. """
+    if entry is None:
+        return
+    push_or_apply(BUFFER_NAME, [entry + [delta]], apply_changes)
+
+
+def apply_changes(items):
+    """
+    Add queued changes to daily counters. Changes of the same counter are
+    summed first, so every counter is updated once.
+    """
+    from .models import Location, LocationDailyCount
+    changes = {}
+    for pk, day, metric, delta in items:
+        key = (pk, day, metric)
+        changes[key] = changes.get(key, 0) + delta
+    existing = set(Location.objects.filter(
+        pk__in=set(x[0] for x in changes)).values_list('pk', flat=True))
+    for (pk, day, metric), delta in changes.iteritems():
+        if not delta or pk not in existing:
+            continue
+        counters = LocationDailyCount.objects.filter(location_id=pk,
+                                                     day=day, metric=metric)
+        if counters.update(count=F('count') + delta):
+            continue
+        try:
+            with transaction.atomic():
+                LocationDailyCount.objects.create(location_id=pk, day=day,
+                                                  metric=metric, count=delta)
+        except IntegrityError:
+            # Counter was created by another process in the meantime
+            counters.update(count=F('count') + delta)
+    for pk in existing:
+        redis_cache.delete(CACHE_KEY.format(pk))
+
+
+def flush(batch_size=FLUSH_SIZE):
+    """
+    Apply queued changes. Returns number of processed items. Nothing is done
+    while counters are rebuilt - changes wait in the queue for the next run.
+    """
+    if not redis_cache.add(LOCK_KEY, 1, LOCK_TIMEOUT):
+        return 0
+    queue = get_buffer(BUFFER_NAME)
+    total = 0
+    try:
+        while True:
+            batch = queue.pop_many(batch_size)
+            if not batch:
+                break
+            apply_changes(batch)
+            total += len(batch)
+    finally:
+        redis_cache.delete(LOCK_KEY)
+    return total
+
+
+def rebuild(batch_size=1000):
+    """
+    Count actions and followers of all locations from scratch with grouped
+    queries. Fixes counters that went out of sync, e.g. after contents of
+    location were moved to another one. Only days before today are counted
+    again - changes made during rebuild belong to today, so they are applied
+    by flush as usual. Returns number of created rows.
+    """
+    # Wait until running flush is finished
+    while not redis_cache.add(LOCK_KEY, 1, LOCK_TIMEOUT):
+        time.sleep(1)
+    try:
+        return rebuild_counters(batch_size)
+    finally:
+        redis_cache.delete(LOCK_KEY)
+
+
+def rebuild_counters(batch_size):
+    from actstream.models import Action, Follow
+    from .models import Location, LocationDailyCount
+    ct = location_type()
+    metrics = content_metrics()
+    cutoff = today()
+    counts = {}
+    actions = Action.objects.filter(
+        target_content_type=ct, action_object_content_type__in=list(metrics))
+    for (pk, ct_id, day), count in count_by_day(actions, 'timestamp',
+            group_by=('target_object_id', 'action_object_content_type'),
+            until=cutoff).iteritems():
+        key = (int(pk), metrics[ct_id], day)
+        counts[key] = counts.get(key, 0) + count
+    follows = Follow.objects.filter(content_type=ct)
+    for (pk, day), count in count_by_day(follows, 'started',
+                                         group_by=('object_id', ),
+                                         until=cutoff).iteritems():
+        key = (int(pk), FOLLOWERS, day)
+        counts[key] = counts.get(key, 0) + count
+
+    existing = set(Location.objects.values_list('pk', flat=True))
+    rows = [LocationDailyCount(location_id=pk, metric=metric, day=day,
+                               count=count)
+            for (pk, metric, day), count in counts.iteritems()
+            if pk in existing]
+    with transaction.atomic():
+        LocationDailyCount.objects.filter(day__lt=cutoff).delete()
+        for i in range(0, len(rows), batch_size):
+            LocationDailyCount.objects.bulk_create(rows[i:i + batch_size])
+
+    # Queued changes of past days were counted above, changes of today are
+    # put back for flush. Nobody else takes items while we hold the lock.
+    queue = get_buffer(BUFFER_NAME)
+    queued = len(queue)
+    while queued > 0:
+        batch = queue.pop_many(min(queued, batch_size))
+        if not batch:
+            break
+        queued -= len(batch)
+        for item in batch:
+            if item[1] >= cutoff.isoformat():
+                queue.push(item)
+    return len(rows)
+
+
+def daily_series(counts, start, end):
+    """ List of counters for every day from start to end. """
+    series = []
+    day = start
+    while day <= end:
+        series.append(counts.get(day, 0))
+        day += datetime.timedelta(days=1)
+    return series
+
+
+def build_document(location):
+    """ Gather all statistics of location presented in charts. """
+    from .models import LocationContent, LocationDailyCount
+    metrics = content_metrics()
+    content = dict((x[0], 0) for x in CONTENT_METRICS)
+    for ct_id, count in LocationContent.objects.filter(location=location)\
+            .order_by().values_list('content_type')\
+            .annotate(count=Count('pk')):
+        if ct_id in metrics:
+            content[metrics[ct_id]] = count
+
+    counts = {}
+    for metric, day, count in LocationDailyCount.objects\
+            .filter(location=location)\
+            .values_list('metric', 'day', 'count'):
+        counts.setdefault(metric, {})[day] = count
+
+    end = today()
+    action_days = [day for metric, days in counts.iteritems()
+                   if metric != FOLLOWERS for day in days]
+    actions_started = min(action_days) if action_days else end
+    followers_started = local_date(location.date_created)
+    return {
+        'updated': timezone.now().isoformat(),
+        'content': content,
+        'actions': {
+            'started': actions_started.isoformat(),
+            'series': dict((x[0], daily_series(counts.get(x[0], {}),
+                                               actions_started, end))
+                           for x in CONTENT_METRICS),
+        },
+        'followers': {
+            'started': followers_started.isoformat(),
+            'series': daily_series(counts.get(FOLLOWERS, {}),
+                                   followers_started, end),
+        },
+    }
+
+
+def get_statistics(location):
+    """ Statistics document of location, taken from cache if possible. """
+    key = CACHE_KEY.format(location.pk)
+    document = redis_cache.get(key)
+    if document is None:
+        document = json.dumps(build_document(location))
+        redis_cache.set(key, document, timeout=CACHE_TIMEOUT)
+    return json.loads(document)
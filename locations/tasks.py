@@ -0,0 +1,50 @@
+# -*- coding: utf-8 -*-
+import datetime
+
+from celery import task
+from celery.task.base import periodic_task
+
+from . import autocomplete, statistics
+from .ranking import refresh_ranking
+
+import logging
+logger = logging.getLogger('tasks')
+
+
+@periodic_task(run_every=datetime.timedelta(minutes=1))
+def update_location_autocomplete():
+    """ Index locations queued after they were changed. """
+    if not autocomplete.autocomplete_enabled():
+        return 0
+    count = autocomplete.flush()
+    if count:
+        logger.info(u"Indexed {} queued locations".format(count))
+    return count
+
+
+@periodic_task(run_every=datetime.timedelta(days=1))
+def refresh_location_ranking():
+    """ Gather fresh statistics for location rankings. """
+    count = refresh_ranking()
+    if count is None:
+        logger.info(u"Location ranking is already being refreshed")
+    else:
+        logger.info(u"Refreshed ranking of {} locations".format(count))
+    return count
+
+
+@periodic_task(run_every=datetime.timedelta(minutes=1))
+def update_location_statistics():
+    """ Apply queued changes of location statistics counters. """
+    count = statistics.flush()
+    if count:
+        logger.info(u"Applied {} location statistics changes".format(count))
+    return count
+
+
+@task(name='locations.rebuild_location_statistics')
+def rebuild_location_statistics():
+    """ Count daily statistics of all locations from scratch. """
+    count = statistics.rebuild()
+    logger.info(u"Rebuilt {} location statistics counters".format(count))
+    return count
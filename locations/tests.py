@@ -1,13 +1,18 @@
 # -*- coding: utf-8 -*-
 from django.test import TestCase, Client
+from django.test.utils import override_settings
 from django.core import cache
 from django.contrib.auth.models import User
+from django.utils import timezone
 
 from actstream.actions import follow
 
 from ideas.models import Idea
 
-from .models import Location
+from . import autocomplete, names, statistics
+from .models import AlterLocationName, Location, LocationClosure, \
+                    LocationContent, LocationDailyCount, LocationRanking
+from .ranking import refresh_ranking
 from .forms import LocationForm
 from .helpers import get_followers_from_location
 
@@ -28,6 +33,291 @@ class ParentChildrenChainTestCase(TestCase):
         self.assertEqual(pl.kind, 'country')
 
 
+class LocationTreeTestCase(TestCase):
+    """ Test closure table used to fetch location ancestors and descendants. """
+    fixtures = ['fixtures/users.json',
+                'fixtures/locations.json',]
+
+    def setUp(self):
+        self.country = Location.objects.get(slug='poland-pl')
+        self.city = Location.objects.get(slug='brzeg-pl-1')
+
+    def test_country_descendants(self):
+        """ Country should contain every other location from fixtures. """
+        descendants = self.country.descendants()
+        self.assertEqual(descendants.count(), Location.objects.count() - 1)
+        self.assertIn(self.city, descendants)
+        self.assertNotIn(self.country, descendants)
+        self.assertIn(self.country, self.country.descendants(include_self=True))
+
+    def test_city_ancestors(self):
+        """ Ancestors should be ordered from the top level location. """
+        ancestors = list(self.city.ancestors())
+        self.assertEqual(ancestors, [self.country, self.city.parent])
+        self.assertEqual(list(self.city.ancestors(include_self=True))[-1],
+                         self.city)
+
+    def test_move_location_to_another_parent(self):
+        """ Moving location should update paths for entire subtree. """
+        old_region = self.city.parent
+        new_region = Location.objects.get(slug='pomeranian-voivodeship-pl')
+        district = Location.objects.create(creator=self.city.creator,
+                                           name='Test District',
+                                           parent=self.city)
+        self.city.parent = new_region
+        self.city.save()
+        self.assertNotIn(district, old_region.descendants())
+        self.assertIn(district, new_region.descendants())
+        self.assertIn(district, self.country.descendants())
+        self.assertEqual(list(district.ancestors()),
+                         [self.country, new_region, self.city])
+
+    def test_unchanged_location_is_cheap(self):
+        """ Subtree isn't read when location keeps its parent. """
+        region = self.city.parent
+        # Savepoint, own node, ancestors, parent paths and release
+        with self.assertNumQueries(5):
+            self.assertFalse(LocationClosure.objects.sync_node(region))
+
+    def test_rebuild_tree(self):
+        """ Rebuilding closure table gives the same paths. """
+        paths = set(LocationClosure.objects\
+            .values_list('ancestor_id', 'descendant_id', 'depth'))
+        LocationClosure.objects.rebuild()
+        self.assertEqual(paths, set(LocationClosure.objects\
+            .values_list('ancestor_id', 'descendant_id', 'depth')))
+
+
+class AutocompleteTestCase(TestCase):
+    """ Entries of location autocomplete index. """
+    fixtures = ['fixtures/users.json',
+                'fixtures/locations.json',]
+
+    def test_name_prefixes(self):
+        terms = autocomplete.name_terms([u"Nowy Sącz"])
+        self.assertEqual(terms, set([u"nowy sacz", u"sacz"]))
+        prefixes = autocomplete.term_prefixes(terms)
+        self.assertIn(u"now", prefixes)
+        self.assertIn(u"sa", prefixes)
+        self.assertNotIn(u"s", prefixes)
+
+    def test_entry_label_contains_parents(self):
+        city = Location.objects.get(slug='brzeg-pl-1')
+        entries = autocomplete.location_entries([city.pk])
+        pk, score, entry = entries['en'][0]
+        self.assertEqual(pk, city.pk)
+        self.assertEqual(entry['label'].split()[0], city.name)
+        self.assertIn(city.parent.name, entry['label'])
+
+    def test_countries_are_ranked_first(self):
+        self.assertGreater(autocomplete.location_score('country', 0),
+                           autocomplete.location_score('PPL', 10 ** 7))
+
+
+class TranslatedNameTestCase(TestCase):
+    """ Cached translations of location names. """
+    fixtures = ['fixtures/users.json',
+                'fixtures/locations.json',]
+
+    def setUp(self):
+        names.cache.clear()
+        self.city = Location.objects.get(slug='brzeg-pl-1')
+        self.city.names.add(AlterLocationName.objects.create(
+            altername=u"Brieg", language='de'))
+
+    def test_names_are_prefetched(self):
+        locations = names.prefetch_names(Location.objects.all()[:10], 'en')
+        with self.assertNumQueries(0):
+            [names.translated_name(x, 'en') for x in locations]
+
+    def test_cache_is_cleared_after_change(self):
+        self.assertEqual(names.translated_name(self.city, 'de'), u"Brieg")
+        altername = self.city.names.get()
+        altername.altername = u"Brzeg an der Oder"
+        altername.save()
+        self.assertEqual(names.translated_name(self.city, 'de'),
+                         u"Brzeg an der Oder")
+        self.city.names.clear()
+        self.assertEqual(names.translated_name(self.city, 'de'),
+                         self.city.name)
+
+
+class LocationRankingTestCase(TestCase):
+    """ Ranking snapshot used by location ranking views. """
+    fixtures = ['fixtures/users.json',
+                'fixtures/countries.json',
+                'fixtures/locations.json',]
+
+    def setUp(self):
+        self.city = Location.objects.get(slug='brzeg-pl-1')
+        self.city.users.add(*User.objects.all()[:2])
+        refresh_ranking(batch_size=10)
+
+    def test_snapshot_statistics(self):
+        entry = LocationRanking.objects.get(location=self.city, language='en')
+        self.assertEqual(entry.user_count, 2)
+        self.assertEqual(entry.level, 2)
+        self.assertEqual(entry.country_code, 'PL')
+        self.assertEqual(LocationRanking.objects.filter(language='en').count(),
+                         Location.objects.count())
+
+    def test_refresh_replaces_entries(self):
+        """ Second refresh replaces entries instead of adding new ones. """
+        count = LocationRanking.objects.count()
+        self.city.users.remove(*User.objects.all()[:1])
+        self.assertEqual(refresh_ranking(batch_size=3),
+                         Location.objects.count())
+        self.assertEqual(LocationRanking.objects.count(), count)
+        entry = LocationRanking.objects.get(location=self.city, language='en')
+        self.assertEqual(entry.user_count, 1)
+
+    def test_city_ranking(self):
+        response = Client().get('/ranking/pl/?o=usercount')
+        self.assertEqual(response.status_code, 200)
+        entries = list(response.context['object_list'])
+        self.assertEqual(entries[0].location, self.city)
+        self.assertTrue(all(x.level == 2 for x in entries))
+
+
+@override_settings(BUFFER_BACKEND='local')
+class LocationStatisticsTestCase(TestCase):
+    """ Daily counters used in location statistics charts. """
+    fixtures = ['fixtures/users.json',
+                'fixtures/locations.json',]
+
+    def setUp(self):
+        self.city = Location.objects.get(slug='brzeg-pl-1')
+        follow(User.objects.all()[0], self.city)
+
+    def counters(self):
+        return sorted(LocationDailyCount.objects.filter(location=self.city)
+                      .values_list('metric', 'day', 'count'))
+
+    def test_follow_is_counted(self):
+        document = statistics.build_document(self.city)
+        self.assertEqual(sum(document['followers']['series']), 1)
+        self.assertEqual(document['content']['ideas'],
+                         self.city.idea_set.count())
+
+    def test_rebuild_gives_the_same_counters(self):
+        counters = self.counters()
+        statistics.rebuild()
+        self.assertEqual(self.counters(), counters)
+
+    def test_flush_waits_for_rebuild(self):
+        """ Changes counted by rebuild are not applied again. """
+        from places_core.buffers import get_buffer
+        queue = get_buffer(statistics.BUFFER_NAME)
+        queue.push([self.city.pk, '2015-01-01', statistics.FOLLOWERS, 1])
+        cache.get_cache('default').set(statistics.LOCK_KEY, 1)
+        self.assertEqual(statistics.flush(), 0)
+        self.assertEqual(len(queue), 1)
+        cache.get_cache('default').delete(statistics.LOCK_KEY)
+        statistics.rebuild()
+        self.assertEqual(len(queue), 0)
+
+    def test_change_during_rebuild(self):
+        """ Follow made while rebuild is counting is applied only once. """
+        from actstream.models import Follow
+        from places_core.buffers import get_buffer
+        from places_core.timeline import today
+        queue = get_buffer(statistics.BUFFER_NAME)
+        user = User.objects.all()[1]
+        count_by_day = statistics.count_by_day
+
+        def count_and_follow(*args, **kwargs):
+            if not Follow.objects.filter(user=user).exists():
+                # Saved without signals and queued, as signal handler
+                # would do with redis backend
+                obj = Follow(user=user, content_object=self.city,
+                             actor_only=False, started=timezone.now())
+                Follow.objects.bulk_create([obj])
+                queue.push(statistics.follow_entry(obj) + [1])
+            return count_by_day(*args, **kwargs)
+
+        statistics.count_by_day = count_and_follow
+        try:
+            statistics.rebuild()
+        finally:
+            statistics.count_by_day = count_by_day
+        self.assertEqual(len(queue), 1)
+        statistics.flush()
+        self.assertIn((statistics.FOLLOWERS, today(), 2), self.counters())
+
+
+@override_settings(BUFFER_BACKEND='local')
+class BulkLoaderTestCase(TestCase):
+    """ Test saving locations in batches without per-row signals. """
+    fixtures = ['fixtures/users.json',
+                'fixtures/locations.json',]
+
+    def test_bulk_saved_locations(self):
+        """ Bulk save gives the same results as regular save. """
+        from activities.models import ActionLocation
+        from maps.models import MapPointer
+        from .loader import save_locations_bulk
+        country = Location.objects.get(slug='poland-pl')
+        creator = User.objects.get(pk=1)
+        region = Location(id=900001, name='Poland', kind='region',
+                          parent_id=country.pk, creator=creator)
+        city = Location(id=900002, name='Brzeg', kind='PPL',
+                        parent_id=region.pk, creator=creator,
+                        latitude=50.86, longitude=17.46)
+        self.assertEqual(save_locations_bulk([region, city]), 2)
+        city = Location.objects.get(pk=900002)
+        self.assertEqual(Location.objects.get(pk=900001).slug, 'poland-pl-1')
+        self.assertEqual(city.get_parents, [region.pk, country.pk])
+        self.assertEqual(list(city.ancestors()), [country, region])
+        self.assertIn(city, country.descendants())
+        self.assertTrue(MapPointer.objects.for_model(city).exists())
+        # Action about new city is shown in streams of its ancestors
+        self.assertTrue(ActionLocation.objects.filter(location=country,
+            action__action_object_object_id=unicode(city.pk)).exists())
+        self.assertEqual(LocationDailyCount.objects.filter(location=city,
+            metric=statistics.FOLLOWERS).values_list('count', flat=True)[0], 1)
+
+
+class LocationContentTestCase(TestCase):
+    """ Test index of content published in locations. """
+    fixtures = ['fixtures/users.json',
+                'fixtures/locations.json',]
+
+    def setUp(self):
+        self.user = User.objects.create_user('tester', 'tester@test.com', 'pass')
+        self.location = Location.objects.get(slug='brzeg-pl-1')
+        self.idea = Idea.objects.create(name="Test idea", description="test",
+            location=self.location, creator=self.user)
+
+    def test_saved_object_is_indexed(self):
+        entries = LocationContent.objects.search([self.location])
+        self.assertEqual([x.content_object for x in entries], [self.idea])
+        self.assertEqual(entries[0].title, "Test idea")
+
+    def test_index_follows_changes(self):
+        self.idea.name = "Changed"
+        self.idea.location = self.location.parent
+        self.idea.save()
+        self.assertFalse(LocationContent.objects.search([self.location]))
+        entries = LocationContent.objects.search([self.location.parent],
+                                                 haystack="chang")
+        self.assertEqual(entries[0].object_id, self.idea.pk)
+
+    def test_deleted_object_is_removed(self):
+        self.idea.delete()
+        self.assertFalse(LocationContent.objects.exists())
+
+    def test_filter_by_content_type(self):
+        self.assertEqual(LocationContent.objects.search(
+            [self.location], content='idea').count(), 1)
+        self.assertEqual(LocationContent.objects.search(
+            [self.location], content='poll').count(), 0)
+
+    def test_rebuild_index(self):
+        LocationContent.objects.all().delete()
+        self.assertEqual(LocationContent.objects.rebuild(), 1)
+        self.assertEqual(self.location.content_objects()[0]['pk'], self.idea.pk)
+
+
 class MarkerCacheTestCase(TestCase):
     """ """
     fixtures = ['fixtures/users.json',]
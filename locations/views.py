@@ -6,7 +6,7 @@ import os
 from dateutil.relativedelta import relativedelta
 
 from django.core.exceptions import ObjectDoesNotExist
-from django.db.models import Count
+from django.db.models import Q
 from django.template.base import TemplateDoesNotExist
 from django.shortcuts import render, get_object_or_404, redirect, render_to_response
 from django.http import HttpResponse, HttpResponseForbidden, HttpResponseNotFound, \
@@ -18,6 +18,7 @@ from django.core.paginator import Paginator, EmptyPage, PageNotAnInteger
 from django.conf import settings
 from django.contrib import messages
 from django.utils import timezone, translation
+from django.utils.dateparse import parse_datetime
 from django.utils.translation import ugettext as _
 from django.views.generic import DetailView, View
 from django.views.generic.list import ListView
@@ -44,11 +45,11 @@ from ideas.models import Idea
 from ideas.models import Category as IdeaCategory
 from ideas.forms import CategoryForm as IdeaCategoryForm
 from maps.models import MapPointer
-from notifications.models import notify
+from notifications.models import notify_many
 from organizations.forms import NGOSearchForm
 from organizations.models import Organization
 from places_core.helpers import TagFilter, process_background_image, \
-                sort_by_locale, get_time_difference
+                get_time_difference
 from places_core.mixins import LoginRequiredMixin
 from places_core.permissions import is_moderator
 from polls.models import Poll, Answer
@@ -60,7 +61,9 @@ from .charts import actions_chart, follow_chart, pie_chart, summary_chart
 from .forms import *
 from .helpers import move_location_contents
 from .mixins import LocationContextMixin
-from .models import Location, Country
+from .models import Location, LocationRanking, Country
+from .names import current_language
+from .statistics import get_statistics
 from .links import LINKS_MAP as links
 
 redis_cache = cache.get_cache('default')
@@ -75,35 +78,38 @@ def update_parent_location_list(location):
 
 
 class SearchableLocationView(ListView):
-    model = Location
+    """
+    Base view for location rankings. Statistics are read from ranking
+    snapshot, so filtering, sorting and pagination happens in database.
+    """
+    model = LocationRanking
     template_name = 'locations/location_ranking.html'
     paginate_by = 25
 
     country = None
 
+    # Allowed values of `o` parameter and fields used to sort entries
+    ordering_fields = {
+        'name': 'sort_key',
+        'usercount': 'user_count',
+        'actioncount': 'action_count',
+        'avg': 'avg_points',
+    }
+
     def dispatch(self, *args, **kwargs):
         code = kwargs.get('code', settings.DEFAULT_COUNTRY_CODE)
         self.country = get_object_or_404(Country, code=code.upper())
         return super(SearchableLocationView, self).dispatch(*args, **kwargs)
 
     def get_queryset(self):
-        qs = self.get_initial_queryset()
-
-        order_by = self.request.GET.get('o')
-        order_dir = self.request.GET.get('d')
-
-        # Get ordering field name
-        if order_by == 'name':
-            order = 'name'
-        elif order_by == 'actioncount':
-            order = 'actioncount'
-        elif order_by == 'avg':
-            order = 'avg'
-        else:
-            order = 'usercount'
+        qs = LocationRanking.objects.filter(language=current_language())
+        qs = self.filter_queryset(qs).select_related('location__background')
+
+        order = self.ordering_fields.get(self.request.GET.get('o'),
+                                         'user_count')
 
         # Get ordering direction (asc/desc)
-        if order_dir == 'asc':
+        if self.request.GET.get('d') == 'asc':
             prefix = ''
         else:
             prefix = '-'
@@ -111,29 +117,11 @@ class SearchableLocationView(ListView):
         # Allow simplified searching
         search_term = self.request.GET.get('q')
         if search_term is not None:
-            qs = qs.filter(name__icontains=search_term)
-
-        # Less common sorting options that database cannot handle
-        if order == 'actioncount':
-            if prefix == '':
-                sqs = sorted(qs, key=lambda x: x.target_actions.count())
-            else:
-                sqs = sorted(qs, key=lambda x: x.target_actions.count(), reverse=True)
-            return sqs
-        elif order == 'avg':
-            if prefix == '':
-                sqs = sorted(qs, key=lambda x: float(x.avg_points))
-            else:
-                sqs = sorted(qs, key=lambda x: float(x.avg_points), reverse=True)
-            return sqs
-        elif order == 'name':
-            if prefix == '':
-                sqs = sort_by_locale(qs, key=lambda x: x.__unicode__())
-            else:
-                sqs = sort_by_locale(qs, key=lambda x: x.__unicode__(), reverse=True)
-            return sqs
-
-        return qs.order_by("{}{}".format(prefix, order))
+            qs = qs.filter(Q(name__icontains=search_term) |
+                           Q(location__name__icontains=search_term))
+
+        return qs.order_by("{}{}".format(prefix, order),
+                           "{}location".format(prefix))
 
     def get_context_data(self, **kwargs):
         context = super(SearchableLocationView, self).get_context_data(**kwargs)
@@ -143,30 +131,15 @@ class SearchableLocationView(ListView):
 
 class CityRankingView(SearchableLocationView):
 
-    def get_initial_queryset(self):
-        children_ids = []
-        for l in self.country.location.location_set.all():
-            children_ids += [x[0] for x in l.location_set.values_list('pk')]
-
-        return Location.objects\
-            .annotate(usercount=Count('users'))\
-            .filter(pk__in=children_ids)
+    def filter_queryset(self, qs):
+        return qs.filter(country_code=self.country.code, level=2)
 
 
 class LocationRankingView(SearchableLocationView):
 
-    def get_initial_queryset(self):
-        location = self.country.location
-        children_ids = [location.pk, ]
-        children_ids += [x[0] for x in location.location_set.values_list('pk')]
-        for l in location.location_set.all():
-            children_ids += [x[0] for x in l.location_set.values_list('pk')]
-
-        return Location.objects\
-            .filter(country_code=self.country.code)\
-            .exclude(kind__in=['country', 'region'])\
-            .exclude(pk__in=children_ids)\
-            .annotate(usercount=Count('users'))
+    def filter_queryset(self, qs):
+        return qs.filter(country_code=self.country.code, level__gt=2)\
+                 .exclude(kind__in=['country', 'region'])
 
     def get_context_data(self, **kwargs):
         context = super(LocationRankingView, self).get_context_data(**kwargs)
@@ -176,18 +149,15 @@ class LocationRankingView(SearchableLocationView):
 
 class RegionRankingView(SearchableLocationView):
 
-    def get_initial_queryset(self):
-        return Location.objects.filter(kind='region')\
-            .filter(country_code=self.country.code)\
-            .annotate(usercount=Count('users'))
+    def filter_queryset(self, qs):
+        return qs.filter(kind='region', country_code=self.country.code)
 
 
 class CountryRankingView(SearchableLocationView):
     template_name = 'locations/country_list.html'
 
-    def get_initial_queryset(self):
-        return Location.objects.filter(kind='country')\
-            .annotate(usercount=Count('users'))
+    def filter_queryset(self, qs):
+        return qs.filter(kind='country')
 
 
 class LocationAccessMixin(SingleObjectMixin):
@@ -217,11 +187,13 @@ class LocationStatisticsView(LocationViewMixin):
 
     def get_context_data(self, **kwargs):
         context = super(LocationStatisticsView, self).get_context_data(**kwargs)
+        statistics = get_statistics(self.object)
         context.update({
-            'pie_data': pie_chart(self.object),
-            'summary_data': summary_chart(self.object),
-            'timeline_data': actions_chart(self.object),
-            'follower_data': follow_chart(self.object), })
+            'pie_data': pie_chart(self.object, statistics),
+            'summary_data': summary_chart(self.object, statistics),
+            'timeline_data': actions_chart(self.object, statistics),
+            'follower_data': follow_chart(self.object, statistics),
+            'updated': parse_datetime(statistics['updated']), })
         return context
 
 
@@ -928,13 +900,15 @@ class ManageModeratorsView(ModeratorListAccessMixin):
             context = self.get_context_data()
             context['form'] = form
             return render(request, self.template_name, context)
+        granted = []
         for user in User.objects.filter(email__in=form.cleaned_data['emails']):
             if not self.location in user.profile.mod_areas.all():
                 user.profile.mod_areas.add(self.location)
                 user.profile.save()
-                notify(self.request.user, user,
-                    verb=_(u"Granted you moderator access to"),
-                    action_target=self.location)
+                granted.append(user)
+        notify_many(self.request.user, granted,
+            verb=_(u"Granted you moderator access to"),
+            action_target=self.location)
         messages.add_message(request, messages.SUCCESS, _(u"Success"))
         return redirect(self.get_success_url())
 
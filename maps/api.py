@@ -4,6 +4,7 @@ import urllib2
 from rest_framework import permissions, views
 from rest_framework.response import Response
 
+from .grid import MAX_ZOOM
 from .models import MapPointer
 from .storage import filter_markers, get_clusters
 from .serializers import MapClusterSerializer, \
@@ -11,7 +12,7 @@ from .serializers import MapClusterSerializer, \
                          MapSimpleSeraializer
 
 
-ZOOM = 9 # Zoom to switch markers/clusters
+ZOOM = MAX_ZOOM # Zoom to switch markers/clusters
 
 
 class MapObjectViewSet(views.APIView):
@@ -26,20 +27,23 @@ class MapObjectViewSet(views.APIView):
         ne = request.QUERY_PARAMS.get('ne', '0.0x0.0')
         sw = request.QUERY_PARAMS.get('sw', '0.0x0.0')
         zoom = int(request.QUERY_PARAMS.get('zoom', ZOOM))
+        filters = urllib2.unquote(request.QUERY_PARAMS.get('filters', ''))
+        if filters:
+            filters = [int(x.strip()) for x in filters.split(',') if x.strip()]
+        else:
+            filters = None
 
         # Create cluster when zoom level is not high enough
         if zoom < ZOOM:
-            clusters = get_clusters(sw, ne)
+            clusters = get_clusters(sw, ne, zoom, filters)
             serializer = MapClusterSerializer(clusters, many=True)
             return Response(serializer.data)
 
         # Show single marker objects and allow for js clustering
         markers = filter_markers(sw, ne)
-        filters = urllib2.unquote(request.QUERY_PARAMS.get('filters'))
 
         # Narrow results to selected content types only
         if filters:
-            filters = [int(x.strip()) for x in filters.split(',')]
             markers = markers.filter(content_type__pk__in=filters)
 
         serializer = MapSimpleSeraializer(markers, many=True,
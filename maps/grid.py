@@ -0,0 +1,134 @@
+# -*- coding: utf-8 -*-
+"""
+Helpers that map geographic coordinates onto grid cells used by map clusters.
+Grid follows standard web mercator tile scheme, so cells on each level are
+aligned with map tiles shown in browser.
+"""
+import math
+
+# Map zoom level where we stop showing clusters and display single markers.
+MAX_ZOOM = 9
+
+# Each cluster cell is 1/2^CELL_PRECISION of map tile width.
+CELL_PRECISION = 1
+
+MAX_LATITUDE = 85.0511287798
+
+
+def grid_level(zoom):
+    """ Get grid level used to create clusters for given map zoom. """
+    return min(max(int(zoom), 0), MAX_ZOOM - 1) + CELL_PRECISION
+
+
+def grid_levels():
+    """ All grid levels that we have to maintain for clusters. """
+    return range(CELL_PRECISION, MAX_ZOOM + CELL_PRECISION)
+
+
+def lat_lng_to_cell(lat, lng, level):
+    """ Get (x, y) coordinates of grid cell for given point and grid level. """
+    size = 2 ** level
+    lat = min(max(float(lat), -MAX_LATITUDE), MAX_LATITUDE)
+    lng = float(lng)
+    x = int((lng + 180.0) / 360.0 * size)
+    rad = math.radians(lat)
+    y = int((1.0 - math.log(math.tan(rad) + 1.0 / math.cos(rad)) / math.pi) / 2.0 * size)
+    return min(max(x, 0), size - 1), min(max(y, 0), size - 1)
+
+
+def point_cells(lat, lng):
+    """ Generator of (level, x, y) tuples for every level in pyramid. """
+    for level in grid_levels():
+        x, y = lat_lng_to_cell(lat, lng, level)
+        yield level, x, y
+
+
+def cell_range(south_west, north_east, level):
+    """
+    Get cell ranges for viewport given as (lat, lng) tuples. Returns tuple
+    ((min_x, max_x), (min_y, max_y)). When viewport crosses 180th meridian,
+    min_x is greater than max_x.
+    """
+    min_x, max_y = lat_lng_to_cell(south_west[0], south_west[1], level)
+    max_x, min_y = lat_lng_to_cell(north_east[0], north_east[1], level)
+    return (min_x, max_x), (min_y, max_y)
+
+
+# Spatial index
+# ------------------------------------------------------------------------------
+# Models with latitude and longitude store Z-order (Morton) code of cell on
+# KEY_LEVEL. Every grid cell on lower level covers continuous range of keys, so
+# bounding box can be found with few B-tree range scans on single column.
+
+KEY_LEVEL = 16
+
+EARTH_RADIUS = 6371.0 # km
+
+KM_PER_DEGREE = math.pi * EARTH_RADIUS / 180.0
+
+
+def interleave(x, y):
+    """ Mix bits of x and y coordinates into single Z-order key. """
+    key = 0
+    for i in range(KEY_LEVEL):
+        key |= ((x >> i) & 1) << (2 * i)
+        key |= ((y >> i) & 1) << (2 * i + 1)
+    return key
+
+
+def geo_key(lat, lng):
+    """ Get spatial index key for given point. """
+    if lat is None or lng is None:
+        return None
+    x, y = lat_lng_to_cell(lat, lng, KEY_LEVEL)
+    return interleave(x, y)
+
+
+def key_ranges(south_west, north_east, max_cells=16):
+    """
+    Get sorted list of (min, max) key ranges that cover viewport given as
+    (lat, lng) tuples. We use the most precise grid level where viewport fits
+    in `max_cells` cells.
+    """
+    for level in range(KEY_LEVEL, -1, -1):
+        size = 2 ** level
+        (min_x, max_x), (min_y, max_y) = cell_range(south_west, north_east, level)
+        width = (max_x - min_x) % size + 1
+        if width * (max_y - min_y + 1) <= max_cells:
+            break
+    shift = 2 * (KEY_LEVEL - level)
+    keys = []
+    for i in range(width):
+        x = (min_x + i) % size
+        for y in range(min_y, max_y + 1):
+            keys.append(interleave(x, y))
+    ranges = []
+    for key in sorted(keys):
+        start, end = key << shift, ((key + 1) << shift) - 1
+        if ranges and ranges[-1][1] + 1 == start:
+            ranges[-1] = (ranges[-1][0], end)
+        else:
+            ranges.append((start, end))
+    return ranges
+
+
+def distance(lat1, lng1, lat2, lng2):
+    """ Great-circle distance between two points in kilometers. """
+    lat1, lng1, lat2, lng2 = [math.radians(float(x)) for x in (lat1, lng1, lat2, lng2)]
+    a = math.sin((lat2 - lat1) / 2) ** 2 + \
+        math.cos(lat1) * math.cos(lat2) * math.sin((lng2 - lng1) / 2) ** 2
+    return 2 * EARTH_RADIUS * math.asin(min(1.0, math.sqrt(a)))
+
+
+def radius_bbox(lat, lng, radius):
+    """ Get (south_west, north_east) box that contains circle of given radius. """
+    lat, lng = float(lat), float(lng)
+    d_lat = radius / KM_PER_DEGREE
+    min_lat, max_lat = max(lat - d_lat, -90.0), min(lat + d_lat, 90.0)
+    if min_lat <= -90.0 or max_lat >= 90.0:
+        return (min_lat, -180.0), (max_lat, 180.0)
+    d_lng = d_lat / max(math.cos(math.radians(lat)), 0.01)
+    if d_lng >= 180.0:
+        return (min_lat, -180.0), (max_lat, 180.0)
+    wrap = lambda x: (x + 180.0) % 360.0 - 180.0
+    return (min_lat, wrap(lng - d_lng)), (max_lat, wrap(lng + d_lng))
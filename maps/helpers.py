@@ -5,7 +5,7 @@ from django.contrib.contenttypes.models import ContentType
 
 from locations.models import Country, Location
 
-from .models import MapPointer
+from .models import MapGridCell, MapPointer
 
 import logging
 logger = logging.getLogger('maps')
@@ -30,13 +30,11 @@ def filter_markers(lat, lng, factor=1.0, filters=None, location_pk=None):
     #         get_object_or_404(Location, pk=location_pk))
     # else:
     #     qs = MapPointer.objects.all()
-    qs = MapPointer.objects.all()
+    lat, lng, factor = float(lat), float(lng), float(factor)
+    qs = MapPointer.objects.in_bbox((lat - factor, lng - factor),
+                                    (lat + factor, lng + factor))
 
     return qs.filter(
-        latitude__gt=float(lat) - float(factor),
-        latitude__lt=float(lat) + float(factor),
-        longitude__gt=float(lng) - float(factor),
-        longitude__lt=float(lng) + float(factor),
         content_type__in=[int(x) for x in filters.split(',') if x]
     )
 
@@ -44,7 +42,7 @@ def filter_markers(lat, lng, factor=1.0, filters=None, location_pk=None):
 def make_region_cluster(city):
     """ This function takes region main location as argument and creates cache. """
     count = MapPointer.objects.filter(
-        location__in=city.parent.get_children_id_list()).count()
+        location__in=city.parent.descendants()).count()
     redis_cache.set(str(city.pk) + '_childlist', count, timeout=None)
     logger.info("Created cluster for region {} with {} items".format(city.pk, count))
     return count
@@ -101,7 +99,7 @@ def create_country_clusters():
                 'lat': l.latitude,
                 'lng': l.longitude,
                 'counter': MapPointer.objects.filter(
-                    location__in=c.location.get_children_id_list()).count(),
+                    location__in=c.location.descendants()).count(),
             }
             clusters.append(cluster)
         except Location.DoesNotExist:
@@ -110,18 +108,24 @@ def create_country_clusters():
     return clusters
 
 
-def create_clusters(lat, lng, zoom):
+def create_clusters(lat, lng, zoom, filters=None):
     """
     Crate clusters for map when zoom is less then 10. As above, this function
     takes latitude, longitude and map zoom level as argments and returns array
     of marker positions along with number of items in requested region.
+    Clusters are read from pre-aggregated grid counters.
     """
     zoom = int(zoom)
-    if zoom >= 6:
-        return create_region_clusters(lat, lng, zoom)
+    if zoom == 6:
+        factor = 40.0
+    elif zoom > 6:
+        factor = 20.0 if zoom < 9 else 10.0
     else:
-        results = redis_cache.get("allcountries")
-        if not results:
-            results = create_country_clusters()
-            redis_cache.set("allcountries", results, timeout=None)
-        return results
+        factor = 180.0
+    if filters is not None:
+        filters = [int(x) for x in filters.split(',') if x]
+    south_west = (float(lat) - factor, float(lng) - factor)
+    north_east = (float(lat) + factor, float(lng) + factor)
+    if factor >= 180.0:
+        south_west, north_east = (-90.0, -180.0), (90.0, 179.999)
+    return MapGridCell.objects.clusters(south_west, north_east, zoom, filters)
@@ -0,0 +1,83 @@
+# -*- coding: utf-8 -*-
+import random, time
+
+from optparse import make_option
+
+from django.contrib.contenttypes.models import ContentType
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from locations.models import Location
+from maps.grid import geo_key
+from maps.models import MapPointer
+
+
+class Rollback(Exception):
+    pass
+
+
+class Command(BaseCommand):
+    """
+    Compare spatial index queries with plain latitude/longitude range scans.
+    Random map pointers are created inside transaction that is rolled back
+    when benchmark is finished, so database stays untouched.
+
+    OPTIONS
+        --count     Number of generated map pointers (default 1000000)
+        --queries   Number of queries for each test (default 100)
+        --size      Viewport size in degrees (default 2.0)
+    """
+    option_list = BaseCommand.option_list + (
+        make_option('--count', dest='count', type='int', default=1000000,
+            help=u"Number of generated map pointers"),
+        make_option('--queries', dest='queries', type='int', default=100,
+            help=u"Number of queries for each test"),
+        make_option('--size', dest='size', type='float', default=2.0,
+            help=u"Viewport size in degrees"),
+    )
+
+    def create_pointers(self, count):
+        ct = ContentType.objects.get_for_model(Location)
+        batch = []
+        for i in xrange(count):
+            lat = random.uniform(-60.0, 70.0)
+            lng = random.uniform(-180.0, 180.0)
+            batch.append(MapPointer(content_type=ct, object_pk=str(i),
+                                    latitude=lat, longitude=lng,
+                                    geo_key=geo_key(lat, lng)))
+            if len(batch) >= 10000:
+                MapPointer.objects.bulk_create(batch)
+                batch = []
+        MapPointer.objects.bulk_create(batch)
+
+    def measure(self, label, points, query):
+        start = time.time()
+        found = 0
+        for lat, lng in points:
+            found += len(query(lat, lng))
+        elapsed = time.time() - start
+        self.stdout.write(u"{:<24} {:>8.2f} ms/query {:>10} objects".format(
+            label, elapsed * 1000.0 / len(points), found))
+
+    def handle(self, *args, **options):
+        size = options['size'] / 2.0
+        points = [(random.uniform(-55.0, 65.0), random.uniform(-175.0, 175.0))
+                  for x in range(options['queries'])]
+        range_scan = lambda lat, lng: list(MapPointer.objects.filter(
+            latitude__gte=lat - size, latitude__lte=lat + size,
+            longitude__gte=lng - size, longitude__lte=lng + size))
+        bbox = lambda lat, lng: list(MapPointer.objects.in_bbox(
+            (lat - size, lng - size), (lat + size, lng + size)))
+        nearest = lambda lat, lng: MapPointer.objects.nearest(lat, lng, 10)
+        try:
+            with transaction.atomic():
+                start = time.time()
+                self.create_pointers(options['count'])
+                self.stdout.write(u"Created {} pointers in {:.2f} s".format(
+                    options['count'], time.time() - start))
+                self.measure(u"Range scan", points, range_scan)
+                self.measure(u"Spatial index bbox", points, bbox)
+                self.measure(u"10 nearest neighbours", points, nearest)
+                raise Rollback
+        except Rollback:
+            pass
@@ -0,0 +1,13 @@
+# -*- coding: utf-8 -*-
+from django.core.management.base import BaseCommand
+
+from maps.tasks import rebuild_marker_grid
+
+
+class Command(BaseCommand):
+    """
+    Recreate pre-aggregated marker counters used to show map clusters.
+    """
+    def handle(self, *args, **options):
+        count = rebuild_marker_grid()
+        self.stdout.write(u"Created {} grid cells".format(count))
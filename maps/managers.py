@@ -1,10 +1,65 @@
 # -*- coding: utf-8 -*-
-from django.db import models
+from django.db import IntegrityError, models, transaction
+from django.db.models import F, Q, Sum
 from django.contrib.contenttypes.models import ContentType
 from django.utils.encoding import force_text
 
+from .grid import cell_range, distance, grid_level, key_ranges, point_cells, \
+                  radius_bbox, KM_PER_DEGREE
 
-class MapPointerManager(models.Manager):
+
+class SpatialQuerySet(models.QuerySet):
+    """
+    QuerySet for models with `latitude`, `longitude` and indexed `geo_key`
+    fields. Bounding box queries use key ranges instead of scanning float
+    columns; radius and nearest neighbour queries return lists of objects
+    sorted by distance, with `distance` attribute set (in kilometers).
+    """
+    def in_bbox(self, south_west, north_east):
+        """ Objects inside viewport given as (lat, lng) tuples. """
+        keys = Q()
+        for start, end in key_ranges(south_west, north_east):
+            keys |= Q(geo_key__range=(start, end))
+        qs = self.filter(keys).filter(latitude__gte=south_west[0],
+                                      latitude__lte=north_east[0])
+        if south_west[1] <= north_east[1]:
+            return qs.filter(longitude__gte=south_west[1],
+                             longitude__lte=north_east[1])
+        return qs.filter(Q(longitude__gte=south_west[1]) |
+                         Q(longitude__lte=north_east[1]))
+
+    def _with_distance(self, lat, lng, radius):
+        south_west, north_east = radius_bbox(lat, lng, radius)
+        items = []
+        for obj in self.in_bbox(south_west, north_east):
+            obj.distance = distance(lat, lng, obj.latitude, obj.longitude)
+            if obj.distance <= radius:
+                items.append(obj)
+        return sorted(items, key=lambda x: x.distance)
+
+    def within_radius(self, lat, lng, radius):
+        """ Objects no further than `radius` kilometers from given point. """
+        return self._with_distance(float(lat), float(lng), float(radius))
+
+    def nearest(self, lat, lng, limit=1, radius=None):
+        """
+        Find `limit` objects closest to given point, optionally no further
+        than `radius` kilometers. Search area grows until we find enough.
+        """
+        lat, lng = float(lat), float(lng)
+        max_radius = radius or 180.0 * KM_PER_DEGREE
+        current = min(10.0, max_radius)
+        while True:
+            items = self._with_distance(lat, lng, current)
+            if len(items) >= limit or current >= max_radius:
+                return items[:limit]
+            current = min(current * 4, max_radius)
+
+
+SpatialManager = models.Manager.from_queryset(SpatialQuerySet)
+
+
+class MapPointerManager(SpatialManager):
     """ A manager for map markers - filtered through the location or object.
     """
     def for_model(self, model):
@@ -32,3 +87,118 @@ class MapPointerManager(models.Manager):
             pointer.location = obj.location
         pointer.save()
         return pointer
+
+
+class MapGridCellManager(models.Manager):
+    """
+    Manager for pre-aggregated marker counters. Counters are updated every
+    time map pointer is saved or deleted, so clusters for any viewport can be
+    fetched with single query.
+    """
+    def _update_cells(self, lat, lng, content_type_id, sign):
+        for level, x, y in point_cells(lat, lng):
+            lookup = {'level': level, 'x': x, 'y': y,
+                      'content_type_id': content_type_id, }
+            changes = {'counter': F('counter') + sign,
+                       'lat_sum': F('lat_sum') + sign * lat,
+                       'lng_sum': F('lng_sum') + sign * lng, }
+            if self.filter(**lookup).update(**changes) or sign < 0:
+                continue
+            try:
+                with transaction.atomic():
+                    self.create(counter=1, lat_sum=lat, lng_sum=lng, **lookup)
+            except IntegrityError:
+                # Somebody else has just created the same cell.
+                self.filter(**lookup).update(**changes)
+
+    def add_pointer(self, lat, lng, content_type_id):
+        """ Increment counters for all cells containing given point. """
+        with transaction.atomic():
+            self._update_cells(float(lat), float(lng), content_type_id, 1)
+
+    def remove_pointer(self, lat, lng, content_type_id):
+        """ Decrement counters for all cells containing given point. """
+        with transaction.atomic():
+            self._update_cells(float(lat), float(lng), content_type_id, -1)
+
+    def clusters(self, south_west, north_east, zoom, content_types=None):
+        """
+        Get list of clusters for viewport given as (lat, lng) tuples and map
+        zoom level. Optionally narrow results to selected content type id's.
+        """
+        level = grid_level(zoom)
+        (min_x, max_x), (min_y, max_y) = cell_range(south_west, north_east, level)
+        qs = self.filter(level=level, y__gte=min_y, y__lte=max_y)
+        if min_x <= max_x:
+            qs = qs.filter(x__gte=min_x, x__lte=max_x)
+        else:
+            qs = qs.filter(Q(x__gte=min_x) | Q(x__lte=max_x))
+        if content_types is not None:
+            qs = qs.filter(content_type_id__in=content_types)
+        qs = qs.values('x', 'y').annotate(total=Sum('counter'),
+                                          lat_total=Sum('lat_sum'),
+                                          lng_total=Sum('lng_sum'))
+        clusters = []
+        for cell in qs:
+            if cell['total'] <= 0:
+                continue
+            clusters.append({
+                'id': cell['y'] * 2 ** level + cell['x'],
+                'lat': cell['lat_total'] / cell['total'],
+                'lng': cell['lng_total'] / cell['total'],
+                'count': cell['total'],
+            })
+        return clusters
+
+    def _aggregate(self, pointers):
+        """ Sum (latitude, longitude, content_type_id) tuples per grid cell. """
+        cells = {}
+        for lat, lng, ct in pointers:
+            for level, x, y in point_cells(lat, lng):
+                cell = cells.setdefault((level, x, y, ct), [0, 0.0, 0.0])
+                cell[0] += 1
+                cell[1] += lat
+                cell[2] += lng
+        return cells
+
+    def add_pointers(self, pointers, batch_size=1000):
+        """
+        Add many pointers at once, given as (latitude, longitude,
+        content_type_id) tuples. Costs one UPDATE per affected cell instead
+        of one per pointer and zoom level, so it's meant for bulk imports.
+        """
+        cells = self._aggregate(pointers)
+        missing = []
+        with transaction.atomic():
+            for (level, x, y, ct), (counter, lat_sum, lng_sum) \
+                    in cells.iteritems():
+                updated = self.filter(level=level, x=x, y=y,
+                                      content_type_id=ct)\
+                              .update(counter=F('counter') + counter,
+                                      lat_sum=F('lat_sum') + lat_sum,
+                                      lng_sum=F('lng_sum') + lng_sum)
+                if not updated:
+                    missing.append(self.model(level=level, x=x, y=y,
+                                              content_type_id=ct,
+                                              counter=counter,
+                                              lat_sum=lat_sum,
+                                              lng_sum=lng_sum))
+            self.bulk_create(missing, batch_size=batch_size)
+        return len(cells)
+
+    def rebuild(self, pointers, batch_size=1000):
+        """
+        Recreate all counters from scratch. `pointers` is an iterable of
+        (latitude, longitude, content_type_id) tuples.
+        """
+        cells = self._aggregate(pointers)
+        with transaction.atomic():
+            self.all().delete()
+            self.bulk_create([self.model(level=level, x=x, y=y,
+                                         content_type_id=ct,
+                                         counter=counter,
+                                         lat_sum=lat_sum,
+                                         lng_sum=lng_sum)
+                for (level, x, y, ct), (counter, lat_sum, lng_sum) \
+                in cells.iteritems()], batch_size=batch_size)
+        return len(cells)
@@ -0,0 +1,30 @@
+# -*- coding: utf-8 -*-
+from __future__ import unicode_literals
+
+from django.db import models, migrations
+
+from maps.grid import geo_key
+
+
+def fill_geo_keys(apps, schema_editor):
+    MapPointer = apps.get_model('maps', 'MapPointer')
+    for pk, lat, lng in MapPointer.objects\
+            .values_list('pk', 'latitude', 'longitude').iterator():
+        MapPointer.objects.filter(pk=pk).update(geo_key=geo_key(lat, lng))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('maps', '0002_mapgridcell'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='mappointer',
+            name='geo_key',
+            field=models.BigIntegerField(db_index=True, null=True, blank=True),
+            preserve_default=True,
+        ),
+        migrations.RunPython(fill_geo_keys),
+    ]
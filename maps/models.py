@@ -5,10 +5,12 @@ from django.contrib.gis.db import models
 from django.contrib.contenttypes import generic
 from django.contrib.contenttypes.models import ContentType
 from django.db.models import get_model
+from django.db.models.signals import post_delete, post_save, pre_save
 from django.utils.translation import ugettext_lazy as _
 from django.utils.encoding import python_2_unicode_compatible
 
-from .managers import MapPointerManager
+from .grid import geo_key
+from .managers import MapGridCellManager, MapPointerManager
 
 
 class BaseAbstractMapPointer(models.Model):
@@ -32,6 +34,8 @@ class MapPointer(BaseAbstractMapPointer):
     latitude = models.FloatField()
     longitude = models.FloatField()
     location = models.ForeignKey('locations.Location', null=True, blank=True)
+    # Spatial index key, see grid.py
+    geo_key = models.BigIntegerField(null=True, blank=True, db_index=True)
 
     objects = MapPointerManager()
 
@@ -41,3 +45,64 @@ class MapPointer(BaseAbstractMapPointer):
     class Meta:
         unique_together = ('latitude', 'longitude',
                            'object_pk', 'content_type', )
+
+
+@python_2_unicode_compatible
+class MapGridCell(models.Model):
+    """
+    Pre-aggregated number of markers of single content type inside one grid
+    cell. Cells build pyramid of levels aligned with map tiles, see grid.py.
+    Sum of coordinates let us place cluster in the middle of its markers.
+    """
+    level = models.PositiveSmallIntegerField()
+    x = models.IntegerField()
+    y = models.IntegerField()
+    content_type = models.ForeignKey(ContentType)
+    counter = models.IntegerField(default=0)
+    lat_sum = models.FloatField(default=0.0)
+    lng_sum = models.FloatField(default=0.0)
+
+    objects = MapGridCellManager()
+
+    class Meta:
+        unique_together = ('level', 'x', 'y', 'content_type',)
+        index_together = [['level', 'y', 'x'], ]
+
+    def __str__(self):
+        return "{}/{}/{}: {}".format(self.level, self.x, self.y, self.counter)
+
+
+def set_geo_key(sender, instance, **kwargs):
+    """ Update spatial index key for models with latitude and longitude. """
+    instance.geo_key = geo_key(instance.latitude, instance.longitude)
+
+
+def remember_pointer_position(sender, instance, raw, **kwargs):
+    """ Store previous position of edited pointer to update grid counters. """
+    instance._grid_origin = None
+    if instance.pk is None or raw:
+        return
+    instance._grid_origin = sender.objects.filter(pk=instance.pk)\
+        .values_list('latitude', 'longitude', 'content_type_id').first()
+
+
+def update_grid_on_save(sender, instance, raw, **kwargs):
+    """ Move pointer to proper grid cells. """
+    origin = getattr(instance, '_grid_origin', None)
+    current = (instance.latitude, instance.longitude, instance.content_type_id)
+    if origin == current:
+        return
+    if origin is not None:
+        MapGridCell.objects.remove_pointer(*origin)
+    MapGridCell.objects.add_pointer(*current)
+
+
+def update_grid_on_delete(sender, instance, **kwargs):
+    """ Remove deleted pointer from grid counters. """
+    MapGridCell.objects.remove_pointer(instance.latitude, instance.longitude,
+                                       instance.content_type_id)
+
+pre_save.connect(set_geo_key, sender=MapPointer)
+pre_save.connect(remember_pointer_position, sender=MapPointer)
+post_save.connect(update_grid_on_save, sender=MapPointer)
+post_delete.connect(update_grid_on_delete, sender=MapPointer)
@@ -6,7 +6,7 @@ from django.core.cache import get_cache
 from locations.models import Location
 from places_core.helpers import round_to_ten
 
-from models import MapPointer
+from models import MapGridCell, MapPointer
 
 cache = get_cache('default')
 
@@ -39,11 +39,8 @@ def filter_markers(south_west, north_east):
     min_lat, min_lng = boundaries['ne']
     max_lat, max_lng = boundaries['sw']
     diff = max([max_lat - min_lat, max_lng - min_lng, ]) / 4
-    qs = MapPointer.objects.filter(latitude__gte=min_lat - diff,
-                                   latitude__lte=max_lat + diff,
-                                   longitude__gte=min_lng - diff,
-                                   longitude__lte=max_lng + diff)
-    return qs
+    return MapPointer.objects.in_bbox((min_lat - diff, min_lng - diff),
+                                      (max_lat + diff, max_lng + diff))
 
 
 def find_region_cities(south_west, north_east):
@@ -54,23 +51,20 @@ def find_region_cities(south_west, north_east):
     min_lat, min_lng = boundaries['ne']
     max_lat, max_lng = boundaries['sw']
     diff = max([max_lat - min_lat, max_lng - min_lng, ]) / 4
-    return Location.objects.filter(
-        kind__in=kinds,
-        latitude__gte=min_lat - diff,
-        latitude__lte=max_lat + diff,
-        longitude__gte=min_lng - diff,
-        longitude__lte=max_lng + diff)
+    return Location.objects.filter(kind__in=kinds)\
+        .in_bbox((min_lat - diff, min_lng - diff),
+                 (max_lat + diff, max_lng + diff))
 
 
 def create_cluster(main_city):
     """ Creates cluster for given main city (either capital or region capital).
     """
-    id_list = main_city.parent.get_children_id_list()
     return {
         'id': main_city.pk,
         'lat': main_city.latitude,
         'lng': main_city.longitude,
-        'count': len(MapPointer.objects.filter(location__pk__in=id_list)),
+        'count': MapPointer.objects.filter(
+            location__in=main_city.parent.descendants()).count(),
     }
 
 
@@ -93,15 +87,9 @@ def create_region_clusters():
     return clusters
 
 
-def get_clusters(south_west, north_east):
-    """ Try to serve cached content first, and fallback to creating new clusters.
-        This is not recommended - it is VERY heavy database operation.
+def get_clusters(south_west, north_east, zoom, content_types=None):
+    """ Get clusters for selected viewport from pre-aggregated grid counters.
     """
-    main_cities = find_region_cities(south_west, north_east)
-    clusters = []
-    for city in main_cities:
-        cluster = cache.get('clusters_{}'.format(city.pk))
-        if cluster is None:
-            cluster = update_region_cluster(city)
-        clusters.append(cluster)
-    return clusters
+    boundaries = get_boundaries(south_west, north_east)
+    return MapGridCell.objects.clusters(boundaries['ne'], boundaries['sw'],
+                                        zoom, content_types)
@@ -5,18 +5,18 @@ import datetime
 
 from celery.task.base import periodic_task
 
-from locations.models import Location
-
-from .helpers import create_country_clusters, make_region_cluster
-from .models import MapPointer
-
-
-@periodic_task(run_every=datetime.timedelta(minutes=20))
-def update_marker_cluster_cache():
-    """ Updates all cached map clusters related to locations. """
-    create_country_clusters()
-    for location in Location.objects.filter(kind__in=['PPLA', 'PPLC',]):
-        make_region_cluster(location)
+from .models import MapGridCell, MapPointer
+
+
+@periodic_task(run_every=datetime.timedelta(days=1))
+def rebuild_marker_grid():
+    """
+    Grid counters are updated along with every map pointer, so we only have
+    to fix possible differences (e.g. after raw SQL updates) once in a while.
+    """
+    pointers = MapPointer.objects\
+        .values_list('latitude', 'longitude', 'content_type_id').iterator()
+    return MapGridCell.objects.rebuild(pointers)
 
 
 @periodic_task(run_every=datetime.timedelta(minutes=10))
@@ -6,8 +6,9 @@ from django.contrib.contenttypes.models import ContentType
 
 from locations.models import Location
 
-from .models import MapPointer
+from .models import MapGridCell, MapPointer
 from .helpers import make_region_cluster
+from .grid import lat_lng_to_cell
 
 # Watch out! The tests here use default cache settings,
 # so better not run them on production until it's fixed.
@@ -56,6 +57,97 @@ class MarkerCacheTestCase(TestCase):
             self.cache.delete(str(location.pk) + '_childlist')
 
 
+class MapGridTestCase(TestCase):
+    """ Test pre-aggregated grid counters used to create map clusters. """
+    fixtures = ['fixtures/users.json',]
+
+    def setUp(self):
+        self.user = User.objects.first()
+        self.ct = ContentType.objects.get_for_model(Location)
+        self.south_west = (50.0, 15.0)
+        self.north_east = (55.0, 25.0)
+
+    def _create_location(self, lat=52.23, lng=21.01):
+        return Location.objects.create(name="Testowice", creator=self.user,
+                                       latitude=lat, longitude=lng)
+
+    def _count(self, zoom=5, content_types=None):
+        clusters = MapGridCell.objects.clusters(self.south_west,
+                                                self.north_east,
+                                                zoom, content_types)
+        return sum(x['count'] for x in clusters)
+
+    def test_cell_coordinates(self):
+        """ Cells are aligned with web mercator tiles. """
+        self.assertEqual(lat_lng_to_cell(0.0, 0.0, 1), (1, 1))
+        self.assertEqual(lat_lng_to_cell(52.23, 21.01, 10), (571, 337))
+
+    def test_counters_follow_pointers(self):
+        """ Creating and deleting pointers updates clusters. """
+        location = self._create_location()
+        self._create_location(52.40, 16.92)
+        self.assertEqual(self._count(), 2)
+        self.assertEqual(self._count(content_types=[self.ct.pk]), 2)
+        self.assertEqual(self._count(content_types=[self.ct.pk + 1]), 0)
+        location.delete()
+        self.assertEqual(self._count(), 1)
+
+    def test_moved_pointer_changes_cells(self):
+        """ Changing pointer position moves it to other cells. """
+        location = self._create_location()
+        pointer = MapPointer.objects.for_location(location).first()
+        pointer.latitude = -33.86
+        pointer.longitude = 151.20
+        pointer.save()
+        self.assertEqual(self._count(), 0)
+
+    def test_rebuild_gives_the_same_results(self):
+        """ Rebuilding grid from scratch does not change clusters. """
+        self._create_location()
+        self._create_location(52.40, 16.92)
+        get_clusters = lambda: sorted((x['id'], x['count']) for x in \
+            MapGridCell.objects.clusters(self.south_west, self.north_east, 7))
+        clusters = get_clusters()
+        MapGridCell.objects.rebuild(MapPointer.objects\
+            .values_list('latitude', 'longitude', 'content_type_id'))
+        self.assertEqual(clusters, get_clusters())
+
+
+class SpatialIndexTestCase(TestCase):
+    """ Test bounding box, radius and nearest neighbour queries. """
+    fixtures = ['fixtures/users.json',
+                'fixtures/locations.json',]
+
+    def test_bbox_gives_the_same_results_as_range_scan(self):
+        """ Spatial index should find exactly the same locations. """
+        for sw, ne in (((49.0, 14.0), (55.0, 24.0)),
+                       ((52.0, 20.5), (52.5, 21.5)),
+                       ((-10.0, -10.0), (10.0, 10.0))):
+            expected = Location.objects.filter(latitude__gte=sw[0],
+                                               latitude__lte=ne[0],
+                                               longitude__gte=sw[1],
+                                               longitude__lte=ne[1])
+            self.assertEqual(set(Location.objects.in_bbox(sw, ne)),
+                             set(expected))
+
+    def test_nearest_locations(self):
+        """ Nearest objects are sorted by distance. """
+        warsaw = Location.objects.get(slug='warsaw-pl')
+        found = Location.objects.nearest(warsaw.latitude, warsaw.longitude, 5)
+        self.assertEqual(len(found), 5)
+        self.assertEqual(found[0], warsaw)
+        self.assertEqual(found, sorted(found, key=lambda x: x.distance))
+
+    def test_within_radius(self):
+        """ Only objects closer than given radius are returned. """
+        warsaw = Location.objects.get(slug='warsaw-pl')
+        found = Location.objects.within_radius(warsaw.latitude,
+                                               warsaw.longitude, 30)
+        self.assertIn(warsaw, found)
+        self.assertTrue(all(x.distance <= 30 for x in found))
+        self.assertNotIn(Location.objects.get(slug='krakow-pl'), found)
+
+
 class MapPointerViewTestCase(TestCase):
     """ Test responses for requests to map view when specific location is selected.
     see: https://app.getsentry.com/civilhuborg/civilhub/group/60399009/ """
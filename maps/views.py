@@ -96,7 +96,7 @@ class MapDataViewSet(APIView):
                 serializer = MapPointerSerializer(markers, many=True)
                 context = serializer.data
             else:
-                clusters = create_clusters(lat, lng, zoom)
+                clusters = create_clusters(lat, lng, zoom, filters)
                 serializer = MapClusterSerializer(clusters, many=True)
                 context = serializer.data
         else:
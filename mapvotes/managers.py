@@ -2,8 +2,11 @@
 from __future__ import unicode_literals
 
 from django.db import models
+from django.db.models import Count
 from django.contrib.contenttypes.models import ContentType
 
+from places_core.tallies import reconcile
+
 
 class VotingManager(models.Manager):
     """ Custom manager for ``Voting``, which provides shortcut method for
@@ -26,3 +29,22 @@ class VotingManager(models.Manager):
         obj.save()
         return obj
 
+
+def recount_marker_votes(marker_model, vote_model):
+    """
+    Recalculate vote counters for all markers with single grouped query.
+    Model classes are passed as arguments, so we can use it in migrations.
+    Returns number of fixed markers.
+    """
+    votes = vote_model.objects.values_list('marker')
+    counts = dict((marker_id, {'votes_count': total}) for marker_id, total
+                  in votes.annotate(total=Count('pk')))
+    return reconcile(marker_model, counts, ('votes_count', ))
+
+
+class VoteManager(models.Manager):
+    """ Manager for marker votes. """
+    def recount(self):
+        """ Fix vote counters stored in markers. """
+        marker_model = self.model._meta.get_field('marker').rel.to
+        return recount_marker_votes(marker_model, self.model)
@@ -0,0 +1,28 @@
+# -*- coding: utf-8 -*-
+from __future__ import unicode_literals
+
+from django.db import models, migrations
+
+from mapvotes.managers import recount_marker_votes
+
+
+def count_votes(apps, schema_editor):
+    recount_marker_votes(apps.get_model('mapvotes', 'Marker'),
+                         apps.get_model('mapvotes', 'Vote'))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('mapvotes', '0006_auto_20150930_1145'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='marker',
+            name='votes_count',
+            field=models.PositiveIntegerField(default=0, verbose_name='votes'),
+            preserve_default=True,
+        ),
+        migrations.RunPython(count_votes),
+    ]
@@ -1,7 +1,9 @@
 # -*- coding: utf-8 -*-
 from __future__ import unicode_literals
 
-from django.db import models
+from django.db import models, transaction
+from django.db.models import F
+from django.db.models.signals import post_delete, post_save
 from django.contrib.contenttypes.fields import GenericForeignKey
 from django.contrib.contenttypes.models import ContentType
 from django.core.urlresolvers import reverse
@@ -9,7 +11,9 @@ from django.utils import timezone
 from django.utils.encoding import python_2_unicode_compatible
 from django.utils.translation import ugettext_lazy as _
 
-from .managers import VotingManager
+from places_core.tallies import tally_safe_kwargs
+
+from .managers import VoteManager, VotingManager
 
 
 @python_2_unicode_compatible
@@ -77,6 +81,8 @@ class Marker(models.Model):
     label = models.CharField(_("label"), max_length=64, default="")
     description = models.TextField(_("description"), max_length=2000,
                                    blank=True, default="")
+    # Maintained by Vote signals
+    votes_count = models.PositiveIntegerField(_("votes"), default=0)
 
     class Meta:
         verbose_name = _("marker")
@@ -85,6 +91,12 @@ class Marker(models.Model):
     def __str__(self):
         return self.label
 
+    def save(self, *args, **kwargs):
+        # Number of votes is changed only by vote signals
+        if not args:
+            kwargs = tally_safe_kwargs(self, ('votes_count', ), kwargs)
+        super(Marker, self).save(*args, **kwargs)
+
     def get_absolute_url(self):
         return self.voting.get_absolute_url()
 
@@ -92,18 +104,20 @@ class Marker(models.Model):
         """ Wrapper for votes models. Use this instead of creating ``Vote``
         instances from scratch, as this takes ``Voting`` settings into
         account. """
-        try:
-            vote = self.votes.get(user=user)
-            vote.delete()
-            return {'success': True, 'status': False}
-        except Vote.DoesNotExist:
-            vote = None
-        if self.voting.is_limited:
-            markers = self.voting.markers.exclude(pk=self.pk)
-            chk = sum([x.votes.filter(user=user).count() for x in markers])
-            if chk:
-                return {'success': False, 'error': _("Too many votes")}
-        vote = Vote.objects.create(marker=self, user=user)
+        with transaction.atomic():
+            try:
+                vote = self.votes.get(user=user)
+                vote.delete()
+                return {'success': True, 'status': False}
+            except Vote.DoesNotExist:
+                vote = None
+            if self.voting.is_limited:
+                chk = Vote.objects.filter(marker__voting_id=self.voting_id,
+                                          user=user)\
+                                  .exclude(marker=self).exists()
+                if chk:
+                    return {'success': False, 'error': _("Too many votes")}
+            vote = Vote.objects.create(marker=self, user=user)
         return {'success': True, 'status': True}
 
 
@@ -116,6 +130,8 @@ class Vote(models.Model):
                                related_name="votes")
     date = models.DateTimeField(_("date"), auto_now_add=True)
 
+    objects = VoteManager()
+
     class Meta:
         verbose_name = _("vote")
         verbose_name_plural = _("votes")
@@ -124,3 +140,18 @@ class Vote(models.Model):
     def __str__(self):
         return _("Vote: {}").format(self.user.get_full_name)
 
+
+def add_marker_vote(sender, instance, created, raw, **kwargs):
+    """ Update marker vote counter in the same transaction. """
+    if created:
+        Marker.objects.filter(pk=instance.marker_id)\
+                      .update(votes_count=F('votes_count') + 1)
+
+
+def remove_marker_vote(sender, instance, **kwargs):
+    Marker.objects.filter(pk=instance.marker_id)\
+                  .update(votes_count=F('votes_count') - 1)
+
+
+post_save.connect(add_marker_vote, sender=Vote)
+post_delete.connect(remove_marker_vote, sender=Vote)
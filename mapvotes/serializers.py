@@ -31,6 +31,7 @@ class MarkerSerializer(serializers.ModelSerializer):
 
     class Meta:
         model = Marker
+        read_only_fields = ('votes_count',)
 
     def get_content_type(self, obj):
         return ContentType.objects.get_for_model(obj).pk
@@ -2,7 +2,7 @@
 from django.http import Http404
 from django.shortcuts import get_object_or_404
 
-from rest_framework import permissions, viewsets
+from rest_framework import permissions, status, viewsets
 from rest_framework.decorators import link
 from rest_framework.response import Response
 from rest_framework.views import APIView
@@ -44,28 +44,36 @@ class NotificationMarkView(APIView):
     def post(self, request):
         pk = request.POST.get('pk')
         if pk is not None:
-            obj = get_object_or_404(Notification, pk=pk)
+            obj = get_object_or_404(Notification, pk=pk, user=request.user)
             obj.read()
             return Response({
                 'success': True,
                 'checked_at': obj.checked_at,
             })
-        qs = Notification.objects.unread_for_user(self.request.user)
-        for notify in qs:
-            notify.read()
-        serializer = NotificationSerializer(qs, many=True)
+        count = Notification.objects.mark_all_read(request.user)
         return Response({
             'success': True,
-            'count': len(qs),
-            'notifications': serializer.data,
+            'count': count,
         })
 
 
 class NewNotifications(APIView):
-    """ Count new notifications for currently logged in user. """
+    """
+    Count new notifications for currently logged in user. Response carries
+    ETag header, so clients polling for changes may send it back in
+    If-None-Match header and get empty 304 response when nothing changed.
+    """
     permission_classes = (permissions.IsAuthenticated,)
 
     def get(self, request):
-        return Response({
-            'count': Notification.objects.count_unread_for_user(self.request.user)
-        })
+        etag = '"{}"'.format(
+            Notification.objects.version_for_user(request.user))
+        if request.META.get('HTTP_IF_NONE_MATCH') == etag:
+            response = Response(status=status.HTTP_304_NOT_MODIFIED)
+        else:
+            response = Response({
+                'count': Notification.objects.count_unread_for_user(request.user)
+            })
+        response['ETag'] = etag
+        response['Cache-Control'] = 'private, no-cache'
+        return response
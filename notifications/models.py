@@ -1,33 +1,96 @@
 # -*- coding: utf-8 -*-
 from __future__ import unicode_literals
 
+import time
+
+from django.conf import settings
 from django.contrib.auth.models import User
+from django.core import cache
 from django.contrib.contenttypes.models import ContentType
 from django.contrib.contenttypes import generic
 from django.core.urlresolvers import reverse
 from django.db import models
+from django.db.models.signals import post_delete, post_save
 from django.template.defaultfilters import striptags, truncatechars
 from django.utils import timezone
-from django.utils.encoding import python_2_unicode_compatible
+from django.utils.encoding import force_text, python_2_unicode_compatible
 from django.utils.translation import ugettext_lazy as _
 
 
+# Number of notifications saved with single query by `notify_many`.
+BATCH_SIZE = getattr(settings, 'NOTIFY_BATCH_SIZE', 500)
+
+# How long cached counters are trusted (in seconds).
+COUNTER_TIMEOUT = 60 * 60
+
+redis_cache = cache.get_cache('default')
+
+
 class NotificationManager(models.Manager):
     """
     Allows faster counting and searching for notifications related to user.
+    Numbers of unread notifications are cached and updated when notifications
+    are created or read, together with version used to tell clients that
+    something has changed.
     """
+    def _counter_key(self, user_id):
+        return 'notifications:unread:{}'.format(user_id)
+
+    def _version_key(self, user_id):
+        return 'notifications:version:{}'.format(user_id)
+
+    def touch(self, user_id):
+        """ Change version of notifications of given user. """
+        try:
+            redis_cache.incr(self._version_key(user_id))
+        except ValueError:
+            redis_cache.add(self._version_key(user_id),
+                            int(time.time() * 1000), COUNTER_TIMEOUT * 24)
+
+    def change_counter(self, user_id, delta):
+        """ Add `delta` to cached number of unread notifications. """
+        key = self._counter_key(user_id)
+        try:
+            if redis_cache.incr(key, delta) < 0:
+                redis_cache.delete(key)
+        except ValueError:
+            # Counter is not cached, it will be counted on next read.
+            pass
+        self.touch(user_id)
+
+    def version_for_user(self, user):
+        """ Value that changes every time user's notifications change. """
+        version = redis_cache.get(self._version_key(user.pk))
+        if version is None:
+            self.touch(user.pk)
+            version = redis_cache.get(self._version_key(user.pk))
+        return version
 
     def count_unread_for_user(self, user):
         """ This method takes user instance and returns number of unread
         notifications belonging to him. """
-        qs = super(NotificationManager, self).get_queryset()
-        return qs.filter(user=user, checked_at__isnull=True).count()
+        key = self._counter_key(user.pk)
+        count = redis_cache.get(key)
+        if count is None:
+            count = self.unread_for_user(user).count()
+            redis_cache.add(key, count, COUNTER_TIMEOUT)
+        return count
 
     def unread_for_user(self, user):
         """ Find all unread notifications for particular user instance. """
         qs = super(NotificationManager, self).get_queryset()
         return qs.filter(user=user, checked_at__isnull=True)
 
+    def mark_all_read(self, user):
+        """
+        Mark all unread notifications of user as read with single query.
+        Returns number of changed notifications.
+        """
+        count = self.unread_for_user(user).update(checked_at=timezone.now())
+        redis_cache.set(self._counter_key(user.pk), 0, COUNTER_TIMEOUT)
+        self.touch(user.pk)
+        return count
+
 
 @python_2_unicode_compatible
 class Notification(models.Model):
@@ -84,7 +147,10 @@ class Notification(models.Model):
     def read(self):
         if not self.checked_at:
             self.checked_at = timezone.now()
-            self.save()
+            # Only one of concurrent requests should change the counter.
+            if Notification.objects.filter(pk=self.pk, checked_at__isnull=True)\
+                    .update(checked_at=self.checked_at):
+                Notification.objects.change_counter(self.user_id, -1)
 
     def get_absolute_url(self):
         return reverse('notify-detail', kwargs={'pk': self.pk})
@@ -103,21 +169,84 @@ class Notification(models.Model):
         verbose_name_plural = _(u"notifications")
 
 
-def notify(actor, user, **kwargs):
-    """ Create proper notification based on passed values. """
-    notify = Notification(user=user, action_actor=actor)
+def notification_values(actor, **kwargs):
+    """
+    Field values shared by notifications about single event (see `notify`
+    for accepted keyword arguments). Values are simple types, so they may
+    be passed to Celery task.
+    """
+    values = {'action_actor_id': actor.pk if actor is not None else None, }
     action_object = kwargs.get('action_object')
     if action_object is not None:
-        notify.action_object_ct = ContentType.objects.get_for_model(action_object)
-        notify.action_object_id = action_object.pk
+        values['action_object_ct_id'] = \
+            ContentType.objects.get_for_model(action_object).pk
+        values['action_object_id'] = action_object.pk
     action_target = kwargs.get('action_target')
     if action_target is not None:
-        notify.action_target_ct = ContentType.objects.get_for_model(action_target)
-        notify.action_target_id = action_target.pk
+        values['action_target_ct_id'] = \
+            ContentType.objects.get_for_model(action_target).pk
+        values['action_target_id'] = action_target.pk
     keyword = kwargs.get('key')
     if keyword is not None:
-        notify.key = keyword
+        values['key'] = keyword
     verb = kwargs.get('verb')
     if verb is not None:
-        notify.action_verb = verb
+        values['action_verb'] = truncatechars(striptags(force_text(verb)), 64)
+    return values
+
+
+def save_notifications(user_ids, values, batch_size=BATCH_SIZE):
+    """
+    Create notifications with the same values for list of user IDs with
+    one INSERT per batch. Returns number of created notifications.
+    """
+    count = 0
+    for start in range(0, len(user_ids), batch_size):
+        batch = user_ids[start:start + batch_size]
+        Notification.objects.bulk_create([Notification(user_id=pk, **values)
+                                          for pk in batch])
+        for pk in batch:
+            # Bulk create doesn't send signals
+            Notification.objects.change_counter(pk, 1)
+        count += len(batch)
+    return count
+
+
+def notify_many(actor, users, background=False, **kwargs):
+    """
+    Notify many users (list or queryset) about the same event. Takes the
+    same keyword arguments as `notify`. With `background` set notifications
+    are created by Celery task. Returns number of notifications.
+    """
+    if isinstance(users, models.query.QuerySet):
+        user_ids = list(users.values_list('pk', flat=True))
+    else:
+        user_ids = [getattr(x, 'pk', x) for x in users]
+    if not user_ids:
+        return 0
+    values = notification_values(actor, **kwargs)
+    if background:
+        from .tasks import send_notifications
+        send_notifications.delay(user_ids, values)
+        return len(user_ids)
+    return save_notifications(user_ids, values)
+
+
+def notify(actor, user, **kwargs):
+    """ Create proper notification based on passed values. """
+    notify = Notification(user=user, **notification_values(actor, **kwargs))
     notify.save()
+
+
+def count_new_notification(sender, instance, created, raw=False, **kwargs):
+    if created and not raw and instance.checked_at is None:
+        Notification.objects.change_counter(instance.user_id, 1)
+
+
+def count_deleted_notification(sender, instance, **kwargs):
+    if instance.checked_at is None:
+        Notification.objects.change_counter(instance.user_id, -1)
+
+
+post_save.connect(count_new_notification, sender=Notification)
+post_delete.connect(count_deleted_notification, sender=Notification)
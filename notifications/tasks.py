@@ -0,0 +1,20 @@
+# -*- coding: utf-8 -*-
+import time
+
+from celery import task
+
+from .models import save_notifications
+
+import logging
+logger = logging.getLogger('tasks')
+
+
+@task(name='notifications.send_notifications')
+def send_notifications(user_ids, values):
+    """ Create notifications for many users (see models.notify_many). """
+    started = time.time()
+    count = save_notifications(user_ids, values)
+    elapsed = time.time() - started
+    logger.info(u"Created {} notifications in {:.2f} s ({:.0f}/s)".format(
+        count, elapsed, count / elapsed if elapsed else count))
+    return count
@@ -1,3 +1,72 @@
-from django.test import TestCase
+from django.contrib.auth.models import User
+from django.test import TestCase, Client
 
-# Create your tests here.
+from .models import Notification, notify, notify_many, redis_cache
+
+
+def forget_counters(users):
+    """
+    Counters are kept in shared cache, while test users get the same IDs
+    in every test, so values left by previous tests have to be removed.
+    """
+    for user in users:
+        redis_cache.delete(Notification.objects._counter_key(user.pk))
+        redis_cache.delete(Notification.objects._version_key(user.pk))
+
+
+class UnreadCounterTestCase(TestCase):
+    """ Test cached numbers of unread notifications. """
+    def setUp(self):
+        self.user = User.objects.create_user('reader', 'reader@test.com', 'pass')
+        self.actor = User.objects.create_user('actor', 'actor@test.com', 'pass')
+        forget_counters([self.user, self.actor])
+        self.client = Client()
+        self.client.login(username='reader', password='pass')
+
+    def _count(self):
+        return Notification.objects.count_unread_for_user(self.user)
+
+    def test_counter_follows_changes(self):
+        self.assertEqual(self._count(), 0)
+        notify(self.actor, self.user, verb="tested")
+        notify(self.actor, self.user, verb="tested again")
+        self.assertEqual(self._count(), 2)
+        Notification.objects.filter(user=self.user)[0].read()
+        self.assertEqual(self._count(), 1)
+        self.assertEqual(Notification.objects.mark_all_read(self.user), 1)
+        self.assertEqual(self._count(), 0)
+        self.assertFalse(Notification.objects.unread_for_user(self.user))
+
+    def test_conditional_get(self):
+        url = '/api-notifications/count/'
+        response = self.client.get(url)
+        etag = response['ETag']
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+        notify(self.actor, self.user, verb="tested")
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['count'], 1)
+
+
+class NotifyManyTestCase(TestCase):
+    """ Test creating the same notification for many users at once. """
+    def setUp(self):
+        self.actor = User.objects.create_user('actor', 'actor@test.com', 'pass')
+        self.users = [User.objects.create_user('user{}'.format(x),
+                        'user{}@test.com'.format(x), 'pass') for x in range(3)]
+        forget_counters(self.users + [self.actor])
+
+    def test_notify_many(self):
+        count = notify_many(self.actor, User.objects.exclude(pk=self.actor.pk),
+                            key="test", verb="tested", action_target=self.actor)
+        self.assertEqual(count, 3)
+        for user in self.users:
+            self.assertEqual(
+                Notification.objects.count_unread_for_user(user), 1)
+            notification = Notification.objects.get(user=user)
+            self.assertEqual(notification.action_target, self.actor)
+            self.assertEqual(notification.action_verb, "tested")
+
+    def test_notify_nobody(self):
+        self.assertEqual(notify_many(self.actor, [], verb="tested"), 0)
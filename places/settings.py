@@ -150,6 +150,7 @@ MIDDLEWARE_CLASSES = (
     #'django.middleware.cache.FetchFromCacheMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
     'django.contrib.auth.middleware.AuthenticationMiddleware',
+    'places_core.middleware.PermissionCacheMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
     'user_tracker.middleware.VisitorTrackingMiddleware',
@@ -208,6 +209,12 @@ HAYSTACK_CONNECTIONS = {
     },
 }
 
+# Saved objects are queued and indexed in background by Celery worker. Use
+# `rebuild_search_index` command to build entire index.
+HAYSTACK_SIGNAL_PROCESSOR = 'places_core.search.QueuedSignalProcessor'
+# Number of queued objects indexed at once.
+SEARCH_INDEX_FLUSH_SIZE = 500
+
 
 # Postman - wiadomości pomiędzy użytkownikami
 #-------------------------------------------------------------------------------
@@ -425,6 +432,10 @@ CO_THUMB_SIZES = {
     'SMALL': (60, 60),
 }
 
+# Create resized copies of uploaded images in background. Placeholder image
+# is used until they are ready. Requires running Celery worker.
+IMAGE_ASYNC = False
+
 # Maximum size for location and profile pages background images
 BACKGROUND_IMAGE_SIZE = (1920, 300)
 # Settings for user avatar pictures
@@ -469,6 +480,63 @@ COMMENT_PAGINATOR_LIMIT = 10
 # wersji developerskiej.
 USE_CACHE = True
 
+# Backend for queues of deferred database writes (see places_core.buffers).
+# Use 'local' for development without Redis and Celery workers.
+BUFFER_BACKEND = 'redis'
+# Number of visits saved at once by hitcounter.
+HITCOUNTER_FLUSH_SIZE = 1000
+
+# Visitor tracking: queue page views and save them in background. Only
+# TRACKING_SAMPLE_RATE of requests is tracked and new page views are dropped
+# when more than TRACKING_QUEUE_SIZE are waiting.
+TRACKING_ASYNC = True
+TRACKING_SAMPLE_RATE = 1.0
+TRACKING_QUEUE_SIZE = 10000
+TRACKING_FLUSH_SIZE = 1000
+
+# Sitemaps are generated in background into SITEMAP_ROOT and served from
+# there. Run `generate_sitemaps` command to create them for the first time.
+SITEMAP_ROOT = os.path.join(MEDIA_ROOT, 'sitemaps')
+SITEMAP_PROTOCOL = 'https'
+
+# Activity inbox: new actions are copied in background to inboxes of users
+# that follow them, so user streams don't search entire action table. Run
+# `rebuild_inboxes` command before enabling it. Inboxes keep only
+# ACTIVITY_INBOX_SIZE newest actions.
+ACTIVITY_INBOX = False
+ACTIVITY_INBOX_SIZE = 1000
+ACTIVITY_INBOX_FLUSH_SIZE = 500
+
+# Location autocomplete: names are searched in prefix index kept in Redis
+# instead of location table. Run `rebuild_location_autocomplete` command
+# before enabling it. Only LOCATION_AUTOCOMPLETE_CAPACITY best locations
+# (by kind and population) are kept for every prefix.
+LOCATION_AUTOCOMPLETE = False
+LOCATION_AUTOCOMPLETE_CAPACITY = 50
+LOCATION_AUTOCOMPLETE_FLUSH_SIZE = 500
+
+# Translated location names are kept in small in-process LRU cache. Entries
+# are dropped when alternate names change and expire after given timeout,
+# so changes made in other processes are visible as well.
+LOCATION_NAME_CACHE_SIZE = 10000
+LOCATION_NAME_CACHE_TIMEOUT = 300
+
+# Daily counters of activity and visit charts are kept in cache for
+# TIMELINE_CACHE_TIMEOUT seconds. Counters of the last TIMELINE_RECOUNT_DAYS
+# days are counted again on every refresh.
+TIMELINE_CACHE_TIMEOUT = 60 * 60 * 24 * 7
+TIMELINE_RECOUNT_DAYS = 2
+
+# Location statistics: charts are made from daily counters updated in
+# background and kept in cache for LOCATION_STATISTICS_TIMEOUT seconds. Run
+# `rebuild_location_statistics` command to count them from scratch.
+LOCATION_STATISTICS_TIMEOUT = 900
+LOCATION_STATISTICS_FLUSH_SIZE = 500
+
+# User groups and moderated locations are kept in cache and read only once
+# per request. Cache is cleared when they change.
+PERMISSIONS_CACHE_TIMEOUT = 3600
+
 # Etherpad Lite server
 
 ETHERPAD_API_KEY = config['etherpad']['apikey']
@@ -46,19 +46,7 @@ router.register(r'my_actions', views.UserActionsRestViewSet, base_name=r'my_acti
 router.register(r'polls', views.PollListViewSet, base_name=r'polls')
 router.register(r'locationlist', views.LocationBasicViewSet, base_name=r'locationlist')
 # django sitemaps framework
-import places_core.sitemaps as sitemaps
-sitemaps = {
-    'locations': sitemaps.LocationSitemap,
-    'ideas'    : sitemaps.IdeaSitemap,
-    'news'     : sitemaps.NewsSitemap,
-    'polls'    : sitemaps.PollsSitemap,
-    'discussions': sitemaps.DiscussionSitemap,
-    'projects': sitemaps.ProjectsSitemap,
-    'articles': sitemaps.ArticleSitemap,
-    'documents': sitemaps.EtherpadSitemap,
-    'organizations': sitemaps.OrganizationSitemap,
-    'guides': sitemaps.GuideSitemap,
-}
+from places_core.sitemaps import SITEMAPS as sitemaps
 # Javascript translations catalog
 js_info_dict = {'packages': ('places_core', ), }
 
@@ -0,0 +1,111 @@
+# -*- coding: utf-8 -*-
+"""
+Simple FIFO queues used to defer writes that would otherwise hit database on
+every request (visit counters, visitor tracking etc.). Items are serialized to
+JSON, so queues can be shared between web and Celery worker processes when
+Redis backend is used. Local backend keeps items in memory of current process
+and is meant for development and tests.
+
+Backend is selected with BUFFER_BACKEND setting ('redis' or 'local').
+"""
+import json
+import threading
+from collections import deque
+
+from django.conf import settings
+
+
+class LocalBuffer(object):
+    """ In-memory queue for single process. """
+    _queues = {}
+    _lock = threading.Lock()
+
+    def __init__(self, name, maxlen=None):
+        self.name = name
+        self.maxlen = maxlen
+        with self._lock:
+            self.queue = self._queues.setdefault(name, deque())
+
+    def push(self, item):
+        """ Append item to queue. Returns False if queue is full. """
+        with self._lock:
+            if self.maxlen is not None and len(self.queue) >= self.maxlen:
+                return False
+            self.queue.append(json.dumps(item))
+        return True
+
+    def pop_many(self, count):
+        """ Remove and return up to `count` oldest items. """
+        items = []
+        with self._lock:
+            while self.queue and len(items) < count:
+                items.append(self.queue.popleft())
+        return [json.loads(x) for x in items]
+
+    def __len__(self):
+        return len(self.queue)
+
+
+class RedisBuffer(object):
+    """ Queue kept in Redis list, shared by all processes. """
+    def __init__(self, name, maxlen=None):
+        from redis_cache import get_redis_connection
+        self.key = 'buffer:{}'.format(name)
+        self.maxlen = maxlen
+        self.connection = get_redis_connection('default')
+
+    def push(self, item):
+        """ Append item to queue. Returns False if queue is full. """
+        length = self.connection.rpush(self.key, json.dumps(item))
+        if self.maxlen is not None and length > self.maxlen:
+            # Drop newest items, so we don't lose what is already queued.
+            self.connection.ltrim(self.key, 0, self.maxlen - 1)
+            return False
+        return True
+
+    def pop_many(self, count):
+        """ Remove and return up to `count` oldest items. """
+        pipe = self.connection.pipeline()
+        pipe.lrange(self.key, 0, count - 1)
+        pipe.ltrim(self.key, count, -1)
+        items, trimmed = pipe.execute()
+        return [json.loads(x) for x in items]
+
+    def __len__(self):
+        return self.connection.llen(self.key)
+
+
+BACKENDS = {
+    'local': LocalBuffer,
+    'redis': RedisBuffer,
+}
+
+
+def backend_name():
+    return getattr(settings, 'BUFFER_BACKEND', 'redis')
+
+
+def is_local():
+    """
+    Local queues are visible only in current process, so there is no worker
+    that could process them - callers have to do it themselves.
+    """
+    return backend_name() == 'local'
+
+
+def get_buffer(name, maxlen=None):
+    """ Get queue with given name using backend selected in settings. """
+    return BACKENDS[backend_name()](name, maxlen)
+
+
+def push_or_apply(name, items, handler):
+    """
+    Put items into the queue processed by worker, or pass them to `handler`
+    right away when queue is local.
+    """
+    if is_local():
+        handler(items)
+        return
+    queue = get_buffer(name)
+    for item in items:
+        queue.push(item)
@@ -178,6 +178,23 @@ def truncatehtml(string, length, ellipsis='...'):
     return "".join(output)
 
 
+def get_collator(language=None):
+    """ ICU collator comparing strings according to rules of given language. """
+    if language is None:
+        language = translation.get_language()
+    code = language.lower() + '_' + language.upper() + '.' + 'UTF-8'
+    return icu.Collator.createInstance(icu.Locale(code))
+
+
+def locale_sort_key(collator, text, max_length=255):
+    """
+    Collation key of text as hex string, so it may be stored in database and
+    compared as plain ASCII string. Long keys are truncated, which may only
+    affect order of very long names with the same beginning.
+    """
+    return collator.getSortKey(unicode(text)).encode('hex')[:max_length]
+
+
 def sort_by_locale(queryset, key, language=None, reverse=False):
     """
     A simple function that makes use of the PyICU library to sort search
@@ -191,10 +208,7 @@ def sort_by_locale(queryset, key, language=None, reverse=False):
     The language parameter is also compulsory. It's the language code
     in ISO format (pl, en etc.) given as a string.
     """
-    if language is None:
-        language = translation.get_language()
-    code = language.lower() + '_' + language.upper() + '.' + 'UTF-8'
-    collator = icu.Collator.createInstance(icu.Locale(code))
+    collator = get_collator(language)
     q = list(queryset)
     q.sort(key=key, cmp=collator.compare, reverse=reverse)
     return q
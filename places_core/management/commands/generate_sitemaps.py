@@ -0,0 +1,29 @@
+# -*- coding: utf-8 -*-
+from optparse import make_option
+
+from django.core.management.base import BaseCommand
+
+from civmaps.builder import build_sitemaps
+from places_core.sitemaps import SITEMAPS
+
+
+class Command(BaseCommand):
+    """
+    Generate sitemap files for sections that have changed since last run.
+
+    OPTIONS
+        --force         Generate all sections
+    """
+    option_list = BaseCommand.option_list + (
+        make_option('--force',
+            action='store_true',
+            dest='force',
+            default=False,
+            help=u"Generate all sections"
+        ),
+    )
+
+    def handle(self, *args, **options):
+        sections = build_sitemaps(SITEMAPS, options['force'])
+        self.stdout.write(u"Generated sitemaps: {}".format(
+                          u", ".join(sections) or u"none"))
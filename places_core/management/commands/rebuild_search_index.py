@@ -0,0 +1,64 @@
+# -*- coding: utf-8 -*-
+from optparse import make_option
+
+from django.apps import apps
+from django.core.management.base import BaseCommand, CommandError
+
+from places_core.search import IndexLocked, indexed_models, model_label, \
+                                rebuild_model
+
+
+class Command(BaseCommand):
+    """
+    Rebuild search index in chunks, one model at a time. Pass model labels
+    (e.g. `ideas.idea`) to rebuild only selected models. Progress is saved
+    after every chunk, so interrupted rebuild may be started again and it
+    will continue from last indexed object.
+
+    OPTIONS
+        --batch-size    Number of objects indexed at once
+        --restart       Ignore saved progress and start from scratch
+        --using         Search connection alias
+    """
+    args = '[app_label.model_name ...]'
+    option_list = BaseCommand.option_list + (
+        make_option('--batch-size',
+            dest='batch_size',
+            type='int',
+            default=1000,
+            help=u"Number of objects indexed at once"
+        ),
+        make_option('--restart',
+            action='store_true',
+            dest='restart',
+            default=False,
+            help=u"Ignore saved progress and start from scratch"
+        ),
+        make_option('--using',
+            dest='using',
+            default='default',
+            help=u"Search connection alias"
+        ),
+    )
+
+    def handle(self, *args, **options):
+        using = options['using']
+        available = indexed_models(using)
+        if args:
+            try:
+                selected = [apps.get_model(x) for x in args]
+            except (LookupError, ValueError) as ex:
+                raise CommandError(ex)
+        else:
+            selected = available
+        for model in selected:
+            if model not in available:
+                raise CommandError(u"Model {} is not indexed".format(
+                                   model_label(model)))
+            try:
+                count = rebuild_model(model, using, options['batch_size'],
+                                      resume=not options['restart'])
+            except IndexLocked as ex:
+                raise CommandError(ex)
+            self.stdout.write(u"Indexed {} {} objects".format(
+                              count, model_label(model)))
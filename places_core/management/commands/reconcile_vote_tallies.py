@@ -0,0 +1,20 @@
+# -*- coding: utf-8 -*-
+from django.core.management.base import BaseCommand
+
+from comments.models import CommentVote
+from ideas.models import Vote as IdeaVote
+from mapvotes.models import Vote as MarkerVote
+
+
+class Command(BaseCommand):
+    """
+    Recalculate vote counters stored in ideas, comments and map markers and
+    fix the ones that don't match actual votes.
+    """
+    def handle(self, *args, **options):
+        for label, manager in (('ideas', IdeaVote.objects),
+                               ('comments', CommentVote.objects),
+                               ('markers', MarkerVote.objects)):
+            count = manager.recount()
+            self.stdout.write(u"Fixed vote counters for {} {}".format(
+                              count, label))
@@ -10,6 +10,7 @@ from django.db import connections, transaction
 from social.apps.django_app.middleware import SocialAuthExceptionMiddleware
 from social import exceptions as social_exceptions
 
+from .permissions import clear_request_cache, start_request_cache
 from .views import redirect_404
 
 
@@ -60,3 +61,19 @@ class Redirect404Middleware(object):
             if settings.DEBUG:
                 raise
             return response
+
+
+class PermissionCacheMiddleware(object):
+    """
+    Keep user permissions in memory until the end of request, so they are
+    read only once, no matter how many objects are checked.
+    """
+    def process_request(self, request):
+        start_request_cache()
+
+    def process_response(self, request, response):
+        clear_request_cache()
+        return response
+
+    def process_exception(self, request, exception):
+        clear_request_cache()
@@ -2,28 +2,140 @@
 
 # Custom user permissions. If such a need arises, we will use
 # some package such a django-guardian.
-from django.contrib.auth.models import User, Group
-from userspace.models import UserProfile
+#
+# Groups and moderated areas of user are read once and kept in cache until
+# they change (see signal handlers in userspace.models). During request they
+# are also remembered in memory of current thread, together with results of
+# checks made so far, so templates and serializers may call `is_moderator`
+# for every object without hitting database or cache again.
+import threading
+
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core import cache
+
+redis_cache = cache.get_cache('default')
+
+# Number of seconds user groups and moderated areas are kept in cache.
+CACHE_TIMEOUT = getattr(settings, 'PERMISSIONS_CACHE_TIMEOUT', 3600)
+
+CACHE_KEY = 'permissions:{}'
+
+# Members of this group may moderate every location.
+EDITOR_GROUP = 'Editor'
+
+_local = threading.local()
+
+
+class UserPermissions(object):
+    """
+    Groups and moderated areas of single user. Moderator of location may
+    moderate all its descendants as well.
+    """
+    def __init__(self, groups, areas):
+        self.groups = set(groups)
+        self.areas = set(areas)
+        self.checked = {}
+
+    @property
+    def is_editor(self):
+        return EDITOR_GROUP in self.groups
+
+    def moderated_subset(self, location_ids):
+        """ Set of given location IDs which user may moderate. """
+        from locations.models import LocationClosure
+        location_ids = set(location_ids)
+        unknown = location_ids - self.areas - set(self.checked)
+        if unknown and self.areas:
+            moderated = set(LocationClosure.objects.filter(
+                ancestor__in=self.areas, descendant__in=unknown)\
+                .values_list('descendant', flat=True))
+            for pk in unknown:
+                self.checked[pk] = pk in moderated
+        return set(pk for pk in location_ids
+                   if pk in self.areas or self.checked.get(pk))
+
+    def moderates(self, location_id):
+        return location_id in self.moderated_subset([location_id])
+
+
+def load_permissions(user_id):
+    from userspace.models import UserProfile
+    return {
+        'groups': list(User.groups.through.objects.filter(user=user_id)\
+                       .values_list('group__name', flat=True)),
+        'areas': list(
+            UserProfile.mod_areas.through.objects\
+                .filter(userprofile__user=user_id)\
+                .values_list('location', flat=True)),
+    }
+
+
+def get_permissions(user):
+    """
+    Permissions of authenticated user. They are remembered until the end of
+    current request, or taken from cache outside of requests.
+    """
+    local_cache = getattr(_local, 'permissions', None)
+    if local_cache is not None and user.pk in local_cache:
+        return local_cache[user.pk]
+    key = CACHE_KEY.format(user.pk)
+    data = redis_cache.get(key)
+    if data is None:
+        data = load_permissions(user.pk)
+        redis_cache.set(key, data, timeout=CACHE_TIMEOUT)
+    permissions = UserPermissions(data['groups'], data['areas'])
+    if local_cache is not None:
+        local_cache[user.pk] = permissions
+    return permissions
+
+
+def forget_permissions(user_ids):
+    """ Remove cached permissions of given users after they've changed. """
+    local_cache = getattr(_local, 'permissions', None)
+    for pk in user_ids:
+        redis_cache.delete(CACHE_KEY.format(pk))
+        if local_cache is not None:
+            local_cache.pop(pk, None)
+
+
+def start_request_cache():
+    """ Remember permissions read in current thread (see middleware). """
+    _local.permissions = {}
+
+
+def clear_request_cache():
+    _local.permissions = None
 
 
 def is_moderator(user, location):
     """
     This function check whether the user is a mod of
-    a given location. Returns 'True' also for superadmins
+    a given location (object or its ID). Returns 'True' also for superadmins
     and 'supermoderators'.
     """
     if user.is_superuser:
         return True
 
-    # The group name is written "non-dynamically" !!!
-    if 'Editor' in [x.name for x in Group.objects.all()]:
-        return True
-
     if user.is_anonymous():
         return False
 
-    profile = UserProfile.objects.get(user = user)
-    if profile.mod_areas.filter(pk=location.pk).exists():
-        return True
+    permissions = get_permissions(user)
+    return permissions.is_editor or \
+           permissions.moderates(getattr(location, 'pk', location))
+
 
-    return False
+def moderated_subset(user, locations):
+    """
+    Set of IDs of given locations (objects or IDs) that user may moderate,
+    checked with single query. Meant for list views and serializers.
+    """
+    location_ids = set(getattr(x, 'pk', x) for x in locations)
+    if user.is_superuser:
+        return location_ids
+    if user.is_anonymous():
+        return set()
+    permissions = get_permissions(user)
+    if permissions.is_editor:
+        return location_ids
+    return permissions.moderated_subset(location_ids)
@@ -0,0 +1,243 @@
+# -*- coding: utf-8 -*-
+"""
+Incremental search indexing. Saved and deleted objects are put into the queue
+(see places_core.buffers) and Celery worker updates search index in batches,
+so we don't have to rebuild entire index periodically.
+
+Enable it with:
+
+    HAYSTACK_SIGNAL_PROCESSOR = 'places_core.search.QueuedSignalProcessor'
+"""
+import time
+from uuid import uuid4
+
+from django.apps import apps
+from django.conf import settings
+from django.core import cache
+from django.db import models
+
+from haystack import connections
+from haystack.exceptions import NotHandled
+from haystack.signals import BaseSignalProcessor
+
+from .buffers import get_buffer, push_or_apply
+
+redis_cache = cache.get_cache('default')
+
+# Name of the queue for objects waiting to be indexed.
+BUFFER_NAME = 'search'
+
+# Number of queued objects indexed at once.
+FLUSH_SIZE = getattr(settings, 'SEARCH_INDEX_FLUSH_SIZE', 500)
+
+# Index may have only one writer (Xapian locks the database), so queue
+# processing and rebuild take this lock before they write anything.
+LOCK_KEY = 'search:lock'
+
+# Lock expires after this number of seconds if its owner died. Owner renews
+# it after every batch.
+LOCK_TIMEOUT = getattr(settings, 'SEARCH_INDEX_LOCK_TIMEOUT', 600)
+
+# Number of seconds rebuild waits for queue processing to finish.
+LOCK_WAIT = 60
+
+
+class IndexLocked(Exception):
+    """ Another process is writing to the index. """
+
+
+def acquire_lock(wait=0):
+    """
+    Take write lock, waiting up to `wait` seconds. Returns token of lock
+    owner or None when lock wasn't acquired.
+    """
+    token = uuid4().hex
+    deadline = time.time() + wait
+    while not redis_cache.add(LOCK_KEY, token, LOCK_TIMEOUT):
+        if time.time() >= deadline:
+            return None
+        time.sleep(1)
+    return token
+
+
+def refresh_lock(token):
+    """ Extend lock of given owner. Returns False if lock was lost. """
+    if redis_cache.get(LOCK_KEY) != token:
+        return False
+    redis_cache.set(LOCK_KEY, token, LOCK_TIMEOUT)
+    return True
+
+
+def release_lock(token):
+    """ Remove lock, unless it expired and was taken by another process. """
+    if redis_cache.get(LOCK_KEY) == token:
+        redis_cache.delete(LOCK_KEY)
+
+
+def model_label(model):
+    return u"{}.{}".format(model._meta.app_label, model._meta.model_name)
+
+
+def get_index(model, using='default'):
+    """ Get search index for model or None if model is not indexed. """
+    try:
+        return connections[using].get_unified_index().get_index(model)
+    except NotHandled:
+        return None
+
+
+def update_objects(model, id_list, using='default'):
+    """
+    Bring index of given objects up to date. Objects that were deleted or
+    are no longer returned by `index_queryset` are removed from index.
+    Returns number of updated objects.
+    """
+    index = get_index(model, using)
+    if index is None:
+        return 0
+    backend = connections[using].get_backend()
+    objects = list(index.index_queryset(using=using).filter(pk__in=id_list))
+    if objects:
+        backend.update(index, objects)
+    found = set(unicode(x.pk) for x in objects)
+    label = model_label(model)
+    for pk in id_list:
+        if unicode(pk) not in found:
+            backend.remove(u"{}.{}".format(label, pk))
+    return len(objects)
+
+
+def enqueue_objects(model, id_list, using='default'):
+    """
+    Put objects into the queue, e.g. after they were saved with bulk_create
+    which doesn't send signals.
+    """
+    if get_index(model, using) is None:
+        return
+    label = model_label(model)
+    push_or_apply(BUFFER_NAME, [[using, label, pk] for pk in id_list],
+                  index_batch)
+
+
+def index_batch(batch):
+    """ Index objects from single batch of queue items. """
+    # Object saved many times is indexed only once
+    pending = {}
+    for using, label, pk in batch:
+        pending.setdefault((using, label), set()).add(pk)
+    for (using, label), id_list in pending.iteritems():
+        try:
+            model = apps.get_model(label)
+        except LookupError:
+            continue
+        update_objects(model, list(id_list), using)
+
+
+def process_queue(batch_size=FLUSH_SIZE):
+    """
+    Index queued objects. Returns number of processed queue items. Nothing
+    is done while another process writes to the index - items just wait in
+    the queue for the next run.
+    """
+    token = acquire_lock()
+    if token is None:
+        return 0
+    queue = get_buffer(BUFFER_NAME)
+    total = 0
+    try:
+        while True:
+            batch = queue.pop_many(batch_size)
+            if not batch:
+                break
+            try:
+                index_batch(batch)
+            except Exception:
+                # Put items back, so they are indexed in the next run
+                for item in batch:
+                    queue.push(item)
+                raise
+            total += len(batch)
+            if not refresh_lock(token):
+                # Lock expired and another process writes to the index now
+                break
+    finally:
+        release_lock(token)
+    return total
+
+
+def checkpoint_key(model, using='default'):
+    return 'search:rebuild:{}:{}'.format(using, model_label(model))
+
+
+def rebuild_model(model, using='default', batch_size=1000, resume=True):
+    """
+    Rebuild index for single model in chunks of objects ordered by primary
+    key. Last indexed key is stored in cache after every chunk, so rebuild
+    which was interrupted continues from where it stopped. Returns number
+    of indexed objects.
+    """
+    index = get_index(model, using)
+    if index is None:
+        return 0
+    token = acquire_lock(LOCK_WAIT)
+    if token is None:
+        raise IndexLocked(u"Search index is being updated by another process")
+    try:
+        return rebuild_index(index, model, using, batch_size, resume, token)
+    finally:
+        release_lock(token)
+
+
+def rebuild_index(index, model, using, batch_size, resume, token):
+    backend = connections[using].get_backend()
+    key = checkpoint_key(model, using)
+    last_pk = redis_cache.get(key) if resume else None
+    if last_pk is None:
+        backend.clear(models=[model])
+    queryset = index.index_queryset(using=using).order_by('pk')
+    count = 0
+    while True:
+        chunk = queryset
+        if last_pk is not None:
+            chunk = chunk.filter(pk__gt=last_pk)
+        chunk = list(chunk[:batch_size])
+        if not chunk:
+            break
+        backend.update(index, chunk)
+        last_pk = chunk[-1].pk
+        redis_cache.set(key, last_pk, None)
+        # Keep the lock while rebuild is running
+        if not refresh_lock(token):
+            raise IndexLocked(u"Lock of search index was lost")
+        count += len(chunk)
+    redis_cache.delete(key)
+    return count
+
+
+def indexed_models(using='default'):
+    return connections[using].get_unified_index().get_indexed_models()
+
+
+class QueuedSignalProcessor(BaseSignalProcessor):
+    """
+    Put saved and deleted objects into the queue instead of updating index
+    in the middle of request.
+    """
+    def setup(self):
+        models.signals.post_save.connect(self.handle_save)
+        models.signals.post_delete.connect(self.handle_delete)
+
+    def teardown(self):
+        models.signals.post_save.disconnect(self.handle_save)
+        models.signals.post_delete.disconnect(self.handle_delete)
+
+    def enqueue(self, sender, instance):
+        for using in self.connection_router.for_write(instance=instance):
+            enqueue_objects(sender, [instance.pk], using)
+
+    def handle_save(self, sender, instance, raw=False, **kwargs):
+        if not raw:
+            self.enqueue(sender, instance)
+
+    def handle_delete(self, sender, instance, **kwargs):
+        self.enqueue(sender, instance)
@@ -1,8 +1,8 @@
 # -*- coding: utf-8 -*-
-import datetime
-from django.utils import timezone
+from django.db.models import Count, Max
+
 from civmaps import Sitemap
-from locations.models import Location
+from locations.models import Location, LocationContent
 from ideas.models import Idea
 from topics.models import Discussion
 from blog.models import News
@@ -13,65 +13,84 @@ from articles.models import Article
 
 
 class LocationSitemap(Sitemap):
+    """
+    Location page changes when new content is published there, so we take
+    date of the newest content as last modification date.
+    """
     changefreq = "daily"
     priority = 1
+    date_field = 'date_created'
 
     def items(self):
-        return Location.objects.all()
+        return Location.objects.annotate(
+            last_content=Max('content_index__date_created')).order_by('pk')
 
     def lastmod(self, obj):
-        return timezone.now()
+        if obj.last_content is not None:
+            return max(obj.date_created, obj.last_content)
+        return obj.date_created
+
+    def fingerprint(self):
+        result = []
+        for qs in (Location.objects, LocationContent.objects):
+            values = qs.aggregate(count=Count('pk'),
+                                  lastmod=Max('date_created'))
+            result += [values['count'], unicode(values['lastmod'])]
+        return result
 
 
 class IdeaSitemap(Sitemap):
     changefreq = "daily"
     priority = 1
+    date_field = 'date_edited'
 
     def items(self):
-        return Idea.objects.all()
-
-    def lastmod(self, obj):
-        return obj.date_edited
+        return Idea.objects.order_by('pk')
 
 
 class DiscussionSitemap(Sitemap):
     changefreq = "hourly"
     priority = 0.5
+    date_field = 'date_edited'
 
     def items(self):
-        return Discussion.objects.all()
+        return Discussion.objects.order_by('pk')
 
 
 class NewsSitemap(Sitemap):
     changefreq = "always"
     priority = 0.5
+    date_field = 'date_edited'
 
     def items(self):
-        return News.objects.all()
+        return News.objects.order_by('pk')
 
 
 class PollsSitemap(Sitemap):
     changefreq = "hourly"
     priority = 0.5
+    date_field = 'date_modified'
 
     def items(self):
-        return Poll.objects.all()
+        return Poll.objects.order_by('pk')
 
 
 class ProjectsSitemap(Sitemap):
     changefreq = "hourly"
     priority = 0.5
+    date_field = 'date_changed'
 
     def items(self):
-        return SocialProject.objects.all()
+        return SocialProject.objects.order_by('pk')
 
 
 class ArticleSitemap(Sitemap):
     changefreq = "hourly"
     priority = 0.5
+    date_field = 'edited'
 
     def items(self):
-        return Article.objects.all()
+        return Article.objects.order_by('pk')
 
 
 class EtherpadSitemap(Sitemap):
@@ -79,22 +98,38 @@ class EtherpadSitemap(Sitemap):
     priority = 0.5
 
     def items(self):
-        return Pad.objects.all()
+        return Pad.objects.order_by('pk')
 
 
 from organizations.models import Organization
 class OrganizationSitemap(Sitemap):
     changefreq = "hourly"
     priority = 0.5
+    date_field = 'date_modified'
 
     def items(self):
-        return Organization.objects.all()
+        return Organization.objects.order_by('pk')
 
 
 from guides.models import Guide
 class GuideSitemap(Sitemap):
     changefreq = "daily"
     priority = 0.5
+    date_field = 'updated_at'
 
     def items(self):
-        return Guide.objects.all()
+        return Guide.objects.order_by('pk')
+
+
+SITEMAPS = {
+    'locations': LocationSitemap,
+    'ideas'    : IdeaSitemap,
+    'news'     : NewsSitemap,
+    'polls'    : PollsSitemap,
+    'discussions': DiscussionSitemap,
+    'projects': ProjectsSitemap,
+    'articles': ArticleSitemap,
+    'documents': EtherpadSitemap,
+    'organizations': OrganizationSitemap,
+    'guides': GuideSitemap,
+}
@@ -0,0 +1,119 @@
+# -*- coding: utf-8 -*-
+"""
+Unique slugs for objects with the same name. When `base` slug is taken, we
+append the lowest free number, e.g. `nowa-wies-pl-3`. Instead of checking
+every variant with separate query, all existing variants of base slug are
+read at once. Slug fields have unique constraint, so when another process
+takes the same slug between our check and insert, we just try again.
+"""
+from django.db import IntegrityError, transaction
+from django.db.models import Count, Q
+
+# Number of attempts to save object before IntegrityError is passed on.
+SAVE_RETRIES = 5
+
+# Number of base slugs checked with single query in bulk mode.
+CHUNK_SIZE = 100
+
+
+def slug_number(slug, base):
+    """ Number appended to base slug, 0 for base itself, None if no match. """
+    if slug == base:
+        return 0
+    suffix = slug[len(base) + 1:]
+    if slug.startswith(base + '-') and suffix.isdigit() and suffix[0] != '0':
+        return int(suffix)
+    return None
+
+
+def variants_query(bases, field='slug'):
+    """ Filter matching given base slugs and all their numbered variants. """
+    query = Q(**{'{}__in'.format(field): list(bases)})
+    for base in bases:
+        query |= Q(**{'{}__startswith'.format(field): base + '-'})
+    return query
+
+
+def free_slug(base, numbers):
+    """ Base slug with the lowest number not included in `numbers`. """
+    number = 0
+    while number in numbers:
+        number += 1
+    return base if not number else "{}-{}".format(base, number)
+
+
+def allocate_slug(instance, base, field='slug'):
+    """ Find free slug for given object with single query. """
+    qs = instance.__class__._default_manager.filter(
+        variants_query([base], field))
+    if instance.pk is not None:
+        qs = qs.exclude(pk=instance.pk)
+    numbers = set(slug_number(x, base)
+                  for x in qs.values_list(field, flat=True))
+    return free_slug(base, numbers)
+
+
+def save_with_slug(instance, base, save, field='slug'):
+    """
+    Set unique slug made from `base` and save object by calling `save`
+    (usually parent class save method). Object that already has slug made
+    from the same base keeps it, so its address doesn't change.
+    """
+    current = getattr(instance, field)
+    if instance.pk is not None and current and \
+            slug_number(current, base) is not None:
+        return save()
+    for attempt in range(SAVE_RETRIES):
+        setattr(instance, field, allocate_slug(instance, base, field))
+        try:
+            with transaction.atomic():
+                return save()
+        except IntegrityError:
+            # Raise errors that aren't caused by slug taken in the meantime
+            qs = instance.__class__._default_manager.filter(
+                **{field: getattr(instance, field)})
+            if instance.pk is not None:
+                qs = qs.exclude(pk=instance.pk)
+            if attempt == SAVE_RETRIES - 1 or not qs.exists():
+                raise
+
+
+def allocate_slugs(model, bases, field='slug'):
+    """
+    Bulk mode for loaders: find free slugs for list of new objects with
+    given base slugs. Slugs are unique also within the list. Returns list
+    of slugs in the same order.
+    """
+    numbers = dict((x, set()) for x in bases)
+    distinct = list(numbers)
+    for i in range(0, len(distinct), CHUNK_SIZE):
+        chunk = distinct[i:i + CHUNK_SIZE]
+        qs = model._default_manager.filter(variants_query(chunk, field))
+        for slug in qs.values_list(field, flat=True):
+            for base in chunk:
+                number = slug_number(slug, base)
+                if number is not None:
+                    numbers[base].add(number)
+    slugs = []
+    for base in bases:
+        slug = free_slug(base, numbers[base])
+        numbers[base].add(slug_number(slug, base))
+        slugs.append(slug)
+    return slugs
+
+
+def fix_duplicate_slugs(model, field='slug'):
+    """
+    Give new slugs to all but the oldest objects sharing the same slug, so
+    unique constraint may be added. Works with historical models, so it can
+    be used in migrations.
+    """
+    manager = model._default_manager
+    # Default ordering would be added to GROUP BY and split duplicates
+    duplicates = manager.order_by().values(field)\
+                        .annotate(count=Count('pk')).filter(count__gt=1)\
+                        .values_list(field, flat=True)
+    for slug in list(duplicates):
+        for obj in manager.filter(**{field: slug}).order_by('pk')[1:]:
+            manager.filter(pk=obj.pk).update(
+                **{field: allocate_slug(obj, slug, field)})
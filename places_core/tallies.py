@@ -0,0 +1,78 @@
+# -*- coding: utf-8 -*-
+"""
+Counters stored in parent rows (e.g. number of votes for idea), so lists of
+objects don't need separate COUNT queries for every item. Counters are
+changed with `UPDATE ... SET x = x + n` in the same transaction as related
+rows, and may be recalculated with `reconcile_vote_tallies` command.
+
+Tally is a dictionary of counter field name - value pairs.
+"""
+from django.db.models import F
+
+
+def add_tallies(*tallies):
+    """ Sum any number of tallies. """
+    result = {}
+    for tally in tallies:
+        for field, value in tally.iteritems():
+            result[field] = result.get(field, 0) + value
+    return result
+
+
+def negate_tally(tally):
+    return dict((field, -value) for field, value in tally.iteritems())
+
+
+def update_tally(model, pk, tally):
+    """ Add values from tally to counters of single object. """
+    changes = dict((field, F(field) + value)
+                   for field, value in tally.iteritems() if value)
+    if changes:
+        model.objects.filter(pk=pk).update(**changes)
+
+
+def move_tally(model, origin, current):
+    """
+    Update counters after related row was saved or deleted. `origin` and
+    `current` are (parent pk, tally) tuples describing row before and after
+    change, or None if row did not exist.
+    """
+    changes = {}
+    if origin is not None:
+        pk, tally = origin
+        changes[pk] = negate_tally(tally)
+    if current is not None:
+        pk, tally = current
+        changes[pk] = add_tallies(changes.get(pk, {}), tally)
+    for pk, tally in changes.iteritems():
+        update_tally(model, pk, tally)
+
+
+def tally_safe_kwargs(instance, fields, kwargs):
+    """
+    Save arguments that leave counters of existing row untouched. Counters
+    kept in memory are usually stale, so ordinary save (e.g. after editing
+    idea) must not overwrite changes made by votes in the meantime.
+    """
+    if instance._state.adding or kwargs.get('force_insert') or \
+            kwargs.get('update_fields') is not None:
+        return kwargs
+    update_fields = [x.name for x in instance._meta.concrete_fields
+                     if not x.primary_key and x.name not in fields]
+    return dict(kwargs, update_fields=update_fields)
+
+
+def reconcile(model, counts, fields):
+    """
+    Compare stored counters with `counts` (dictionary of pk - tally pairs,
+    missing objects have all counters equal 0) and fix differences.
+    Returns number of fixed objects.
+    """
+    fixed = 0
+    for row in model.objects.values('pk', *fields).iterator():
+        expected = counts.get(row['pk'], {})
+        values = dict((field, expected.get(field, 0)) for field in fields)
+        if any(row[field] != values[field] for field in fields):
+            model.objects.filter(pk=row['pk']).update(**values)
+            fixed += 1
+    return fixed
@@ -1,9 +1,7 @@
 # -*- coding: utf-8 -*-
 from __future__ import absolute_import
 
-import os
 import datetime
-import subprocess
 
 from celery import task
 from celery.task.base import periodic_task
@@ -16,6 +14,11 @@ from activities.models import user_email_stream
 from userspace.models import RegisterDemand
 from civmail.messages import *
 
+from civmaps.builder import build_sitemaps
+
+from .search import process_queue
+from .sitemaps import SITEMAPS
+
 import logging
 logger = logging.getLogger('tasks')
 
@@ -75,10 +78,16 @@ def cleanup_register_demands(forced=False):
     logger.info(u"[{}]: Finished register cleanup".format(timezone.now()))
 
 
-@periodic_task(run_every=datetime.timedelta(minutes=5))
+@periodic_task(run_every=datetime.timedelta(minutes=1))
 def update_indexes():
-    """ Update haystack indexes. """
-    logger.info(u"[{}]: Started update indexes".format(timezone.now()))
-    filename = os.path.join(settings.BASE_DIR, 'manage.py')
-    logger.info(u"[{}]: Finished update indexes".format(timezone.now()))
-    return subprocess.call(['python', filename, 'update_index'])
+    """ Index objects queued by places_core.search.QueuedSignalProcessor. """
+    count = process_queue()
+    if count:
+        logger.info(u"Indexed {} queued objects".format(count))
+    return count
+
+
+@periodic_task(run_every=datetime.timedelta(hours=1))
+def generate_sitemaps():
+    """ Generate sitemap files for sections that have changed. """
+    return build_sitemaps(SITEMAPS)
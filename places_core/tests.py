@@ -1,3 +1,208 @@
+# -*- coding: utf-8 -*-
+import datetime
+import shutil
+import tempfile
+
+from django.contrib.auth.models import Group, User
 from django.test import TestCase
+from django.test.utils import override_settings
+from django.utils import timezone
+
+from haystack.query import SearchQuerySet
+
+from blog.models import Category
+from civmaps.builder import file_path, write_file
+from locations.models import Location
+
+from .buffers import get_buffer
+from .permissions import is_moderator, moderated_subset
+from .search import BUFFER_NAME, acquire_lock, process_queue, release_lock
+from .slugs import allocate_slugs, fix_duplicate_slugs
+from .timeline import forget_counts, histogram, today
+
+
+class TimelineTestCase(TestCase):
+    """ Test daily histograms built with single grouped query. """
+    fixtures = ['fixtures/users.json',]
+
+    def setUp(self):
+        user = User.objects.first()
+        for name in ['First', 'Second', 'Third']:
+            Location.objects.create(name=name, creator=user)
+        old = Location.objects.get(name='First')
+        Location.objects.filter(pk=old.pk).update(
+            date_created=timezone.now() - datetime.timedelta(days=3))
+
+    def test_empty_days_are_filled(self):
+        """ Every day from the oldest item gets its counter. """
+        data = histogram(Location.objects.all(), 'date_created',
+                         use_cache=False)
+        self.assertEqual(len(data.results), 4)
+        self.assertEqual(data.results[0], 1)
+        self.assertEqual(data.results[-1], 2)
+        self.assertEqual(data.total, 3)
+
+    def test_start_date(self):
+        """ Histogram may start at any given date. """
+        data = histogram(Location.objects.all(), 'date_created',
+                         start=today(), use_cache=False)
+        self.assertEqual(data.results, [2])
+
+    def test_cache_forgets_deleted_rows(self):
+        queryset = Location.objects.filter(name__in=[u'First', u'Łódź'])
+        self.assertEqual(histogram(queryset, 'date_created').total, 1)
+        Location.objects.get(name='First').delete()
+        forget_counts(Location)
+        self.assertEqual(histogram(queryset, 'date_created').total, 0)
+
+
+def indexed_locations(name):
+    """ Primary keys of indexed locations with given name. """
+    return [x.pk for x in SearchQuerySet().models(Location).filter(name=name)]
+
+
+@override_settings(BUFFER_BACKEND='local')
+class SearchQueueTestCase(TestCase):
+    """ Queue of objects waiting to be indexed. """
+    fixtures = ['fixtures/users.json',]
+
+    def test_queue_is_drained(self):
+        queue = get_buffer(BUFFER_NAME)
+        # Unknown models are skipped, so nothing is written to index.
+        queue.push(['default', 'nosuchapp.model', 1])
+        queue.push(['default', 'nosuchapp.model', 1])
+        self.assertEqual(process_queue(batch_size=1), 2)
+        self.assertEqual(len(queue), 0)
+
+    def test_index_is_updated(self):
+        """ Saved objects are indexed and deleted ones are removed. """
+        queue = get_buffer(BUFFER_NAME)
+        location = Location.objects.create(name=u'Kwiatkowo',
+                                           creator=User.objects.first())
+        # Rename without signals, so only the queue may update index
+        Location.objects.filter(pk=location.pk).update(name=u'Zrazowice')
+        queue.push(['default', 'locations.location', location.pk])
+        process_queue()
+        found = indexed_locations(u'Zrazowice')
+        self.assertIn(unicode(location.pk), found)
+        pk = location.pk
+        location.delete()
+        queue.push(['default', 'locations.location', pk])
+        process_queue()
+        self.assertNotIn(unicode(pk), indexed_locations(u'Zrazowice'))
+
+    def test_queue_waits_for_lock(self):
+        """ Queue isn't processed while another process owns the lock. """
+        queue = get_buffer(BUFFER_NAME)
+        queue.push(['default', 'nosuchapp.model', 1])
+        token = acquire_lock()
+        self.assertIsNotNone(token)
+        try:
+            self.assertEqual(process_queue(), 0)
+            self.assertEqual(len(queue), 1)
+            # Lock is released only by its owner
+            release_lock('other')
+            self.assertIsNone(acquire_lock())
+        finally:
+            release_lock(token)
+        self.assertEqual(process_queue(), 1)
+
+    def test_failed_batch_is_queued_again(self):
+        queue = get_buffer(BUFFER_NAME)
+        queue.push(['default', 'locations.location', 'invalid'])
+        with self.assertRaises(ValueError):
+            process_queue()
+        self.assertEqual(len(queue), 1)
+        queue.pop_many(1)
+
+
+class ModeratorPermissionsTestCase(TestCase):
+    """ Cached checks of moderator permissions. """
+    fixtures = ['fixtures/users.json',
+                'fixtures/locations.json',]
+
+    def setUp(self):
+        self.user = User.objects.filter(is_superuser=False)[0]
+        self.user.profile.mod_areas.clear()
+        self.region = Location.objects.get(slug='brzeg-pl-1').parent
+        self.city = Location.objects.get(slug='brzeg-pl-1')
+
+    def test_descendants_are_moderated(self):
+        self.user.profile.mod_areas.add(self.region)
+        self.assertTrue(is_moderator(self.user, self.city))
+        self.assertFalse(is_moderator(self.user, self.region.parent))
+        self.assertEqual(moderated_subset(self.user, [self.city,
+                         self.region, self.region.parent]),
+                         set([self.city.pk, self.region.pk]))
+
+    def test_cache_is_cleared_after_change(self):
+        self.assertFalse(is_moderator(self.user, self.city))
+        self.user.profile.mod_areas.add(self.city)
+        self.assertTrue(is_moderator(self.user, self.city))
+        self.user.profile.mod_areas.remove(self.city)
+        self.assertFalse(is_moderator(self.user, self.city))
+
+    def test_editor_group_members(self):
+        editors = Group.objects.create(name='Editor')
+        self.assertFalse(is_moderator(self.user, self.city))
+        self.user.groups.add(editors)
+        self.assertTrue(is_moderator(self.user, self.city))
+
+
+class SlugAllocationTestCase(TestCase):
+    """ Unique slugs for objects with the same name. """
+    fixtures = ['fixtures/users.json',]
+
+    def setUp(self):
+        self.user = User.objects.first()
+
+    def test_lowest_free_number_is_used(self):
+        first = Location.objects.create(name=u"Nowa Wieś", creator=self.user)
+        second = Location.objects.create(name=u"Nowa Wieś", creator=self.user)
+        third = Location.objects.create(name=u"Nowa Wieś", creator=self.user)
+        self.assertEqual(second.slug, first.slug + '-1')
+        second.delete()
+        fourth = Location.objects.create(name=u"Nowa Wieś", creator=self.user)
+        self.assertEqual(fourth.slug, first.slug + '-1')
+        third.save()
+        self.assertEqual(third.slug, first.slug + '-2')
+
+    def test_bulk_allocation(self):
+        first = Location.objects.create(name=u"Nowa Wieś", creator=self.user)
+        slugs = allocate_slugs(Location, [first.slug, first.slug, 'other'])
+        self.assertEqual(slugs, [first.slug + '-1', first.slug + '-2',
+                                 'other'])
+
+    def test_duplicates_of_ordered_model(self):
+        """ Duplicates are found although model has default ordering. """
+        for name in ['First', 'Second', 'Third']:
+            Category.objects.create(name=name)
+        Category.objects.update(slug='news')
+        fix_duplicate_slugs(Category)
+        self.assertEqual(sorted(Category.objects.values_list('slug',
+                                                             flat=True)),
+                         ['news', 'news-1', 'news-2'])
+
+
+class SitemapFilesTestCase(TestCase):
+    """ Sitemaps generated in background are served with cache headers. """
+    def setUp(self):
+        self.root = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.root)
+
+    def test_unchanged_file_is_not_written(self):
+        with self.settings(SITEMAP_ROOT=self.root):
+            path = file_path('default', 'ideas', 1)
+            self.assertTrue(write_file(path, u"<urlset></urlset>"))
+            self.assertFalse(write_file(path, u"<urlset></urlset>"))
 
-# Create your tests here.
+    def test_sitemap_is_served_from_file(self):
+        with self.settings(SITEMAP_ROOT=self.root):
+            write_file(file_path('default', 'ideas', 1), u"<urlset></urlset>")
+            response = self.client.get('/sitemap-ideas.xml')
+            self.assertEqual(response.content, "<urlset></urlset>")
+            response = self.client.get('/sitemap-ideas.xml',
+                HTTP_IF_NONE_MATCH=response['ETag'])
+            self.assertEqual(response.status_code, 304)
@@ -0,0 +1,185 @@
+# -*- coding: utf-8 -*-
+"""
+Count objects in daily (weekly, monthly) periods for charts. Instead of one
+COUNT query for every day, we run single grouped query and fill the gaps in
+Python. Counters for days that are already over rarely change, so they are
+cached and only the last few days are recalculated. Cached counters of model
+are dropped when its rows are deleted (see `forget_counts`).
+"""
+import collections
+import datetime
+import hashlib
+import time
+
+from django.conf import settings
+from django.core import cache
+from django.db import connections, models
+from django.db.models.sql.datastructures import EmptyResultSet
+from django.db.models import Count, Sum
+from django.utils import timezone
+
+redis_cache = cache.get_cache('default')
+
+# Number of seconds counters are kept in cache.
+CACHE_TIMEOUT = getattr(settings, 'TIMELINE_CACHE_TIMEOUT', 60 * 60 * 24 * 7)
+
+# Rows may be saved late (e.g. queued hits), so counters of this number of
+# days before today are counted again on every refresh.
+RECOUNT_DAYS = getattr(settings, 'TIMELINE_RECOUNT_DAYS', 2)
+
+Histogram = collections.namedtuple('Histogram',
+                ['start', 'period', 'results', 'total'])
+
+
+def today():
+    """ Current date in current time zone. """
+    return timezone.localtime(timezone.now()).date() \
+        if timezone.is_aware(timezone.now()) else datetime.date.today()
+
+
+def local_date(value):
+    """ Get date from datetime object, taking time zone into account. """
+    if isinstance(value, datetime.datetime):
+        if timezone.is_aware(value):
+            value = timezone.localtime(value)
+        return value.date()
+    return value
+
+
+def _to_date(value):
+    """ Databases return truncated dates in different formats. """
+    if isinstance(value, datetime.datetime):
+        return value.date()
+    if isinstance(value, datetime.date):
+        return value
+    return datetime.datetime.strptime(str(value)[:10], '%Y-%m-%d').date()
+
+
+def _day_start(queryset, field, day):
+    """ Get value that can be compared with `field` to filter from `day`. """
+    if not isinstance(field, models.DateTimeField):
+        return day
+    value = datetime.datetime.combine(day, datetime.time.min)
+    if timezone.is_aware(timezone.now()):
+        value = timezone.make_aware(value, timezone.get_current_timezone())
+    return value
+
+
+def _bucket_sql(queryset, field):
+    """ Get SQL that truncates selected field to day. """
+    connection = connections[queryset.db]
+    qn = connection.ops.quote_name
+    column = '{}.{}'.format(qn(queryset.model._meta.db_table), qn(field.column))
+    if isinstance(field, models.DateTimeField):
+        return connection.ops.datetime_trunc_sql('day', column,
+                                    timezone.get_current_timezone_name())
+    return connection.ops.date_trunc_sql('day', column), []
+
+
+def count_by_day(queryset, field_name, value=None, since=None, group_by=(),
+                 until=None):
+    """
+    Get dictionary of {date: count} for given queryset. If `value` is given,
+    we sum this field instead of counting rows. `since` limits query to
+    rows not older than given date and `until` to rows older than given
+    date. When `group_by` fields are given, rows
+    are counted separately for every combination of their values and keys
+    are tuples of these values followed by date.
+    """
+    field = queryset.model._meta.get_field(field_name)
+    if since is not None:
+        queryset = queryset.filter(**{
+            '{}__gte'.format(field_name): _day_start(queryset, field, since)})
+    if until is not None:
+        queryset = queryset.filter(**{
+            '{}__lt'.format(field_name): _day_start(queryset, field, until)})
+    sql, params = _bucket_sql(queryset, field)
+    aggregate = Sum(value) if value is not None else Count('pk')
+    rows = queryset.order_by()\
+                   .extra(select={'bucket': sql}, select_params=params)\
+                   .values('bucket', *group_by).annotate(total=aggregate)
+    counts = {}
+    for row in rows:
+        key = _to_date(row['bucket'])
+        if group_by:
+            key = tuple(row[x] for x in group_by) + (key, )
+        counts[key] = counts.get(key, 0) + (row['total'] or 0)
+    return counts
+
+
+def _version_key(model):
+    return 'timeline:version:{}.{}'.format(model._meta.app_label,
+                                           model._meta.model_name)
+
+
+def forget_counts(model):
+    """ Drop cached counters of all querysets of given model. """
+    redis_cache.set(_version_key(model), repr(time.time()), timeout=None)
+
+
+def _cached_count_by_day(queryset, field_name, value, cache_key):
+    """ Take counters for past days from cache, query only for recent ones. """
+    if cache_key is None:
+        try:
+            sql, params = queryset.query.sql_with_params()
+        except EmptyResultSet:
+            return {}
+        text = u"{}:{!r}:{}:{}".format(sql, params, field_name, value)
+        cache_key = hashlib.md5(text.encode('utf-8')).hexdigest()
+    version = redis_cache.get(_version_key(queryset.model))
+    cache_key = 'timeline:{}:{}'.format(version, cache_key)
+    current = today()
+    cached = redis_cache.get(cache_key)
+    if cached is not None:
+        since = min(cached['closed'] + datetime.timedelta(days=1),
+                    current - datetime.timedelta(days=RECOUNT_DAYS))
+        counts = dict((k, v) for k, v in cached['counts'].iteritems()
+                      if k < since)
+        counts.update(count_by_day(queryset, field_name, value, since))
+    else:
+        counts = count_by_day(queryset, field_name, value)
+    redis_cache.set(cache_key, {
+        'closed': current - datetime.timedelta(days=1),
+        'counts': dict((k, v) for k, v in counts.iteritems() if k < current),
+    }, timeout=CACHE_TIMEOUT)
+    return counts
+
+
+def _period_start(day, period):
+    if period == 'week':
+        return day - datetime.timedelta(days=day.weekday())
+    if period == 'month':
+        return day.replace(day=1)
+    return day
+
+
+def histogram(queryset, field_name, period='day', value=None, start=None,
+              cache_key=None, use_cache=True):
+    """
+    Count items from queryset in periods of given length ('day', 'week' or
+    'month') from `start` (by default - the oldest item) up to now. Returns
+    Histogram tuple, where `results` is list of counters for every period,
+    including empty ones.
+    """
+    if use_cache:
+        counts = _cached_count_by_day(queryset, field_name, value, cache_key)
+    else:
+        counts = count_by_day(queryset, field_name, value)
+    current = today()
+    if start is None:
+        start = min(counts) if counts else current
+    start = _period_start(local_date(start), period)
+
+    buckets = collections.OrderedDict()
+    day = start
+    while day <= current:
+        buckets.setdefault(_period_start(day, period), 0)
+        day += datetime.timedelta(days=1)
+    for day, count in counts.iteritems():
+        key = _period_start(day, period)
+        if key in buckets:
+            buckets[key] += count
+
+    results = buckets.values()
+    return Histogram(start=start, period=period, results=results,
+                     total=sum(results))
@@ -0,0 +1,27 @@
+# -*- coding: utf-8 -*-
+from __future__ import unicode_literals
+
+from django.db import models, migrations
+
+from places_core.slugs import fix_duplicate_slugs
+
+
+def rename_duplicates(apps, schema_editor):
+    fix_duplicate_slugs(apps.get_model('polls', 'SimplePoll'))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('polls', '0006_auto_20151001_1532'),
+    ]
+
+    operations = [
+        migrations.RunPython(rename_duplicates),
+        migrations.AlterField(
+            model_name='simplepoll',
+            name='slug',
+            field=models.CharField(unique=True, max_length=210, verbose_name='slug'),
+            preserve_default=True,
+        ),
+    ]
@@ -14,9 +14,11 @@ from ordered_model.models import OrderedModel
 from taggit.managers import TaggableManager
 
 from gallery.image import adjust_uploaded_image
-from locations.models import Location
+from locations.models import Location, index_location_content, \
+                             remove_location_content
 from places_core.helpers import truncatehtml, sanitizeHtml
 from places_core.models import ImagableItemMixin, remove_image
+from places_core.slugs import save_with_slug
 from projects.models import SlugifiedModelMixin
 
 from .managers import SimplePollResultsManager
@@ -42,13 +44,11 @@ class Poll(ImagableItemMixin, models.Model):
         # TODO: It has to be validated somehow!!!
         #self.question = sanitizeHtml(self.question)
 
-        if not self.pk:
-            to_slug_entry = self.title
-            chk = Poll.objects.filter(title=self.title)
-            if len(chk):
-                to_slug_entry = self.title + '-' + str(len(chk))
-            self.slug = slugify(to_slug_entry)
-        super(Poll, self).save(*args, **kwargs)
+        if self.pk:
+            super(Poll, self).save(*args, **kwargs)
+        else:
+            save_with_slug(self, slugify(self.title),
+                           lambda: super(Poll, self).save(*args, **kwargs))
 
     def get_absolute_url(self):
         return reverse(
@@ -99,6 +99,8 @@ class AnswerSet(models.Model):
 
 models.signals.post_save.connect(adjust_uploaded_image, sender=Poll)
 models.signals.post_delete.connect(remove_image, sender=Poll)
+models.signals.post_save.connect(index_location_content, sender=Poll)
+models.signals.post_delete.connect(remove_location_content, sender=Poll)
 
 
 @python_2_unicode_compatible
@@ -3,7 +3,7 @@ from django.utils.translation import ugettext_lazy as _
 
 from actstream import action
 
-from notifications.models import notify
+from notifications.models import notify, notify_many
 
 
 def task_action(user, task, verb):
@@ -20,12 +20,11 @@ def finished_task(user, task):
     The user has finished the task.
     """
     task_action(user, task, _(u"finished task"))
-    for participant in task.participants.all():
-        notify(user, participant,
-            verb=_(u"finished task"),
-            key="project",
-            action_tartget=task
-        )
+    notify_many(user, task.participants.all(),
+        verb=_(u"finished task"),
+        key="project",
+        action_target=task
+    )
 
 
 def joined_to_task(user, task):
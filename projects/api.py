@@ -41,9 +41,8 @@ class ProjectViewSet(viewsets.ModelViewSet):
             location_pk = None
         if location_pk is not None:
             location = get_object_or_404(Location, pk=location_pk)
-            locations = location.get_children_id_list()
-            locations.append(location.pk)
-            qs = qs.filter(location__pk__in=locations)
+            qs = qs.filter(
+                location__in=location.descendants(include_self=True))
         return qs
 
     @action()
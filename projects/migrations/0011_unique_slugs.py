@@ -0,0 +1,34 @@
+# -*- coding: utf-8 -*-
+from __future__ import unicode_literals
+
+from django.db import models, migrations
+
+from places_core.slugs import fix_duplicate_slugs
+
+
+def rename_duplicates(apps, schema_editor):
+    fix_duplicate_slugs(apps.get_model('projects', 'SocialProject'))
+    fix_duplicate_slugs(apps.get_model('projects', 'SocialForumTopic'))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('projects', '0010_socialproject_modules'),
+    ]
+
+    operations = [
+        migrations.RunPython(rename_duplicates),
+        migrations.AlterField(
+            model_name='socialproject',
+            name='slug',
+            field=models.CharField(unique=True, max_length=210, verbose_name='slug'),
+            preserve_default=True,
+        ),
+        migrations.AlterField(
+            model_name='socialforumtopic',
+            name='slug',
+            field=models.CharField(unique=True, max_length=210, verbose_name='slug'),
+            preserve_default=True,
+        ),
+    ]
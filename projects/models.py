@@ -18,9 +18,11 @@ from ordered_model.models import OrderedModel
 from etherpad.models import EtherpadGroup, EtherpadAuthor
 from gallery.image import resize_background_image
 from ideas.models import Idea
-from locations.models import Location, BackgroundModelMixin
+from locations.models import Location, BackgroundModelMixin, \
+                             index_location_content, remove_location_content
 from mapvotes.models import Voting
 from places_core.helpers import sanitizeHtml
+from places_core.slugs import save_with_slug
 
 from places_core.helpers import truncatehtml
 
@@ -44,30 +46,16 @@ class SlugifiedModelMixin(models.Model):
     elements to base name. Additionaly, we sanitize input from user.
     """
     name = models.CharField(max_length=200, verbose_name=_(u"name"))
-    slug = models.CharField(max_length=210, verbose_name=_(u"slug"))
+    slug = models.CharField(max_length=210, unique=True,
+                            verbose_name=_(u"slug"))
 
     class Meta:
         abstract = True
 
     def save(self, *args, **kwargs):
         self.name = strip_tags(self.name)
-        slug = slugify(self.name)
-        self.slug = slug
-        success = False
-        retries = 0
-        while not success:
-            check = self.__class__.objects.filter(slug=self.slug)\
-                                          .exclude(pk=self.pk).count()
-            if not check:
-                success = True
-            else:
-                # We assume maximum number of 50 elements with the same name.
-                # But the loop should be breaked if something went wrong.
-                if retries >= 50:
-                    raise ValidationError(u"Maximum number of retries exceeded")
-                retries += 1
-                self.slug = "{}-{}".format(slug, retries)
-        super(SlugifiedModelMixin, self).save(*args, **kwargs)
+        save_with_slug(self, slugify(self.name),
+            lambda: super(SlugifiedModelMixin, self).save(*args, **kwargs))
 
 
 MODULE_CHOICES = (
@@ -283,6 +271,8 @@ models.signals.post_delete.connect(cleanup, sender=SocialProject)
 
 models.signals.post_save.connect(resize_background_image, sender=SocialProject)
 models.signals.post_save.connect(project_created_action, sender=SocialProject)
+models.signals.post_save.connect(index_location_content, sender=SocialProject)
+models.signals.post_delete.connect(remove_location_content, sender=SocialProject)
 models.signals.post_save.connect(project_task_action, sender=SocialForumTopic)
 models.signals.post_save.connect(project_task_action, sender=SocialForumEntry)
 models.signals.post_save.connect(project_task_action, sender=TaskGroup)
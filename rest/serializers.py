@@ -18,6 +18,7 @@ from projects.serializers import ProjectActionSerializer, \
                                  TaskGroupActionSerializer, \
                                  TaskActionSerializer
 from places_core.models import AbuseReport
+from activities.helpers import prefetch_actions
 from places_core.helpers import truncatehtml
 from places_core.serializers import ImagableModelSerializer
 from userspace.models import Badge
@@ -59,25 +60,38 @@ class MyActionsSerializer(serializers.Serializer):
     object = serializers.SerializerMethodField('get_action_object')
     object_ct = serializers.SerializerMethodField('get_verbose_name')
     target = serializers.SerializerMethodField('get_action_target')
-    target_ct = serializers.Field(source='target_content_type.model')
+    target_ct = serializers.SerializerMethodField('get_target_ct')
     description = serializers.SerializerMethodField('get_action_description')
 
+    @property
+    def data(self):
+        if self._data is None and self.many:
+            # Fetch related objects for entire list at once.
+            self.object = prefetch_actions(self.object)
+        return super(MyActionsSerializer, self).data
+
+    def field_to_native(self, obj, field_name):
+        """ Used by PaginatedActionSerializer to serialize page of actions. """
+        actions = getattr(obj, self.source or field_name)
+        return [self.to_native(x) for x in prefetch_actions(actions)]
+
     def get_timestamp(self, obj):
         return obj.timestamp.isoformat()
 
+    def get_target_ct(self, obj):
+        if obj.target_content_type_id is None:
+            return None
+        return ContentType.objects.get_for_id(obj.target_content_type_id).model
+
     def get_verbose_name(self, obj):
         try:
-            ct = obj.action_object_content_type
-            target = ct.get_object_for_this_type(pk=obj.action_object_object_id)
-            return target._meta.verbose_name
+            return obj.action_object._meta.verbose_name
         except Exception:
             return u''
 
     def get_object_url(self, obj):
         try:
-            ct = obj.action_object_content_type
-            target = ct.get_object_for_this_type(pk=obj.action_object_object_id)
-            return target.get_absolute_url()
+            return obj.get_absolute_url()
         except Exception:
             return u''
 
@@ -123,8 +137,8 @@ class MyActionsSerializer(serializers.Serializer):
 
     def get_action_description(self, obj):
         try:
-            ct = obj.action_object_content_type
-            target = ct.get_object_for_this_type(pk=obj.action_object_object_id)
+            ct = ContentType.objects.get_for_id(obj.action_object_content_type_id)
+            target = obj.action_object
             if obj.verb == 'commented':
                 return '{} <a href="{}">{}</a>'.format(
                                         truncatehtml(obj.data['comment'], 140),
@@ -165,25 +179,29 @@ class MyActionsSerializer(serializers.Serializer):
 
     def get_action_object(self, obj):
         try:
-            ct = obj.action_object_content_type
-            target = ct.get_object_for_this_type(pk=obj.action_object_object_id)
-            return self.serialize_selected_object(ct, target)
+            ct = ContentType.objects.get_for_id(obj.action_object_content_type_id)
+            return self.serialize_selected_object(ct, obj.action_object)
         except Exception:
             return {}
 
     def get_action_target(self, obj):
         try:
-            ct = obj.target_content_type
-            target = ct.get_object_for_this_type(pk=obj.target_object_id)
-            return self.serialize_selected_object(ct, target)
+            ct = ContentType.objects.get_for_id(obj.target_content_type_id)
+            return self.serialize_selected_object(ct, obj.target)
         except Exception:
             return {}
 
     def get_actor_data(self, obj):
         """ WARNING: we assume that every actor is user instance!!!. """
-        user = User.objects.get(pk=obj.actor_object_id)
-        serializer = UserSerializer(user)
-        return serializer.data
+        # The same users appear many times on single page.
+        if not hasattr(self, '_actors'):
+            self._actors = {}
+        if obj.actor_object_id not in self._actors:
+            user = obj.actor
+            if user is None:
+                raise User.DoesNotExist
+            self._actors[obj.actor_object_id] = UserSerializer(user).data
+        return self._actors[obj.actor_object_id]
 
 
 class PaginatedActionSerializer(PaginationSerializer):
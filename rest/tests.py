@@ -1,2 +1,56 @@
 # -*- coding: utf-8 -*-
+from django.contrib.auth.models import User
+from django.db import connection
 from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+
+from actstream import action
+from actstream.models import Action
+
+from blog.models import News
+from ideas.models import Idea
+from locations.models import Location
+from polls.models import Poll
+
+from .serializers import MyActionsSerializer
+
+
+class MyActionsQueriesTestCase(TestCase):
+    """ Serializing activity stream doesn't take queries for every action. """
+    fixtures = ['fixtures/users.json',
+                'fixtures/locations.json',]
+
+    def setUp(self):
+        self.user = User.objects.first()
+        self.location = Location.objects.get(slug='brzeg-pl-1')
+
+    def create_actions(self, number):
+        """ Create given number of actions for every kind of content. """
+        for i in range(number):
+            for obj in [
+                Idea.objects.create(name=u"Idea {}".format(i),
+                    description=u"Test", creator=self.user,
+                    location=self.location),
+                News.objects.create(title=u"News {}".format(i),
+                    content=u"Test", creator=self.user,
+                    location=self.location),
+                Poll.objects.create(title=u"Poll {}".format(i),
+                    question=u"Test", creator=self.user,
+                    location=self.location),
+            ]:
+                action.send(self.user, verb=u'tested', action_object=obj,
+                            target=self.location)
+
+    def serialize(self):
+        actions = Action.objects.filter(verb=u'tested')
+        return MyActionsSerializer(actions, many=True).data
+
+    def test_queries_dont_depend_on_number_of_actions(self):
+        self.create_actions(1)
+        # Content types and other per-process caches are warmed up first
+        self.serialize()
+        with CaptureQueriesContext(connection) as queries:
+            self.assertEqual(len(self.serialize()), 3)
+        self.create_actions(5)
+        with self.assertNumQueries(len(queries)):
+            self.assertEqual(len(self.serialize()), 18)
@@ -196,8 +196,7 @@ class NewsViewSet(viewsets.ModelViewSet):
             cached_qs = cache.get(location.slug + '_newset', None)
             if cached_qs is None or not settings.USE_CACHE:
                 newset = News.objects \
-                    .filter(location__pk__in=location.get_children_id_list())
-                newset = newset | News.objects.filter(location=location)
+                    .filter(location__in=location.descendants(include_self=True))
                 cache.set(location.slug + '_newset', newset, timeout=None)
             else:
                 newset = cached_qs
@@ -262,8 +261,7 @@ class PollListViewSet(viewsets.ModelViewSet):
             cached_qs = cache.get(location.slug+'_polls', None)
             if cached_qs is None or not settings.USE_CACHE:
                 newset = Poll.objects \
-                    .filter(location__pk__in=location.get_children_id_list())
-                newset = newset | Poll.objects.filter(location=location)
+                    .filter(location__in=location.descendants(include_self=True))
                 cache.set(location.slug+'_polls', newset, timeout=None)
             else:
                 newset = cached_qs
@@ -444,8 +442,7 @@ class ForumViewSet(viewsets.ModelViewSet):
             cached_qs = cache.get(location.slug + '_forum', None)
             if cached_qs is None or not settings.USE_CACHE:
                 queryset = Discussion.objects \
-                    .filter(location__pk__in=location.get_children_id_list())
-                queryset = queryset | Discussion.objects.filter(location=location)
+                    .filter(location__in=location.descendants(include_self=True))
                 cache.set(location.slug + '_forum', queryset, timeout=None)
             else:
                 queryset = cached_qs
@@ -542,8 +539,7 @@ class IdeaListViewSet(viewsets.ModelViewSet):
             cached_qs = cache.get(location.slug + '_ideas', None)
             if cached_qs is None or not settings.USE_CACHE:
                 queryset = Idea.objects \
-                    .filter(location__pk__in=location.get_children_id_list())
-                queryset = queryset | Idea.objects.filter(location=location)
+                    .filter(location__in=location.descendants(include_self=True))
                 cache.set(location.slug + '_ideas', queryset, timeout=None)
             else:
                 queryset = cached_qs
@@ -591,10 +587,7 @@ class IdeaListViewSet(viewsets.ModelViewSet):
             l.sort(key=lambda x: x.creator.get_full_name().split(' ')[1])
             return l
         elif sortby == 'answers':
-            l = list(queryset)
-            l.sort(key=lambda x: x.get_votes())
-            l = l[::-1]
-            return l
+            return queryset.order_by('-score')
 
         return queryset
         #return queryset.order_by('-date_created')
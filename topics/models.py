@@ -14,10 +14,12 @@ from taggit.managers import TaggableManager
 from mptt.models import MPTTModel, TreeForeignKey
 
 from gallery.image import adjust_uploaded_image
-from locations.models import Location
+from locations.models import Location, index_location_content, \
+                             remove_location_content
 from notifications.models import notify
 from places_core.helpers import truncatehtml, sanitizeHtml
 from places_core.models import ImagableItemMixin, remove_image
+from places_core.slugs import save_with_slug
 
 
 @python_2_unicode_compatible
@@ -57,13 +59,11 @@ class Discussion(ImagableItemMixin, models.Model):
         # TODO: It has to be validated somehow!!!
         #self.intro = sanitizeHtml(self.intro)
 
-        if not self.slug:
-            to_slug_entry = self.question
-            chk = Discussion.objects.filter(question=self.question)
-            if len(chk) > 0:
-                to_slug_entry = self.question + '-' + str(len(chk))
-            self.slug = slugify(to_slug_entry)
-        super(Discussion, self).save(*args, **kwargs)
+        if self.slug:
+            super(Discussion, self).save(*args, **kwargs)
+        else:
+            save_with_slug(self, slugify(self.question),
+                lambda: super(Discussion, self).save(*args, **kwargs))
 
     def get_absolute_url(self):
         return reverse('locations:topic',
@@ -187,3 +187,5 @@ models.signals.post_save.connect(vote_notification, sender=EntryVote)
 
 models.signals.post_save.connect(adjust_uploaded_image, sender=Discussion)
 models.signals.post_delete.connect(remove_image, sender=Discussion)
+models.signals.post_save.connect(index_location_content, sender=Discussion)
+models.signals.post_delete.connect(remove_location_content, sender=Discussion)
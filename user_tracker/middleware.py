@@ -1,5 +1,6 @@
 # -*- coding: utf-8 -*-
-from datetime import timedelta
+import random
+
 from ipware.ip import get_ip
 
 from django.conf import settings
@@ -15,6 +16,12 @@ log = logging.getLogger('tracking')
 
 NO_TRACKING_PREFIXES = ['/jsi18n/', ]
 
+# When True, page views are queued and saved by Celery task.
+TRACKING_ASYNC = getattr(settings, 'TRACKING_ASYNC', True)
+
+# Fraction of page views that are tracked (1.0 means all).
+SAMPLE_RATE = float(getattr(settings, 'TRACKING_SAMPLE_RATE', 1.0))
+
 
 class VisitorTrackingMiddleware(object):
 
@@ -27,11 +34,8 @@ class VisitorTrackingMiddleware(object):
         if settings.STATIC_URL and settings.STATIC_URL != '/':
             self.prefixes.append(settings.STATIC_URL)
 
-    def process_request(self, request):
-        # don't process AJAX requests
-        if request.is_ajax():
-            return
-
+    def get_hit(self, request):
+        """ Collect information about single page view. """
         ip_address = get_ip(request)
         user_agent = request.META.get('HTTP_USER_AGENT', '')[:255]
 
@@ -43,64 +47,43 @@ class VisitorTrackingMiddleware(object):
             session_key = '%s:%s' % (ip_address, user_agent)
             session_key = session_key[:40]
 
-        # ensure that the request.path does not begin with any of the prefixes
-        for prefix in self.prefixes:
-            if request.path.startswith(prefix):
-                return
-
-        # if we get here, the URL needs to be tracked
-        now = timezone.now()
-
         # determine whether or not the user is logged in
         user = request.user
         if isinstance(user, AnonymousUser):
             user = None
 
-        attributes = {
-            'user': user,
+        return {
             'session_key': session_key,
-            'ip_address': ip_address
+            'user': user.pk if user is not None else None,
+            'ip_address': ip_address,
+            'user_agent': user_agent,
+            'referrer': request.META.get('HTTP_REFERER', 'unknown')[:255],
+            'url': request.path[:255],
+            'time': timezone.now().isoformat(),
         }
 
-        # see if this is a known visitor, or create a new entry
-        try:
-            visitor = Visitor.objects.filter(**attributes)[0]
-        except IndexError:
-            # see if there's a visitor with the same IP and user agent
-            # within the last 5 minutes
-            cutoff = now - timedelta(minutes=5)
-            visitors = Visitor.objects.filter(
-                ip_address=ip_address,
-                user_agent=user_agent,
-                last_update__gte=cutoff
-            )
-
-            if len(visitors):
-                visitor = visitors[0]
-                visitor.session_key = session_key
-            else:
-                # it's probably safe to assume that the visitor is brand new
-                visitor = Visitor(**attributes)
-
-        # update the tracking information
-        visitor.user = user
-        visitor.user_agent = user_agent
-
-        # if the visitor record is new, or the visitor hasn't been here for
-        # at least an hour, update their referrer URL
-        one_hour_ago = now - timedelta(hours=1)
-        if not visitor.last_update or visitor.last_update <= one_hour_ago:
-            visitor.referrer = request.META.get('HTTP_REFERER',
-                                                'unknown')[:255]
-
-            # reset the number of pages they've been to
-            visitor.page_views = 0
-            visitor.session_start = now
-
-        visitor.url = request.path
-        visitor.page_views += 1
-        visitor.last_update = now
-        try:
-            visitor.save()
-        except DatabaseError:
-            log.error('Problem when saving visitor information')
+    def process_request(self, request):
+        # don't process AJAX requests
+        if request.is_ajax():
+            return
+
+        # ensure that the request.path does not begin with any of the prefixes
+        for prefix in self.prefixes:
+            if request.path.startswith(prefix):
+                return
+
+        if SAMPLE_RATE < 1.0 and random.random() >= SAMPLE_RATE:
+            return
+
+        # if we get here, the URL needs to be tracked
+        hit = self.get_hit(request)
+
+        if not TRACKING_ASYNC:
+            try:
+                Visitor.objects.track([hit])
+            except DatabaseError:
+                log.error('Problem when saving visitor information')
+            return
+
+        if not Visitor.objects.record(hit):
+            log.warning('Tracking queue is full, page view dropped')
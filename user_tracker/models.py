@@ -1,22 +1,41 @@
 # -*- coding: utf-8 -*-
 from __future__ import unicode_literals
 
-from datetime import timedelta
+from datetime import datetime, timedelta
 
 from django.conf import settings
 from django.contrib.auth.models import User
 from django.contrib.gis.geoip import GeoIP
-from django.db import models
+from django.db import models, transaction
 from django.utils import timezone
+from django.utils.dateparse import parse_datetime
 from django.utils.encoding import python_2_unicode_compatible
 from django.utils.translation import ugettext_lazy as _
 
+from places_core.buffers import get_buffer, is_local
+
 
 # Default tracking timeout is set to 10 minutes.
 TIMEOUT = 10
 if hasattr(settings, 'TRACKING_TIMEOUT'):
     TIMEOUT = int(settings.TRACKING_TIMEOUT)
 
+# Name of the queue for page views waiting to be saved.
+BUFFER_NAME = 'tracking'
+
+# Maximum length of the queue. New page views are dropped when it's full.
+QUEUE_SIZE = getattr(settings, 'TRACKING_QUEUE_SIZE', 10000)
+
+# Number of page views saved at once.
+FLUSH_SIZE = getattr(settings, 'TRACKING_FLUSH_SIZE', 1000)
+
+# Visitor with the same IP and user agent seen within this period is
+# considered the same person, even if session key has changed.
+SAME_VISITOR_PERIOD = timedelta(minutes=5)
+
+# After this period of inactivity new session is started.
+SESSION_PERIOD = timedelta(hours=1)
+
 
 def set_timeout(timeout=None):
     """ Helper for VisitorManager - sets activity time period based on given
@@ -49,6 +68,110 @@ class VisitorManager(models.Manager):
         """
         return self.get_queryset().filter(user=user).first()
 
+    def _find_visitors(self, hits):
+        """
+        Fetch visitors matching given hits with two queries. Returns tuple of
+        dictionaries: visitors by (session key, user id, ip address) and
+        lists of recent visitors by (ip address, user agent).
+        """
+        by_session = {}
+        qs = self.get_queryset().filter(
+            session_key__in=set(x['session_key'] for x in hits))
+        for visitor in qs:
+            key = (visitor.session_key, visitor.user_id, visitor.ip_address)
+            by_session.setdefault(key, visitor)
+
+        by_agent = {}
+        missing = [x for x in hits if self._hit_key(x) not in by_session]
+        if missing:
+            cutoff = min(x['time'] for x in missing) - SAME_VISITOR_PERIOD
+            qs = self.get_queryset().filter(
+                ip_address__in=set(x['ip_address'] for x in missing),
+                last_update__gte=cutoff)
+            for visitor in qs:
+                key = (visitor.ip_address, visitor.user_agent)
+                by_agent.setdefault(key, []).append(visitor)
+        return by_session, by_agent
+
+    def _hit_key(self, hit):
+        return (hit['session_key'], hit['user'], hit['ip_address'])
+
+    def track(self, hits):
+        """
+        Save tracking information for list of page views. Hits are
+        dictionaries created by tracking middleware. Hits from the same visitor are
+        merged, so we need only two SELECT queries for the whole batch, one
+        UPDATE per visitor and one INSERT for all new visitors.
+        """
+        for hit in hits:
+            if not isinstance(hit['time'], datetime):
+                hit['time'] = parse_datetime(hit['time'])
+        hits = sorted(hits, key=lambda x: x['time'])
+        by_session, by_agent = self._find_visitors(hits)
+        changed = {}
+
+        for hit in hits:
+            key = self._hit_key(hit)
+            visitor = by_session.get(key)
+            if visitor is None:
+                cutoff = hit['time'] - SAME_VISITOR_PERIOD
+                for candidate in by_agent.get(
+                        (hit['ip_address'], hit['user_agent']), []):
+                    if candidate.last_update >= cutoff:
+                        visitor = candidate
+                        visitor.session_key = hit['session_key']
+                        break
+                else:
+                    visitor = self.model(session_key=hit['session_key'],
+                                         user_id=hit['user'],
+                                         ip_address=hit['ip_address'])
+                by_session[key] = visitor
+
+            visitor.user_id = hit['user']
+            visitor.user_agent = hit['user_agent']
+            if not visitor.last_update or \
+                    visitor.last_update <= hit['time'] - SESSION_PERIOD:
+                visitor.referrer = hit['referrer']
+                visitor.page_views = 0
+                visitor.session_start = hit['time']
+            visitor.url = hit['url']
+            visitor.page_views += 1
+            visitor.last_update = hit['time']
+            changed[id(visitor)] = visitor
+
+        created = []
+        with transaction.atomic():
+            for visitor in changed.values():
+                if visitor.pk is None:
+                    created.append(visitor)
+                else:
+                    visitor.save()
+            self.bulk_create(created)
+        return len(changed)
+
+    def record(self, hit):
+        """ Put single page view into the queue. Returns False if the queue
+            is full and page view was dropped.
+        """
+        hits = get_buffer(BUFFER_NAME, QUEUE_SIZE)
+        if not hits.push(hit):
+            return False
+        if is_local() and len(hits) >= FLUSH_SIZE:
+            self.flush()
+        return True
+
+    def flush(self, batch_size=FLUSH_SIZE):
+        """ Save queued page views. Returns number of saved page views. """
+        hits = get_buffer(BUFFER_NAME, QUEUE_SIZE)
+        total = 0
+        while True:
+            batch = hits.pop_many(batch_size)
+            if not batch:
+                break
+            self.track(batch)
+            total += len(batch)
+        return total
+
 
 @python_2_unicode_compatible
 class Visitor(models.Model):
@@ -48,3 +48,12 @@ def login_remind_messages():
             visit.save()
 
     logger.info("Task finished")
+
+
+@periodic_task(run_every=datetime.timedelta(minutes=1))
+def flush_visitors():
+    """ Save queued page views in visitor tracking table. """
+    count = Visitor.objects.flush()
+    if count:
+        logger.info(u"Saved {} queued page views".format(count))
+    return count
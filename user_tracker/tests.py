@@ -1,3 +1,50 @@
+# -*- coding: utf-8 -*-
+import datetime
+
+from django.contrib.auth.models import User
 from django.test import TestCase
+from django.test.utils import override_settings
+from django.utils import timezone
+
+from .models import Visitor
+
+
+@override_settings(BUFFER_BACKEND='local')
+class QueuedTrackingTestCase(TestCase):
+    """ Test that queued page views are merged per visitor. """
+    fixtures = ['fixtures/users.json',]
+
+    def setUp(self):
+        self.user = User.objects.first()
+        Visitor.objects.flush()
+
+    def _hit(self, url, minutes=0, session_key='abc', user=None):
+        time = timezone.now() + datetime.timedelta(minutes=minutes)
+        return {
+            'session_key': session_key,
+            'user': user,
+            'ip_address': '127.0.0.1',
+            'user_agent': 'Test',
+            'referrer': 'unknown',
+            'url': url,
+            'time': time.isoformat(),
+        }
+
+    def test_page_views_are_merged(self):
+        """ Page views from one session give single visitor. """
+        for i in range(3):
+            Visitor.objects.record(self._hit('/page/{}/'.format(i), i))
+        self.assertEqual(Visitor.objects.count(), 0)
+        self.assertEqual(Visitor.objects.flush(), 3)
+        visitor = Visitor.objects.get()
+        self.assertEqual(visitor.page_views, 3)
+        self.assertEqual(visitor.url, '/page/2/')
 
-# Create your tests here.
+    def test_existing_visitor_is_updated(self):
+        """ Visitor with new session but same IP and agent is reused. """
+        Visitor.objects.track([self._hit('/')])
+        Visitor.objects.track([self._hit('/other/', 1, 'xyz', self.user.pk)])
+        visitor = Visitor.objects.get()
+        self.assertEqual(visitor.session_key, 'xyz')
+        self.assertEqual(visitor.user, self.user)
+        self.assertEqual(visitor.page_views, 2)
@@ -6,17 +6,21 @@ from django.contrib import auth
 from django.http import Http404, HttpResponse
 from django.views.decorators.csrf import csrf_exempt
 from django.contrib.auth.models import User
+from django.contrib.contenttypes.models import ContentType
 from django.core.paginator import Paginator, EmptyPage, PageNotAnInteger
+from django.db.models import Q
 from django.utils.translation import ugettext as _
 
-from actstream.models import model_stream, user_stream, following
+from actstream.models import Follow, model_stream, user_stream, following
 from rest_framework import viewsets
 from rest_framework import permissions as rest_permissions
 from rest_framework import views as rest_views
 from rest_framework.response import Response
 
+from places_core.helpers import get_time_difference
 from rest.permissions import IsOwnerOrReadOnly
 from rest.serializers import PaginatedActionSerializer
+from locations.models import Location, LocationContent, serialize_content
 from locations.serializers import ContentPaginatedSerializer, SimpleLocationSerializer
 from bookmarks.models import Bookmark
 from actstream.actions import follow, unfollow
@@ -133,11 +137,14 @@ class MentionUserViewSet(viewsets.ViewSet):
     model = User
     permission_classes = (rest_permissions.IsAuthenticated, )
     serializer_class = UserSearchSerializer
+    limit = 10
 
     def list(self, request):
         query = self.request.QUERY_PARAMS.get('term', '')
-        qs = User.objects.filter(first_name__icontains=query)
-        qs = qs | User.objects.filter(last_name__icontains=query)
+        qs = User.objects.filter(Q(first_name__istartswith=query) |
+                                 Q(last_name__istartswith=query),
+                                 is_active=True)
+        qs = qs.select_related('profile')[:self.limit]
         serializer = self.serializer_class(qs, many=True)
         return Response(serializer.data)
 
@@ -159,23 +166,15 @@ class UserSummaryAPI(rest_views.APIView):
         time = request.QUERY_PARAMS.get('time', 'any')
         haystack = request.QUERY_PARAMS.get('haystack', None)
 
-        content_objects = []
-        for location in request.user.profile.followed_locations():
-            content_objects += location.content_objects()
-        content_objects = sorted(content_objects, reverse=True,
-                                    key=lambda x: x['date_created'])
-
-        if content != 'all':
-            content_objects = [x for x in content_objects if x['type']==content]
-        if time != 'any':
-            content_objects = [x for x in content_objects\
-                if x['date_created'] >= get_time_difference(time).isoformat()]
-        if haystack:
-            content_objects = [x for x in content_objects \
-                if haystack.lower() in x['title'].lower()]
-
-        paginator = Paginator(content_objects, self.paginate_by)
+        ct = ContentType.objects.get_for_model(Location)
+        locations = Follow.objects.filter(user=request.user, content_type=ct)\
+                                  .values_list('object_id', flat=True)
+        entries = LocationContent.objects.search(
+            list(locations), content, get_time_difference(time), haystack)
+
+        paginator = Paginator(entries, self.paginate_by)
         items = paginator.page(page)
+        items.object_list = serialize_content(items.object_list)
         serializer_context = {'request': request}
         serializer = ContentPaginatedSerializer(items, context=serializer_context)
 
@@ -316,7 +315,7 @@ class ActivityAPIViewSet(rest_views.APIView):
     def get(self, request):
         if request.user.is_anonymous():
             raise Http404
-        if len(following(request.user)) > 0:
+        if Follow.objects.filter(user=request.user).exists():
             actstream = user_stream(request.user)
         else:
             actstream = []
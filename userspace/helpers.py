@@ -18,6 +18,8 @@ from django.contrib.sites.models import Site
 
 from actstream.models import Action, user_stream
 
+from gallery.image import render_derivatives
+
 from .models import UserProfile
 
 
@@ -142,10 +144,14 @@ def create_thumbnail(imgfile, size):
 def avatar_thumbnails(filename):
     """
     This function takes existing image file as argument and create apropriate
-    thumbnails according to AVATAR_THUMBNAIL_SIZES setting.
+    thumbnails according to AVATAR_THUMBNAIL_SIZES setting. Image is decoded
+    only once for all sizes.
     """
-    for s in settings.AVATAR_THUMBNAIL_SIZES:
-        create_thumbnail(filename, s)
+    pathname = os.path.join(settings.MEDIA_ROOT, 'img/avatars/')
+    file, ext = os.path.splitext(filename)
+    render_derivatives(os.path.join(pathname, filename), [
+        (os.path.join(pathname, '{}x{}_{}{}'.format(s[0], s[1], file, ext)),
+         'thumbnail', s) for s in settings.AVATAR_THUMBNAIL_SIZES])
 
 
 # def crop_avatar(imgfile):
@@ -8,13 +8,14 @@ from uuid import uuid4
 
 from django.conf import settings
 from django.db import models
-from django.db.models.signals import post_delete, post_save
+from django.db.models.signals import m2m_changed, post_delete, post_save, \
+                                     pre_delete
 from django.core.urlresolvers import reverse, NoReverseMatch
 from django.utils.translation import ugettext_lazy as _
 from django.utils.translation import get_language
 from django.utils.encoding import python_2_unicode_compatible
 from django.utils.html import strip_tags
-from django.contrib.auth.models import User
+from django.contrib.auth.models import Group, User
 from django.contrib.contenttypes import generic
 from django.contrib.contenttypes.models import ContentType
 
@@ -22,6 +23,7 @@ from actstream.models import following, followers
 
 from places_core.storage import OverwriteStorage, ReplaceStorage
 from places_core.helpers import sort_by_locale
+from places_core.permissions import forget_permissions
 from locations.models import Location, BackgroundModelMixin
 from gallery.image import resize_background_image, delete_background_image, \
                            delete_image, rename_background_file
@@ -289,3 +291,43 @@ def activate_user_profile(sender, instance, **kwargs):
 post_delete.connect(delete_background_image, sender=UserProfile)
 post_save.connect(resize_background_image, sender=UserProfile)
 post_save.connect(activate_user_profile, sender=User)
+
+
+def forget_moderator_permissions(sender, instance, action, reverse, pk_set,
+                                 **kwargs):
+    """ Clear cached permissions when moderated areas change. """
+    if action not in ('post_add', 'post_remove', 'pre_clear'):
+        return
+    if not reverse:
+        forget_permissions([instance.user_id])
+    elif pk_set is not None:
+        forget_permissions(UserProfile.objects.filter(pk__in=pk_set)
+                                      .values_list('user', flat=True))
+    else:
+        forget_permissions(instance.locations.values_list('user', flat=True))
+
+
+def forget_group_permissions(sender, instance, action, reverse, pk_set,
+                             **kwargs):
+    """ Clear cached permissions when user joins or leaves group. """
+    if action not in ('post_add', 'post_remove', 'pre_clear'):
+        return
+    if not reverse:
+        forget_permissions([instance.pk])
+    elif pk_set is not None:
+        forget_permissions(pk_set)
+    else:
+        forget_permissions(instance.user_set.values_list('pk', flat=True))
+
+
+def forget_members_permissions(sender, instance, **kwargs):
+    """ Group was renamed or deleted. """
+    if instance.pk is not None:
+        forget_permissions(instance.user_set.values_list('pk', flat=True))
+
+
+m2m_changed.connect(forget_moderator_permissions,
+                    sender=UserProfile.mod_areas.through)
+m2m_changed.connect(forget_group_permissions, sender=User.groups.through)
+post_save.connect(forget_members_permissions, sender=Group)
+pre_delete.connect(forget_members_permissions, sender=Group)
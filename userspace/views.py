@@ -27,7 +27,7 @@ from django.views.decorators.cache import cache_page
 from django.contrib.auth.decorators import login_required
 from django.core.paginator import Paginator, EmptyPage, PageNotAnInteger
 from social.apps.django_app.default.models import UserSocialAuth
-from actstream.models import model_stream, user_stream, following, followers
+from actstream.models import Follow, model_stream, user_stream, following, followers
 from actstream.actions import follow, unfollow
 from rest_framework.authtoken.models import Token
 
@@ -236,7 +236,7 @@ class UserActivityView(TemplateView):
 
     def get_context_data(self, **kwargs):
         context = super(UserActivityView, self).get_context_data(**kwargs)
-        if len(following(self.request.user)) > 0:
+        if Follow.objects.filter(user=self.request.user).exists():
             actstream = user_stream(self.request.user)
             context['blog']   = self.get_latest(actstream, 'blog')
             context['ideas']  = self.get_latest(actstream, 'ideas')